@@ -0,0 +1,68 @@
+# Per-point cost of the batched Colebrook-White solver against the old per-call fsolve path.
+# Run from the repository root: python benchmarks/bench_colebrook.py
+
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import fsolve
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import hydraulics  # noqa: E402
+
+
+# The Colebrook-White solve as the callback used to do it: one closure and one fsolve per point.
+# fsolve can step to a negative friction factor from the fixed 0.02 guess; those points come back as NaN.
+def fsolve_colebrook(reynolds_number, relative_roughness):
+    def colebrook(f):
+        f = f[0]
+        return 1.0 / math.sqrt(f) + 2.0 * math.log10(relative_roughness / 3.7 + 2.51 / (reynolds_number * math.sqrt(f)))
+    try:
+        return fsolve(colebrook, 0.02)[0]
+    except ValueError:
+        return float('nan')
+
+
+def best_of(func, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    reynolds = 10 ** rng.uniform(3.7, 7.0, 100_000)
+    relative_roughness = 10 ** rng.uniform(-6, -2, 100_000)
+
+    # fsolve is far too slow to run over the whole set, so time a slice of it
+    n_fsolve = 1_000
+    fsolve_s = best_of(lambda: [fsolve_colebrook(re, rr) for re, rr in
+                                zip(reynolds[:n_fsolve], relative_roughness[:n_fsolve])], repeats=3)
+    print(f"{'fsolve (per point)':<32}{n_fsolve:>10,} points {fsolve_s / n_fsolve * 1e6:>12.3f} us/point")
+
+    for n in (1, 100, 10_000, 100_000):
+        re, rr = reynolds[:n], relative_roughness[:n]
+
+        def batched():
+            seed = hydraulics.clamond(re, rr)
+            hydraulics.solve_colebrook(re, rr, seed)
+
+        batched_s = best_of(batched)
+        print(f"{'solve_colebrook (batched)':<32}{n:>10,} points {batched_s / n * 1e6:>12.3f} us/point "
+              f"({fsolve_s / n_fsolve / (batched_s / n):,.0f}x)")
+
+    # Check the two paths agree
+    f_fsolve = np.array([fsolve_colebrook(re, rr) for re, rr in zip(reynolds[:n_fsolve], relative_roughness[:n_fsolve])])
+    f_batched, converged, iterations = hydraulics.solve_colebrook(reynolds[:n_fsolve], relative_roughness[:n_fsolve])
+    print(f"fsolve failures: {np.isnan(f_fsolve).sum():,}/{n_fsolve:,}, "
+          f"max relative difference vs fsolve: {np.nanmax(np.abs(f_batched / f_fsolve - 1)):.2e}, "
+          f"converged {converged.sum():,}/{converged.size:,}, max iterations {iterations.max()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,387 @@
+# Benchmark suite for every calculation and callback in the app, with a pinned correctness baseline.
+# Run from the repository root:
+#
+#   python benchmarks/run_benchmarks.py [--sizes 1,1000,100000] [--json results.json]
+#   python benchmarks/run_benchmarks.py --update-baseline     # after an intentional change to results
+#
+# Before timing anything the current results are compared against benchmarks/baseline.json, and the run
+# fails if any value has moved, so a speedup can't silently change an answer.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+import conversions  # noqa: E402
+import energy  # noqa: E402
+import hydraulic_reference  # noqa: E402
+import hydraulics  # noqa: E402
+import inverse  # noqa: E402
+import line_fill  # noqa: E402
+import network  # noqa: E402
+import pipe_schedule  # noqa: E402
+import pump_stations  # noqa: E402
+import thermal  # noqa: E402
+import transient  # noqa: E402
+import uncertainty  # noqa: E402
+import units  # noqa: E402
+from energy import current_ideal  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+BASELINE_RTOL = 1e-9
+
+FRICTION_METHODS = hydraulics.METHODS + (hydraulics.TABLE_METHOD,)
+PAGES = ('/', '/pipeline-volume', '/fluid-flow', '/pipeline-profile', '/pump-stations', '/network',
+         '/surge', '/power-energy', '/unit-conversions')
+
+
+# Square grid network of side x side nodes (about 2 side^2 pipes) fed from one corner, with random demands
+def grid_network(side, rng):
+    index = np.arange(side * side).reshape(side, side)
+    from_node = np.concatenate([index[:, :-1].ravel(), index[:-1, :].ravel()])
+    to_node = np.concatenate([index[:, 1:].ravel(), index[1:, :].ravel()])
+    pipes = from_node.size
+    fixed_pressure = np.full(side * side, np.nan)
+    fixed_pressure[0] = 1400
+    net = network.Network(from_node, to_node, rng.uniform(0.5, 3, pipes),
+                          rng.choice([7.981, 10.02, 11.938, 15.25], pipes), rng.uniform(0, 300, side * side),
+                          fixed_pressure, 0.00015, 3.6, 0.84)
+    return net, rng.uniform(0, 200_000 / side ** 2, side * side)
+
+
+# Fixed inputs whose results are pinned in the baseline
+def correctness_results():
+    results = {}
+
+    diameters = [24, 12.75, 8.625, 42, 4.5]
+    walls = [0.5, 0.375, 0.322, 0.75, 0.237]
+    miles = [10, 1, 0.25, 120, 3.3]
+    for d, w, l in zip(diameters, walls, miles):
+        volume = hydraulic_reference.compute_pipeline_volume(d, w, l)
+        results[f'pipeline_volume[{d},{w},{l}]'] = [volume['volume_cuft'], volume['volume_bbl']]
+
+    flow_cases = [
+        (12, 100000, 0.00015, 0.84, 3.6, 0.0),
+        (24, 400000, 0.00015, 0.86, 12.0, 0.2),
+        (8, 20000, 0.0005, 0.72, 0.8, 0.0),
+        (16, 150000, 0.00005, 0.9, 50.0, 0.35),
+        (36, 900000, 0.00015, 0.84, 3.6, 0.0),
+        (6, 500, 0.00015, 0.95, 200.0, 0.0),
+    ]
+    for case in flow_cases:
+        computed = hydraulic_reference.compute_friction_factor(*case)
+        results[f'friction_factor{list(case)}'] = (
+            [computed['velocity_fps'], computed['reynolds_number']]
+            + [computed['friction_factors'][m] for m in hydraulics.METHODS]
+            + [computed['pressure_losses'][m] for m in hydraulics.METHODS]
+        )
+        d, q, e, sg, nu, dr = case
+        table = hydraulics.friction_pressure_loss(d, q, e, nu, sg, dr, methods=(hydraulics.TABLE_METHOD,))
+        results[f'friction_factor_table{list(case)}'] = [float(table['friction_factors'][hydraulics.TABLE_METHOD])]
+
+    for p, v, phase, pf in [(750, 220, 3, 0.98), (750, 480, 3, 0.9), (15, 240, 1, 1.0), (3000, 4160, 3, 0.95)]:
+        results[f'current_ideal[{p},{v},{phase},{pf}]'] = [float(current_ideal(p, v, phase, pf))]
+
+    hours = np.arange(energy.HOURS_PER_YEAR)
+    schedule = np.where(hours % 24 < 2, 0.0, 150000 + 50000 * np.sin(hours / energy.HOURS_PER_YEAR * 2 * np.pi))
+    year = energy.simulate_pumping_energy(schedule, 15.25, 60, 0.00015, 3.6, 0.84, 180000, 4000, static_head_psi=100,
+                                          energy_rate=np.where(hours % 24 >= 14, 0.12, 0.07), demand_charge=12)
+    results['simulate_pumping_energy'] = [year[key] for key in ('energy_kwh', 'peak_kw', 'peak_current_a',
+                                                                 'average_power_factor', 'total_cost')]
+
+    spread = {'roughness_ft': ('lognormal', 0.00015, 0.00005), 'viscosity_cst': ('normal', 3.6, 0.3),
+              'specific_gravity': ('triangular', 0.84, 0.01)}
+    mc = uncertainty.run({'diameter_in': 12, 'flow_rate_bpd': 100000, 'roughness_ft': 0.00015, 'viscosity_cst': 3.6,
+                          'specific_gravity': 0.84, 'drag_reduction': 0.0}, spread, draws=200_000, processes=1)
+    for method, summary in mc['pressure_loss_psi_per_mile'].items():
+        results[f'uncertainty.run[{method}]'] = [summary['mean'], summary['std'], *summary['percentile_values']]
+
+    net, demand = grid_network(10, np.random.default_rng(0))
+    for method in hydraulics.METHODS:
+        net.method = method
+        solution = net.solve(demand, warm_start=False)
+        results[f'network.solve[10x10 grid,{method}]'] = [*solution['flow_bpd'][:10], *solution['pressure_psi'][-10:]]
+
+    for event in transient.EVENTS:
+        surge = transient.simulate(10, 16, 0.375, 150000, 100, 0.00015, 3.6, 0.84, event=event, event_time_s=5,
+                                   duration_s=60, reach_ft=500, profile_milepost=[0, 4, 10],
+                                   profile_elevation_ft=[100, 400, 200])
+        results[f'transient.simulate[{event}]'] = [surge['wave_speed_fps'], *surge['max_pressure_psi'][::10],
+                                                   *surge['min_pressure_psi'][::10]]
+
+    for method in hydraulics.METHODS:
+        flow = inverse.max_flow_rate([6.065, 12, 19.25], [40, 20, 5], 0.00015, [1.2, 3.6, 20], 0.84, [0, 0.1, 0.3],
+                                     method=method)
+        dr = inverse.required_drag_reduction([6.065, 12, 19.25], [20000, 150000, 300000], [40, 20, 5], 0.00015,
+                                             [1.2, 3.6, 20], 0.84, method=method)
+        results[f'inverse.max_flow_rate[{method}]'] = list(flow['flow_rate_bpd'])
+        results[f'inverse.required_drag_reduction[{method}]'] = list(dr['drag_reduction'])
+
+    a, b = thermal.walther_curves([50, 60, 40], [120, 8, 900], 120, [15, 3, 60])
+    march = thermal.march([60, 20, 100], 15.25, [120000, 60000, 200000], 0.00015, [0.88, 0.82, 0.93], [130, 80, 150],
+                          [50, 40, 65], [0.3, 0.5, 0.2], a, b, segments=100)
+    for i in range(3):
+        results[f'thermal.march[case {i}]'] = [march['outlet_temperature_f'][i], march['outlet_viscosity_cst'][i],
+                                               march['total_pressure_loss_psi'][i]]
+
+    for value in (10, 30, 45):
+        results[f'api_to_sg[{value}]'] = [conversions.api_to_sg(value)]
+        results[f'sg_to_api[{value / 50}]'] = [conversions.sg_to_api(value / 50)]
+        results[f'pressure_to_head[{value},0.84]'] = [conversions.pressure_to_head(value, 0.84)]
+        results[f'head_to_pressure[{value},0.84]'] = [conversions.head_to_pressure(value, 0.84)]
+        results[f'dynamic_to_kinematic[{value},870]'] = [conversions.dynamic_to_kinematic(value, 870)]
+        results[f'kinematic_to_dynamic[{value},870]'] = [conversions.kinematic_to_dynamic(value, 870)]
+
+    for from_unit, to_unit in (('bpd', 'm3/hr'), ('psi', 'kPa'), ('F', 'C'), ('cP', 'Pa*s'), ('hp', 'kW'),
+                               ('BTU/hr/ft2/F', 'W/m2/K')):
+        results[f'units.convert[{from_unit},{to_unit}]'] = [units.convert(v, from_unit, to_unit) for v in (1, 100)]
+
+    return {name: [float(v) for v in values] for name, values in results.items()}
+
+
+# Properties that must hold whatever the baseline says, as a list of messages (empty when all hold)
+def invariant_problems():
+    problems = []
+    # With every input fixed, every draw is the same value, so the summary must collapse onto it
+    fixed = uncertainty.run({'diameter_in': 12, 'flow_rate_bpd': 100000, 'roughness_ft': 0.00015,
+                             'viscosity_cst': 3.6, 'specific_gravity': 0.84, 'drag_reduction': 0.0}, {},
+                            draws=250_000, processes=1)
+    for quantity in uncertainty.QUANTITIES:
+        for method, summary in fixed[quantity].items():
+            values = {summary['mean'], summary['min'], summary['max'], *summary['percentile_values'].tolist()}
+            if len(values) != 1 or summary['std'] != 0:
+                problems.append(f'uncertainty.run[fixed inputs,{quantity},{method}]: mean, min, max and '
+                                f'percentiles differ or std is not 0')
+    # The line is always full: at any time, including partway through an injection, the batches in it add up
+    # to the line volume
+    tracker = line_fill.LineFill([4, 6], [23, 15.25], fill_product='Diesel')
+    for time, product, volume in ((4, 'Gasoline', 10000), (8, 'Jet', 8000), (14, 'Diesel', 15000),
+                                  (15, 'Gasoline', 500)):
+        tracker.inject(time, product, volume)
+    for time in np.linspace(0, 16, 65):
+        total = sum(batch['volume_bbl'] for batch in tracker.contents(time))
+        if not np.isclose(total, tracker.line_volume_bbl, rtol=1e-9):
+            problems.append(f'LineFill.contents[t={time:g}]: batches hold {total:,.1f} bbl in a line of '
+                            f'{tracker.line_volume_bbl:,.1f} bbl')
+    return problems
+
+
+# Differences against the stored baseline, as a list of messages (empty when everything matches)
+def compare_baseline(current, baseline):
+    problems = []
+    for name, expected in baseline.items():
+        if name not in current:
+            problems.append(f'{name}: missing from current results')
+            continue
+        actual = current[name]
+        if len(actual) != len(expected) or not np.allclose(actual, expected, rtol=BASELINE_RTOL, atol=0):
+            problems.append(f'{name}: expected {expected}, got {actual}')
+    for name in current.keys() - baseline.keys():
+        problems.append(f'{name}: not in baseline (run with --update-baseline)')
+    return problems
+
+
+# Best and median seconds per call, looping each repeat until it has run for at least min_time
+def measure(func, repeats=5, min_time=0.05):
+    func()  # warm-up
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+    times = [elapsed / loops]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        times.append((time.perf_counter() - start) / loops)
+    return min(times), statistics.median(times), loops
+
+
+def benchmark_cases(sizes):
+    import plotly
+
+    rng = np.random.default_rng(0)
+    largest = max(sizes)
+    diameter = rng.choice([4.026, 6.065, 7.981, 10.02, 11.938, 15.25, 19.25, 23.25], largest)
+    flow = rng.uniform(5_000, 400_000, largest)
+    roughness = np.full(largest, 0.00015)
+    viscosity = rng.uniform(0.8, 50, largest)
+    sg = rng.uniform(0.7, 0.95, largest)
+    drag_reduction = rng.uniform(0, 0.3, largest)
+    power = rng.uniform(10, 3000, largest)
+    voltage = rng.choice([240.0, 480.0, 4160.0], largest)
+    nps = rng.choice(pipe_schedule.NPS[:8], largest)
+    schedule = rng.choice(pipe_schedule.SCHEDULES, largest)
+
+    cases = []
+
+    # Callbacks, called the way Dash calls them. The result cache is on, so these measure repeat clicks;
+    # the compute_* entries below measure the uncached math.
+    cases.append(('callback calculate_pipeline_volume (cached)', 1,
+                  lambda: hydraulic_reference.calculate_pipeline_volume(1, '24', '0.5', '10')))
+    cases.append(('callback calculate_friction_factor (cached)', 1,
+                  lambda: hydraulic_reference.calculate_friction_factor(1, '12', '100,000', '0.00015', '0.84', '3.6', '0%')))
+    losses = hydraulic_reference.compute_friction_factor(12, 100000, 0.00015, 0.84, 3.6, 0.0)['pressure_losses']
+    cases.append(('friction_figure (full skeleton)', 1,
+                  lambda: json.dumps(hydraulic_reference.friction_figure(losses, False), cls=plotly.utils.PlotlyJSONEncoder)))
+    cases.append(('friction_figure (patch)', 1,
+                  lambda: json.dumps(hydraulic_reference.friction_figure(losses, True), cls=plotly.utils.PlotlyJSONEncoder)))
+    cases.append(('compute_friction_sweep (1,000 flows x 10 diameters + figure)', 10_000,
+                  lambda: hydraulic_reference.compute_friction_sweep(
+                      {'diameter_in': 12, 'flow_rate_bpd': 100000, 'roughness_ft': 0.00015, 'viscosity_cst': 3.6,
+                       'specific_gravity': 0.84, 'drag_reduction': 0.0},
+                      'flow_rate_bpd', (1000, 400000, 1000), 'diameter_in', (6, 24, 10))))
+    survey_mi = np.linspace(0, 300, 3001)
+    survey_ft = 500 + np.cumsum(rng.normal(0, 5, survey_mi.size))
+    station_od, station_wall, _ = pipe_schedule.gather(pipe_schedule.NPS[5:], 'STD')
+    cases.append(('optimize_stations (50 flows x 14 sizes, 3,001 survey points)', 700,
+                  lambda: pump_stations.optimize_stations(survey_mi, survey_ft, np.linspace(20_000, 400_000, 50),
+                                                          station_od, station_wall, 1440, 50, 0.00015, 3.6, 0.84)))
+    hours = np.arange(energy.HOURS_PER_YEAR)
+    cases.append(('simulate_pumping_energy (8,760 hours)', energy.HOURS_PER_YEAR,
+                  lambda: energy.simulate_pumping_energy(120000 + 40000 * np.sin(hours / 500), 15.25, 60, 0.00015, 3.6,
+                                                         0.84, 180000, 4000, static_head_psi=100, demand_charge=12)))
+    mc_fixed = {'diameter_in': 12, 'flow_rate_bpd': 100000, 'roughness_ft': 0.00015, 'viscosity_cst': 3.6,
+                'specific_gravity': 0.84, 'drag_reduction': 0.0}
+    mc_spread = {'roughness_ft': ('lognormal', 0.00015, 0.00005), 'viscosity_cst': ('normal', 3.6, 0.3),
+                 'specific_gravity': ('uniform', 0.84, 0.01)}
+    cases.append(('uncertainty.run (1,000,000 draws, 1 process)', 1_000_000,
+                  lambda: uncertainty.run(mc_fixed, mc_spread, processes=1)))
+    processes = uncertainty.default_processes()
+    if processes > 1:
+        uncertainty.run(mc_fixed, mc_spread, draws=processes, chunk_draws=1)  # Start the pool outside the timing
+        cases.append((f'uncertainty.run (1,000,000 draws, {processes} processes)', 1_000_000,
+                      lambda: uncertainty.run(mc_fixed, mc_spread, processes=processes)))
+    grid, grid_demand = grid_network(224, rng)
+    cases.append((f'network.solve ({grid.pipes:,} pipes, cold)', grid.pipes,
+                  lambda: grid.solve(grid_demand, warm_start=False)))
+    grid.solve(grid_demand)
+    cases.append((f'network.solve ({grid.pipes:,} pipes, demands changed, warm)', grid.pipes,
+                  lambda: grid.solve(grid_demand * rng.uniform(0.9, 1.1, grid_demand.size))))
+    cases.append(('transient.simulate (50 mi at 100 ft reaches, 300 s)', 2641,
+                  lambda: transient.simulate(50, 16, 0.375, 150000, 100, 0.00015, 3.6, 0.84, event_time_s=30,
+                                             duration_s=300, reach_ft=100)))
+    crude = rng.integers(0, 10, 1000)
+    def march_crudes():
+        a, b = thermal.walther_curves(40 + 2 * crude, 50 + 30 * crude, 120, 5 + crude)
+        return thermal.march(rng.uniform(20, 100, 1000), 15.25, rng.uniform(50_000, 200_000, 1000), 0.00015, 0.88,
+                             rng.uniform(100, 150, 1000), rng.uniform(35, 75, 1000), 0.3, a, b, segments=200)
+    cases.append(('thermal.march (1,000 cases x 200 segments, 10 crudes)', 200_000, march_crudes))
+    def track_batches(events=10_000):
+        tracker = line_fill.LineFill(np.full(1000, 1.0), np.full(1000, 19.25))
+        for k in range(events):
+            tracker.inject(k + 1, 'ABC'[k % 3], 5000)
+        for k in range(events):
+            tracker.product_at(k % 1000, k + 0.5)
+        return tracker
+    cases.append(('LineFill inject + product_at (10,000 each, 1,000 segments)', 20_000, track_batches))
+    cases.append(('callback calculate_energy_needs', 1,
+                  lambda: hydraulic_reference.calculate_energy_needs(1, 750, 220, 3, 0.98)))
+    cases.append(('compute_pipeline_volume', 1, lambda: hydraulic_reference.compute_pipeline_volume(24, 0.5, 10)))
+    cases.append(('compute_friction_factor (all methods)', 1,
+                  lambda: hydraulic_reference.compute_friction_factor(12, 100000, 0.00015, 0.84, 3.6, 0.0)))
+
+    # Page layouts: cold builds (layout caches cleared) and cached, both including JSON serialization
+    layout_functions = [getattr(hydraulic_reference, name) for name in dir(hydraulic_reference)
+                        if hasattr(getattr(hydraulic_reference, name), 'cache_clear')]
+
+    def render(path, cold):
+        if cold:
+            for function in layout_functions:
+                function.cache_clear()
+        return json.dumps(hydraulic_reference.display_page(path), cls=plotly.utils.PlotlyJSONEncoder)
+
+    for path in PAGES:
+        cases.append((f'display_page {path} (cold)', 1, lambda path=path: render(path, True)))
+        cases.append((f'display_page {path} (cached)', 1, lambda path=path: render(path, False)))
+
+    # Vectorized calculations at each batch size
+    for n in sizes:
+        cases.append(('pipe_volume', n, lambda n=n: hydraulics.pipe_volume(diameter[:n], flow[:n] / 1e4)))
+        for method in FRICTION_METHODS:
+            cases.append((f'friction_pressure_loss [{method}]', n, lambda n=n, method=method: hydraulics.friction_pressure_loss(
+                diameter[:n], flow[:n], roughness[:n], viscosity[:n], sg[:n], drag_reduction[:n], methods=(method,))))
+        cases.append(('pipe_schedule.gather', n, lambda n=n: pipe_schedule.gather(nps[:n], schedule[:n])))
+        cases.append(('inverse.max_flow_rate', n, lambda n=n: inverse.max_flow_rate(
+            diameter[:n], flow[:n] / 5000, roughness[:n], viscosity[:n], sg[:n], drag_reduction[:n])))
+        cases.append(('current_ideal', n, lambda n=n: current_ideal(power[:n], voltage[:n], 3, 0.95)))
+        # The conversion tabs run in the browser now; these are the same formulas used by the JSON API
+        cases.append(('api_to_sg', n, lambda n=n: conversions.api_to_sg(viscosity[:n])))
+        cases.append(('pressure_to_head', n, lambda n=n: conversions.pressure_to_head(power[:n], sg[:n])))
+        cases.append(('dynamic_to_kinematic', n, lambda n=n: conversions.dynamic_to_kinematic(viscosity[:n], sg[:n] * 1000)))
+        cases.append(('units.convert [bpd -> m3/hr]', n, lambda n=n: units.convert(flow[:n], 'bpd', 'm3/hr')))
+        cases.append(('units.convert [F -> C]', n, lambda n=n: units.convert(power[:n], 'F', 'C')))
+
+    return cases
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every calculation and callback')
+    parser.add_argument('--sizes', default='1,1000,100000', help='comma-separated batch sizes')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--json', help='write machine-readable results to this file')
+    parser.add_argument('--update-baseline', action='store_true', help='re-pin baseline.json to the current results')
+    args = parser.parse_args()
+
+    current = correctness_results()
+    if args.update_baseline or not os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(current, f, indent=1, sort_keys=True)
+        print(f'Wrote {len(current)} baseline entries to {BASELINE_PATH}')
+    else:
+        with open(BASELINE_PATH) as f:
+            problems = compare_baseline(current, json.load(f)) + invariant_problems()
+        if problems:
+            print('Results differ from the baseline:', *problems, sep='\n  ')
+            sys.exit(1)
+        print(f'Correctness baseline: {len(current)} entries match')
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = []
+    for name, n, func in benchmark_cases(sizes):
+        if args.filter and args.filter not in name:
+            continue
+        best, median, loops = measure(func, args.repeats)
+        results.append({'name': name, 'n': n, 'best_s': best, 'median_s': median, 'loops': loops,
+                        'per_item_us': best / n * 1e6})
+        print(f'{name:<55}{n:>9,}  {best * 1e3:>10.3f} ms  {best / n * 1e6:>10.3f} us/item')
+
+    if args.json:
+        report = {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'results': results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# Cold-start report: import time of the app and latency of the first requests a new worker serves.
+# Every run happens in a fresh interpreter so nothing is already imported or cached.
+# Run from the repository root:
+#
+#   python benchmarks/startup_report.py [--runs 5] [--json startup.json]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+
+FRICTION_OUTPUTS = [('ff-output', 'children'), ('ff-graph', 'figure'), ('ff-graph', 'style'),
+                    ('ff-figure-kind', 'data'), ('ff-job', 'data')]
+# Single-point mode settings sent along with every friction factor request
+FRICTION_MODE_STATE = [
+    ('ff-mode', 'value', 'single'), ('ff-sweep-variable', 'value', 'flow_rate_bpd'),
+    ('ff-sweep-start', 'value', '10,000'), ('ff-sweep-stop', 'value', '200,000'), ('ff-sweep-points', 'value', '100'),
+    ('ff-series-variable', 'value', 'none'), ('ff-series-start', 'value', '6'), ('ff-series-stop', 'value', '24'),
+    ('ff-series-points', 'value', '10'), ('ff-roughness-ft-distribution', 'value', 'lognormal'),
+    ('ff-roughness-ft-spread', 'value', '0.00005'), ('ff-viscosity-distribution', 'value', 'normal'),
+    ('ff-viscosity-spread', 'value', '0.3'), ('ff-specific-gravity-distribution', 'value', 'uniform'),
+    ('ff-specific-gravity-spread', 'value', '0.01'), ('ff-draws', 'value', '1,000,000'),
+    ('ff-length', 'value', '60'), ('ff-segments', 'value', '200'), ('ff-inlet-temperature', 'value', '130'),
+    ('ff-ground-temperature', 'value', '50'), ('ff-heat-transfer', 'value', '0.3'),
+    ('ff-specific-heat', 'value', '0.45'), ('ff-reference-1-temperature', 'value', '50'),
+    ('ff-reference-1-viscosity', 'value', '120'), ('ff-reference-2-temperature', 'value', '120'),
+    ('ff-reference-2-viscosity', 'value', '15'), ('ff-inverse-target', 'value', 'max-flow'),
+    ('ff-allowable-loss', 'value', '20'),
+]
+
+
+def _update_component_body(outputs, inputs, state=()):
+    # outputs is 'id.property' for a single output or a list of (id, property) pairs
+    if isinstance(outputs, str):
+        output_id, output_property = outputs.split('.')
+        output, outputs = outputs, {'id': output_id, 'property': output_property}
+    else:
+        output = '..' + '...'.join(f'{i}.{p}' for i, p in outputs) + '..'
+        outputs = [{'id': i, 'property': p} for i, p in outputs]
+    return {
+        'output': output,
+        'outputs': outputs,
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'changedPropIds': [f'{i}.{p}' for i, p, _ in inputs],
+        'state': [{'id': i, 'property': p, 'value': v} for i, p, v in state],
+    }
+
+
+# Runs inside the fresh interpreter and prints one JSON object of timings in milliseconds
+def child():
+    timings = {}
+    start = time.perf_counter()
+
+    def mark(name, since):
+        now = time.perf_counter()
+        timings[name] = (now - since) * 1000
+        return now
+
+    t = time.perf_counter()
+    import numpy  # noqa: F401
+    t = mark('import numpy', t)
+    import dash  # noqa: F401
+    t = mark('import dash', t)
+    import dash_bootstrap_components  # noqa: F401
+    t = mark('import dash_bootstrap_components', t)
+    import hydraulic_reference
+    t = mark('import hydraulic_reference (remainder)', t)
+    timings['import total'] = (t - start) * 1000
+
+    client = hydraulic_reference.server.test_client()
+    requests = [
+        ('GET /', lambda: client.get('/')),
+        ('GET /_dash-layout', lambda: client.get('/_dash-layout')),
+        ('GET /_dash-dependencies', lambda: client.get('/_dash-dependencies')),
+        ('display_page /fluid-flow', lambda: client.post('/_dash-update-component', json=_update_component_body(
+            'page-content.children', [('url', 'pathname', '/fluid-flow')]))),
+        ('display_page /fluid-flow (repeat)', lambda: client.post('/_dash-update-component', json=_update_component_body(
+            'page-content.children', [('url', 'pathname', '/fluid-flow')]))),
+        ('calculate_friction_factor', lambda: client.post('/_dash-update-component', json=_update_component_body(
+            FRICTION_OUTPUTS, [('ff-calculate-btn', 'n_clicks', 1)],
+            [('ff-diameter', 'value', '12'), ('ff-flow-rate', 'value', '100,000'),
+             ('ff-roughness-ft', 'value', '0.00015'), ('ff-specific-gravity', 'value', '0.84'),
+             ('ff-viscosity', 'value', '3.6'), ('ff-drag-reduction', 'value', '0%')] + FRICTION_MODE_STATE
+            + [('ff-figure-kind', 'data', None), ('ff-job', 'data', None)]))),
+        ('calculate_friction_factor (new inputs)', lambda: client.post('/_dash-update-component', json=_update_component_body(
+            FRICTION_OUTPUTS, [('ff-calculate-btn', 'n_clicks', 2)],
+            [('ff-diameter', 'value', '16'), ('ff-flow-rate', 'value', '150,000'),
+             ('ff-roughness-ft', 'value', '0.00015'), ('ff-specific-gravity', 'value', '0.84'),
+             ('ff-viscosity', 'value', '3.6'), ('ff-drag-reduction', 'value', '0%')] + FRICTION_MODE_STATE
+            + [('ff-figure-kind', 'data', 'bars'), ('ff-job', 'data', None)]))),
+    ]
+    for name, send in requests:
+        t = time.perf_counter()
+        response = send()
+        if response.status_code != 200:
+            raise RuntimeError(f'{name} returned HTTP {response.status_code}')
+        mark(name, t)
+    timings['first request total'] = sum(timings[name] for name, _ in requests)
+    print(json.dumps(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start import and first-request latency report')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to start (median is reported)')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], cwd=SRC_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    report = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'median_ms': {name: statistics.median(run[name] for run in runs) for name in runs[0]},
+        'max_ms': {name: max(run[name] for run in runs) for name in runs[0]},
+    }
+    for name, median in report['median_ms'].items():
+        print(f"{name:<45}{median:>10.1f} ms   (max {report['max_ms'][name]:.1f})")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        sys.path.insert(0, SRC_DIR)
+        child()
+    else:
+        main()
@@ -0,0 +1,467 @@
+# Versioned JSON API for headless calculations, served by the Dash app's Flask server.
+# Every endpoint takes a POST body that is either one case (a JSON object) or an array of cases,
+# and answers with one result object or an array of results in the same order. Arrays are evaluated
+# in a single vectorized pass, with no Dash component trees or Plotly figures involved.
+#
+#   POST /api/v1/pipeline-volume     diameter_in, wall_thickness_in, distance_mi
+#   POST /api/v1/pressure-loss       diameter_in, flow_rate_bpd, roughness_ft, viscosity_cst, specific_gravity,
+#                                    drag_reduction_pct (default 0)
+#   POST /api/v1/max-flow            diameter_in, allowable_psi_per_mile, roughness_ft, viscosity_cst,
+#                                    specific_gravity, drag_reduction_pct (default 0): the largest flow within
+#                                    the pressure budget, per method
+#   POST /api/v1/drag-reduction      diameter_in, flow_rate_bpd, allowable_psi_per_mile, roughness_ft,
+#                                    viscosity_cst, specific_gravity, max_drag_reduction_pct (default 70): the
+#                                    drag reduction needed to move the flow within the pressure budget, per
+#                                    method, and whether it is within the maximum
+#   POST /api/v1/current             power_kw, voltage, phase (default 3), power_factor (default 1)
+#   POST /api/v1/convert/<name>      api-to-sg, sg-to-api, pressure-to-head, head-to-pressure,
+#                                    dynamic-to-kinematic, kinematic-to-dynamic
+#   POST /api/v1/convert/units       value, from_unit, to_unit (e.g. "bpd" to "m3/hr", "psi" to "kPa", "F" to
+#                                    "C"; see units.py); each distinct unit pair is resolved once and its
+#                                    values converted as one column
+#   POST /api/v1/line-fill           one object: segments [{length_mi, inner_diameter_in}], fill_product,
+#                                    events [{time, product, volume_bbl}], queries [{milepost, time}]
+#   POST /api/v1/network             one object: nodes [{elevation_ft (default 0), demand_bpd (default 0),
+#                                    fixed_pressure_psi (omit where solved for)}], pipes [{from_node, to_node,
+#                                    length_mi, inner_diameter_in, roughness_ft (default 0.00015)}] with ends
+#                                    given as node numbers, viscosity_cst, specific_gravity, drag_reduction_pct
+#                                    (default 0), method (default Colebrook-White), initial_flow_bpd (optional
+#                                    per-pipe flows from an earlier answer, to start from)
+#   POST /api/v1/surge               one object: length_mi, od_in and wall_in (or nps and schedule),
+#                                    flow_rate_bpd, outlet_pressure_psi, roughness_ft, viscosity_cst,
+#                                    specific_gravity, drag_reduction_pct (default 0), event (valve-closure or
+#                                    pump-trip), event_time_s, duration_s, reach_ft, closure_exponent,
+#                                    valve_drop_psi, bulk_modulus_psi, profile [{milepost, elevation_ft}]
+#   POST /api/v1/thermal             diameter_in, flow_rate_bpd, length_mi, roughness_ft, specific_gravity,
+#                                    drag_reduction_pct (default 0), inlet_temperature_f, ground_temperature_f,
+#                                    heat_transfer (BTU/hr ft^2 °F), specific_heat (default 0.45), viscosity
+#                                    reference points temperature_1_f, viscosity_1_cst, temperature_2_f,
+#                                    viscosity_2_cst; segments (default 100) and method apply to the whole body
+#
+# pipeline-volume, pressure-loss, max-flow, drag-reduction and thermal also take nps and schedule (e.g. "nps": 12, "schedule": "STD") in place of
+# the pipe dimensions, which are then looked up from the pipe schedule table.
+
+import numpy as np
+from flask import Blueprint, jsonify, request
+
+import conversions
+import hydraulics
+import inverse
+import line_fill
+import network
+import pipe_schedule
+import thermal
+import transient
+import units
+from energy import current_ideal
+
+blueprint = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+class ApiError(Exception):
+    pass
+
+
+@blueprint.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({'error': str(error)}), 400
+
+
+# The request body as a list of case dicts, and whether it was one object rather than an array
+def read_body():
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        return [payload], True
+    if isinstance(payload, list) and payload and all(isinstance(case, dict) for case in payload):
+        return payload, False
+    raise ApiError('Request body must be a JSON object or a non-empty array of objects.')
+
+
+# Pull the named numeric fields out of the request body as arrays, one element per case.
+# Returns (columns, single) where single says the body was one object rather than an array.
+def read_cases(fields, defaults=None):
+    cases, single = read_body()
+    return numeric_columns(cases, fields, defaults), single
+
+
+def numeric_columns(cases, fields, defaults=None):
+    defaults = defaults or {}
+    columns = {}
+    for field in fields:
+        values = [case.get(field, defaults.get(field)) for case in cases]
+        if any(value is None for value in values):
+            raise ApiError(f"'{field}' is required.")
+        columns[field] = number_array(values, field)
+    return columns
+
+
+# One number per element of values as a 1-D float array; nested arrays and objects are rejected rather than
+# turning into extra dimensions
+def number_array(values, field):
+    try:
+        array = np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        raise ApiError(f"'{field}' must be a number.")
+    if array.ndim != 1:
+        raise ApiError(f"'{field}' must be a number.")
+    return array
+
+
+# A name field of a case (method, event, product), with its default when absent
+def text_field(case, field, default):
+    value = case.get(field, default)
+    if not isinstance(value, str):
+        raise ApiError(f"'{field}' must be a string.")
+    return value
+
+
+# (outside diameter, wall thickness, inside diameter) arrays for the cases, from nps/schedule when given,
+# otherwise None so the caller reads its own dimension fields
+def pipe_dimensions(cases):
+    if not any('nps' in case for case in cases):
+        return None
+    for field in ('nps', 'schedule'):
+        if any(case.get(field) is None for case in cases):
+            raise ApiError(f"'{field}' is required when any case gives an nps.")
+        if any(isinstance(case[field], (list, dict)) for case in cases):
+            raise ApiError(f"'{field}' must be a single value.")
+    try:
+        return pipe_schedule.gather([case['nps'] for case in cases], [case['schedule'] for case in cases])
+    except ValueError as e:
+        raise ApiError(str(e))
+
+
+# JSON response from a dict of equal-length result arrays (or nested dicts of them)
+def respond(outputs, single):
+    lists = _to_lists(outputs)
+    if single:
+        return jsonify(_pick(lists, 0))
+    n = len(next(iter(_leaves(lists))))
+    return jsonify([_pick(lists, i) for i in range(n)])
+
+
+def _to_lists(outputs):
+    if isinstance(outputs, dict):
+        return {key: _to_lists(value) for key, value in outputs.items()}
+    values = np.atleast_1d(outputs)
+    if values.dtype.kind == 'f':
+        # NaN and inf aren't valid JSON
+        return [value if np.isfinite(value) else None for value in values.tolist()]
+    return values.tolist()
+
+
+def _leaves(lists):
+    for value in lists.values():
+        if isinstance(value, dict):
+            yield from _leaves(value)
+        else:
+            yield value
+
+
+def _pick(lists, i):
+    return {key: _pick(value, i) if isinstance(value, dict) else value[i] for key, value in lists.items()}
+
+
+@blueprint.route('/pipeline-volume', methods=['POST'])
+def pipeline_volume():
+    cases, single = read_body()
+    columns = numeric_columns(cases, ('distance_mi',))
+    dimensions = pipe_dimensions(cases)
+    if dimensions is None:
+        columns.update(numeric_columns(cases, ('diameter_in', 'wall_thickness_in')))
+        inner_diameter_in = columns['diameter_in'] - 2 * columns['wall_thickness_in']
+    else:
+        inner_diameter_in = dimensions[2]
+    volume_cuft, volume_bbl = hydraulics.pipe_volume(inner_diameter_in, columns['distance_mi'])
+    return respond({'volume_cuft': volume_cuft, 'volume_bbl': volume_bbl}, single)
+
+
+@blueprint.route('/pressure-loss', methods=['POST'])
+def pressure_loss():
+    cases, single = read_body()
+    columns = numeric_columns(
+        cases, ('flow_rate_bpd', 'roughness_ft', 'viscosity_cst', 'specific_gravity', 'drag_reduction_pct'),
+        defaults={'drag_reduction_pct': 0.0}
+    )
+    dimensions = pipe_dimensions(cases)
+    if dimensions is None:
+        diameter_in = numeric_columns(cases, ('diameter_in',))['diameter_in']
+    else:
+        diameter_in = dimensions[2]
+    with np.errstate(all='ignore'):
+        result = hydraulics.friction_pressure_loss(
+            diameter_in, columns['flow_rate_bpd'], columns['roughness_ft'], columns['viscosity_cst'],
+            columns['specific_gravity'], columns['drag_reduction_pct'] / 100
+        )
+    return respond({
+        'velocity_fps': result['velocity_fps'],
+        'reynolds_number': result['reynolds_number'],
+        'flow_regime': result['flow_regime'],
+        'friction_factors': result['friction_factors'],
+        'pressure_loss_psi_per_mile': result['pressure_loss_psi_per_mile'],
+    }, single)
+
+
+# Inside diameters of the cases, from nps/schedule or diameter_in
+def _inside_diameters(cases):
+    dimensions = pipe_dimensions(cases)
+    if dimensions is None:
+        return numeric_columns(cases, ('diameter_in',))['diameter_in']
+    return dimensions[2]
+
+
+@blueprint.route('/max-flow', methods=['POST'])
+def max_flow():
+    cases, single = read_body()
+    columns = numeric_columns(
+        cases, ('allowable_psi_per_mile', 'roughness_ft', 'viscosity_cst', 'specific_gravity', 'drag_reduction_pct'),
+        defaults={'drag_reduction_pct': 0.0}
+    )
+    diameter_in = _inside_diameters(cases)
+    try:
+        results = {method: inverse.max_flow_rate(diameter_in, columns['allowable_psi_per_mile'],
+                                                 columns['roughness_ft'], columns['viscosity_cst'],
+                                                 columns['specific_gravity'], columns['drag_reduction_pct'] / 100,
+                                                 method=method)
+                   for method in hydraulics.METHODS}
+    except ValueError as e:
+        raise ApiError(str(e))
+    return respond({
+        'max_flow_rate_bpd': {method: result['flow_rate_bpd'] for method, result in results.items()},
+        'velocity_fps': {method: result['velocity_fps'] for method, result in results.items()},
+        'reynolds_number': {method: result['reynolds_number'] for method, result in results.items()},
+        'converged': {method: result['converged'] for method, result in results.items()},
+    }, single)
+
+
+@blueprint.route('/drag-reduction', methods=['POST'])
+def drag_reduction():
+    cases, single = read_body()
+    columns = numeric_columns(
+        cases, ('flow_rate_bpd', 'allowable_psi_per_mile', 'roughness_ft', 'viscosity_cst', 'specific_gravity',
+                'max_drag_reduction_pct'),
+        defaults={'max_drag_reduction_pct': inverse.MAX_DRAG_REDUCTION * 100}
+    )
+    diameter_in = _inside_diameters(cases)
+    with np.errstate(all='ignore'):
+        results = {method: inverse.required_drag_reduction(diameter_in, columns['flow_rate_bpd'],
+                                                           columns['allowable_psi_per_mile'], columns['roughness_ft'],
+                                                           columns['viscosity_cst'], columns['specific_gravity'],
+                                                           method=method,
+                                                           max_drag_reduction=columns['max_drag_reduction_pct'] / 100)
+                   for method in hydraulics.METHODS}
+    return respond({
+        'drag_reduction_pct': {method: result['drag_reduction'] * 100 for method, result in results.items()},
+        'pressure_loss_psi_per_mile': {method: result['pressure_loss_psi_per_mile']
+                                       for method, result in results.items()},
+        'feasible': {method: result['feasible'] for method, result in results.items()},
+    }, single)
+
+
+@blueprint.route('/current', methods=['POST'])
+def current():
+    columns, single = read_cases(('power_kw', 'voltage', 'phase', 'power_factor'),
+                                 defaults={'phase': 3, 'power_factor': 1})
+    try:
+        amps = current_ideal(columns['power_kw'], columns['voltage'], columns['phase'], columns['power_factor'])
+    except ValueError as e:
+        raise ApiError(str(e))
+    return respond({'current_a': amps}, single)
+
+
+# Thermal-hydraulic march for every case at once; cases sharing viscosity reference points share one fit
+@blueprint.route('/thermal', methods=['POST'])
+def thermal_march():
+    cases, single = read_body()
+    columns = numeric_columns(
+        cases, ('flow_rate_bpd', 'length_mi', 'roughness_ft', 'specific_gravity', 'drag_reduction_pct',
+                'inlet_temperature_f', 'ground_temperature_f', 'heat_transfer', 'specific_heat', 'temperature_1_f',
+                'viscosity_1_cst', 'temperature_2_f', 'viscosity_2_cst'),
+        defaults={'drag_reduction_pct': 0.0, 'specific_heat': thermal.SPECIFIC_HEAT_BTU_LB_F}
+    )
+    dimensions = pipe_dimensions(cases)
+    if dimensions is None:
+        diameter_in = numeric_columns(cases, ('diameter_in',))['diameter_in']
+    else:
+        diameter_in = dimensions[2]
+    segments = numeric_columns([cases[0]], ('segments',), {'segments': 100})['segments'][0]
+    try:
+        a, b = thermal.walther_curves(columns['temperature_1_f'], columns['viscosity_1_cst'],
+                                      columns['temperature_2_f'], columns['viscosity_2_cst'])
+        result = thermal.march(columns['length_mi'], diameter_in, columns['flow_rate_bpd'], columns['roughness_ft'],
+                               columns['specific_gravity'], columns['inlet_temperature_f'],
+                               columns['ground_temperature_f'], columns['heat_transfer'], a, b,
+                               columns['specific_heat'], columns['drag_reduction_pct'] / 100, segments,
+                               text_field(cases[0], 'method', 'Colebrook-White'))
+    except ValueError as e:
+        raise ApiError(str(e))
+    return respond({
+        'outlet_temperature_f': result['outlet_temperature_f'],
+        'inlet_viscosity_cst': result['inlet_viscosity_cst'],
+        'outlet_viscosity_cst': result['outlet_viscosity_cst'],
+        'min_reynolds_number': result['reynolds_number'].min(axis=0),
+        'pressure_loss_psi': result['total_pressure_loss_psi'],
+    }, single)
+
+
+# name -> (conversion function, input fields, output field)
+CONVERSIONS = {
+    'api-to-sg': (conversions.api_to_sg, ('api',), 'specific_gravity'),
+    'sg-to-api': (conversions.sg_to_api, ('specific_gravity',), 'api'),
+    'pressure-to-head': (conversions.pressure_to_head, ('pressure_psi', 'specific_gravity'), 'head_ft'),
+    'head-to-pressure': (conversions.head_to_pressure, ('head_ft', 'specific_gravity'), 'pressure_psi'),
+    'dynamic-to-kinematic': (conversions.dynamic_to_kinematic, ('dynamic_cp', 'density_kg_m3'), 'kinematic_cst'),
+    'kinematic-to-dynamic': (conversions.kinematic_to_dynamic, ('kinematic_cst', 'density_kg_m3'), 'dynamic_cp'),
+}
+
+
+@blueprint.route('/convert/<name>', methods=['POST'])
+def convert(name):
+    if name not in CONVERSIONS:
+        return jsonify({'error': f"Unknown conversion '{name}'. Choose from: {', '.join(CONVERSIONS)}"}), 404
+    function, fields, output = CONVERSIONS[name]
+    columns, single = read_cases(fields)
+    with np.errstate(all='ignore'):
+        values = function(*(columns[field] for field in fields))
+    return respond({output: values}, single)
+
+
+@blueprint.route('/convert/units', methods=['POST'])
+def convert_units():
+    cases, single = read_body()
+    values = numeric_columns(cases, ('value',))['value']
+    pairs = []
+    for case in cases:
+        pair = (case.get('from_unit'), case.get('to_unit'))
+        if not all(isinstance(unit, str) for unit in pair):
+            raise ApiError("'from_unit' and 'to_unit' are required.")
+        pairs.append(pair)
+    converted = np.empty_like(values)
+    groups = {}
+    for i, pair in enumerate(pairs):
+        groups.setdefault(pair, []).append(i)
+    for (from_unit, to_unit), rows in groups.items():
+        try:
+            converted[rows] = units.convert(values[rows], from_unit, to_unit)
+        except ValueError as e:
+            raise ApiError(str(e))
+    return respond({'value': converted, 'unit': np.array([to_unit for _, to_unit in pairs])}, single)
+
+
+# Batch tracking: replays the injection events and answers what is at each queried milepost and time
+@blueprint.route('/line-fill', methods=['POST'])
+def line_fill_tracking():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ApiError('Request body must be a JSON object.')
+    try:
+        segments = payload['segments']
+        tracker = line_fill.LineFill([float(s['length_mi']) for s in segments],
+                                     [float(s['inner_diameter_in']) for s in segments],
+                                     fill_product=text_field(payload, 'fill_product', 'Unknown'))
+        deliveries = [
+            [{'product': product, 'volume_bbl': barrels}
+             for product, barrels in tracker.inject(float(event['time']), text_field(event, 'product', None),
+                                                    float(event['volume_bbl']))]
+            for event in payload.get('events', [])
+        ]
+        answers = [{'milepost': float(q['milepost']), 'time': float(q['time']),
+                    'product': tracker.product_at(float(q['milepost']), float(q['time']))}
+                   for q in payload.get('queries', [])]
+    except (KeyError, TypeError):
+        raise ApiError("'segments' (with length_mi and inner_diameter_in), 'events' (with time, product and "
+                       "volume_bbl) and 'queries' (with milepost and time) are required in that form.")
+    except ValueError as e:
+        raise ApiError(str(e))
+    return jsonify({
+        'line_volume_bbl': tracker.line_volume_bbl,
+        'deliveries': deliveries,
+        'contents': tracker.contents(),
+        'answers': answers,
+    })
+
+
+# Looped network: flows in every pipe and pressures at every node
+@blueprint.route('/network', methods=['POST'])
+def network_solution():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ApiError('Request body must be a JSON object.')
+    nodes, pipes = payload.get('nodes'), payload.get('pipes')
+    if not isinstance(nodes, list) or not nodes or not isinstance(pipes, list) or not pipes:
+        raise ApiError("'nodes' and 'pipes' must be non-empty arrays of objects.")
+    if not all(isinstance(case, dict) for case in nodes + pipes):
+        raise ApiError("'nodes' and 'pipes' must be non-empty arrays of objects.")
+    node_columns = numeric_columns(nodes, ('elevation_ft', 'demand_bpd', 'fixed_pressure_psi'),
+                                   {'elevation_ft': 0.0, 'demand_bpd': 0.0, 'fixed_pressure_psi': np.nan})
+    dimensions = pipe_dimensions(pipes)
+    fields = ('from_node', 'to_node', 'length_mi', 'roughness_ft') + (() if dimensions else ('inner_diameter_in',))
+    pipe_columns = numeric_columns(pipes, fields, {'roughness_ft': 0.00015})
+    inner_diameter_in = dimensions[2] if dimensions else pipe_columns['inner_diameter_in']
+    fluid = numeric_columns([payload], ('viscosity_cst', 'specific_gravity', 'drag_reduction_pct'),
+                            {'drag_reduction_pct': 0.0})
+    ends = np.concatenate([pipe_columns['from_node'], pipe_columns['to_node']])
+    if np.any(ends != np.round(ends)):
+        raise ApiError("'from_node' and 'to_node' must be node numbers.")
+    initial = payload.get('initial_flow_bpd')
+    if initial is not None:
+        if not isinstance(initial, list) or len(initial) != len(pipes):
+            raise ApiError("'initial_flow_bpd' must have one flow per pipe.")
+        initial = number_array(initial, 'initial_flow_bpd')
+    try:
+        net = network.Network(pipe_columns['from_node'], pipe_columns['to_node'], pipe_columns['length_mi'],
+                               inner_diameter_in, node_columns['elevation_ft'], node_columns['fixed_pressure_psi'],
+                               pipe_columns['roughness_ft'], fluid['viscosity_cst'][0], fluid['specific_gravity'][0],
+                               fluid['drag_reduction_pct'][0] / 100, text_field(payload, 'method', 'Colebrook-White'))
+        result = net.solve(node_columns['demand_bpd'],
+                           initial=None if initial is None else {'flow_bpd': initial})
+    except (TypeError, ValueError) as e:
+        raise ApiError(str(e))
+    return jsonify({
+        'nodes': _to_lists({key: result[key] for key in ('pressure_psi', 'hydraulic_grade_ft', 'supply_bpd')}),
+        'pipes': _to_lists({key: result[key] for key in ('flow_bpd', 'velocity_fps', 'friction_loss_psi')}),
+        'iterations': result['iterations'],
+        'converged': result['converged'],
+        'imbalance_bpd': result['imbalance_bpd'],
+    })
+
+
+# Surge transient: pressure envelopes along the line and pressure traces at its ends
+@blueprint.route('/surge', methods=['POST'])
+def surge():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ApiError('Request body must be a JSON object.')
+    dimensions = pipe_dimensions([payload])
+    fields = ('length_mi', 'flow_rate_bpd', 'outlet_pressure_psi', 'roughness_ft', 'viscosity_cst',
+              'specific_gravity', 'drag_reduction_pct', 'event_time_s', 'duration_s', 'reach_ft', 'closure_exponent',
+              'valve_drop_psi', 'bulk_modulus_psi') + (() if dimensions else ('od_in', 'wall_in'))
+    columns = numeric_columns([payload], fields, {
+        'drag_reduction_pct': 0.0, 'event_time_s': 10.0, 'duration_s': 300.0, 'reach_ft': 500.0,
+        'closure_exponent': 1.0, 'valve_drop_psi': 5.0, 'bulk_modulus_psi': transient.BULK_MODULUS_PSI})
+    values = {field: float(column[0]) for field, column in columns.items()}
+    od_in, wall_in = (float(dimensions[0][0]), float(dimensions[1][0])) if dimensions else (values['od_in'],
+                                                                                           values['wall_in'])
+    profile = payload.get('profile')
+    if profile is not None:
+        if not isinstance(profile, list) or len(profile) < 2 or not all(isinstance(p, dict) for p in profile):
+            raise ApiError("'profile' must be an array of at least two {milepost, elevation_ft} objects.")
+        profile = numeric_columns(profile, ('milepost', 'elevation_ft'))
+    try:
+        result = transient.simulate(
+            values['length_mi'], od_in, wall_in, values['flow_rate_bpd'], values['outlet_pressure_psi'],
+            values['roughness_ft'], values['viscosity_cst'], values['specific_gravity'],
+            values['drag_reduction_pct'] / 100, text_field(payload, 'event', 'valve-closure'), values['event_time_s'],
+            values['closure_exponent'], values['duration_s'], values['reach_ft'], values['valve_drop_psi'],
+            None if profile is None else profile['milepost'], None if profile is None else profile['elevation_ft'],
+            values['bulk_modulus_psi'], text_field(payload, 'method', 'Colebrook-White'))
+    except ValueError as e:
+        raise ApiError(str(e))
+    envelope = ('milepost', 'elevation_ft', 'steady_pressure_psi', 'max_pressure_psi', 'min_pressure_psi',
+                'max_pressure_time_s')
+    traces = ('trace_time_s', 'inlet_pressure_psi', 'outlet_pressure_psi')
+    return jsonify({
+        'envelope': _to_lists({key: result[key] for key in envelope}),
+        'traces': _to_lists({key: result[key] for key in traces}),
+        **{key: value for key, value in result.items() if key not in envelope + traces},
+    })
@@ -0,0 +1,123 @@
+// Clientside callbacks for the Unit Conversions tabs.
+// Each converter mirrors the behavior of the old server callbacks: whichever input the user typed in
+// drives the other one, and invalid input opens the tab's error alert and leaves both values unchanged.
+// Unit factors come from the server's unit registry (units.py) through the unit-factors store.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    conversions: {
+        // Degrees API <-> Specific Gravity
+        apiToSg: function(api, sg) {
+            const inputId = triggeredId();
+            if (!inputId) {
+                return [api, sg, '', false];
+            }
+            if (inputId === 'api-value') {
+                if (isMissing(api)) {
+                    return [api, sg, 'Please enter a valid API value.', true];
+                }
+                return [api, roundTo(141.5 / (131.5 + api), 4), '', false];
+            }
+            if (inputId === 'sg-value') {
+                if (isMissing(sg) || sg === 0) {
+                    return [api, sg, 'Specific Gravity cannot be zero.', true];
+                }
+                return [roundTo(141.5 / sg - 131.5, 2), sg, '', false];
+            }
+            return [api, sg, '', false];
+        },
+
+        // Pressure (psi) <-> Head (ft)
+        pressureToHead: function(pressure, head, sg, factors) {
+            const inputId = triggeredId();
+            if (!inputId) {
+                return [pressure, head, '', false];
+            }
+            if (isMissing(sg) || sg === 0) {
+                return [pressure, head, 'Specific Gravity cannot be zero.', true];
+            }
+            if (inputId === 'pressure-value') {
+                if (isMissing(pressure)) {
+                    return [pressure, head, 'Please enter a valid pressure value.', true];
+                }
+                return [pressure, roundTo((pressure * factors.ftHeadPerPsi) / sg, 2), '', false];
+            }
+            if (inputId === 'head-value') {
+                if (isMissing(head)) {
+                    return [pressure, head, 'Please enter a valid head value.', true];
+                }
+                return [roundTo((head * sg) / factors.ftHeadPerPsi, 2), head, '', false];
+            }
+            return [pressure, head, '', false];
+        },
+
+        // Dynamic (cP) <-> Kinematic (cSt) viscosity
+        dynamicToKinematic: function(dynamicViscosity, kinematicViscosity, density, factors) {
+            const inputId = triggeredId();
+            if (!inputId) {
+                return [dynamicViscosity, kinematicViscosity, '', false];
+            }
+            if (isMissing(density) || density === 0) {
+                return [dynamicViscosity, kinematicViscosity, 'Density cannot be zero.', true];
+            }
+            if (inputId === 'dynamic-viscosity') {
+                if (isMissing(dynamicViscosity)) {
+                    return [dynamicViscosity, kinematicViscosity, 'Please enter a valid dynamic viscosity.', true];
+                }
+                return [dynamicViscosity, roundTo((dynamicViscosity / density) * factors.cstPerCpM3Kg, 2), '', false];
+            }
+            if (inputId === 'kinematic-viscosity') {
+                if (isMissing(kinematicViscosity)) {
+                    return [dynamicViscosity, kinematicViscosity, 'Please enter a valid kinematic viscosity.', true];
+                }
+                return [roundTo((kinematicViscosity * density) / factors.cstPerCpM3Kg, 2), kinematicViscosity, '', false];
+            }
+            return [dynamicViscosity, kinematicViscosity, '', false];
+        },
+
+        // Unit choices for a quantity: the first two are preselected
+        unitOptions: function(dimension, factors) {
+            const symbols = Object.keys(factors.units[dimension]);
+            return [symbols, symbols[0], symbols, symbols[1]];
+        },
+
+        // Any unit <-> any unit of the same quantity. Each unit's [scale, offset] takes it to the quantity's
+        // first unit; changing a unit recalculates the To value
+        convertUnits: function(fromValue, toValue, fromUnit, toUnit, dimension, factors) {
+            const table = factors.units[dimension];
+            const from = table[fromUnit];
+            const to = table[toUnit];
+            if (!from || !to) {
+                return [fromValue, toValue, '', false];
+            }
+            if (triggeredId() === 'units-to-value') {
+                if (isMissing(toValue)) {
+                    return [fromValue, toValue, 'Please enter a valid value.', true];
+                }
+                return [roundTo(((toValue * to[0] + to[1]) - from[1]) / from[0], 6), toValue, '', false];
+            }
+            if (isMissing(fromValue)) {
+                return [fromValue, toValue, 'Please enter a valid value.', true];
+            }
+            return [fromValue, roundTo(((fromValue * from[0] + from[1]) - to[1]) / to[0], 6), '', false];
+        }
+    }
+});
+
+// Id of the input that fired the callback, or null on the initial call
+function triggeredId() {
+    const triggered = window.dash_clientside.callback_context.triggered;
+    if (!triggered || triggered.length === 0) {
+        return null;
+    }
+    const inputId = triggered[0].prop_id.split('.')[0];
+    return inputId || null;
+}
+
+function isMissing(value) {
+    return value === null || value === undefined || value === '' || Number.isNaN(value);
+}
+
+function roundTo(value, digits) {
+    const scale = Math.pow(10, digits);
+    return Math.round(value * scale) / scale;
+}
@@ -0,0 +1,252 @@
+# Batch CSV processing for the Pipeline Volume and Fluid Flow calculators.
+# An uploaded CSV (the base64 data URL dcc.Upload hands us) is decoded and parsed a chunk of rows at a
+# time, each chunk runs through the vectorized calculations, and the results are appended to an output
+# CSV on disk. Neither the decoded file nor the full set of results is ever held in memory at once.
+# Columns are named with their unit (diameter_in, flow_rate_bpd); a file may give one in another unit of the
+# same kind instead (diameter_mm, flow_rate_m3/hr), and the whole column is converted as it is parsed.
+
+import base64
+import codecs
+import csv
+import os
+import tempfile
+
+import numpy as np
+
+import hydraulics
+import units
+
+CHUNK_ROWS = 10_000
+_DECODE_CHARS = 4 * 64 * 1024  # base64 characters decoded per step (a multiple of 4)
+
+
+def _pipeline_volume_chunk(columns):
+    inner_diameter = columns['diameter_in'] - 2 * columns['wall_thickness_in']
+    volume_cuft, volume_bbl = hydraulics.pipe_volume(inner_diameter, columns['distance_mi'])
+    return {'volume_cuft': volume_cuft, 'volume_bbl': volume_bbl}
+
+
+def _pressure_loss_chunk(columns):
+    result = hydraulics.friction_pressure_loss(
+        columns['diameter_in'], columns['flow_rate_bpd'], columns['roughness_ft'], columns['viscosity_cst'],
+        columns['specific_gravity'], columns['drag_reduction_pct'] / 100
+    )
+    outputs = {
+        'velocity_fps': result['velocity_fps'],
+        'reynolds_number': result['reynolds_number'],
+        'flow_regime': result['flow_regime'],
+    }
+    for method in hydraulics.METHODS:
+        key = method.lower().replace('-', '_')
+        outputs[f'f_{key}'] = result['friction_factors'][method]
+        outputs[f'psi_per_mile_{key}'] = result['pressure_loss_psi_per_mile'][method]
+    return outputs
+
+
+# Batch kinds: required input columns, optional columns with defaults, and the chunk calculation
+BATCH_KINDS = {
+    'pipeline-volume': {
+        'columns': ('diameter_in', 'wall_thickness_in', 'distance_mi'),
+        'defaults': {},
+        'compute': _pipeline_volume_chunk,
+    },
+    'pressure-loss': {
+        'columns': ('diameter_in', 'flow_rate_bpd', 'roughness_ft', 'viscosity_cst', 'specific_gravity',
+                    'drag_reduction_pct'),
+        'defaults': {'drag_reduction_pct': 0.0},
+        'compute': _pressure_loss_chunk,
+    },
+}
+
+
+# Text lines of a base64 data URL, decoded a block at a time
+def iter_data_url_lines(contents):
+    position = contents.index(',') + 1  # Skip the "data:<type>;base64," prefix without copying the payload
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    pending = ''
+    while position < len(contents):
+        block = contents[position:position + _DECODE_CHARS]
+        position += _DECODE_CHARS
+        text = pending + decoder.decode(base64.b64decode(block), final=position >= len(contents))
+        lines = text.splitlines(keepends=True)
+        # Hold back a trailing partial line until the next block completes it
+        pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _parse_column(values):
+    # Fast path: NumPy parses plain numeric strings directly; then retry with commas and % stripped
+    for attempt in (values, [value.replace(',', '').replace('%', '') for value in values]):
+        try:
+            return np.array(attempt, dtype=float), np.zeros(len(values), dtype=bool)
+        except ValueError:
+            pass
+
+    # Something in this chunk isn't a number; parse value by value to find which rows
+    parsed = np.empty(len(values))
+    bad = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = float(value.replace(',', '').replace('%', '').strip())
+        except ValueError:
+            parsed[i] = np.nan
+            bad[i] = True
+    return parsed, bad
+
+
+# Column values as CSV-ready strings; floats are written to 10 significant digits
+def _format_column(values):
+    if values.dtype.kind == 'f':
+        return ['%.10g' % value for value in values.tolist()]
+    return values.tolist()
+
+
+# Where each wanted column is in a normalized header: column -> (position, (from unit, to unit) or None).
+# A column named stem_unit that isn't in the header is matched to a stem_<other unit> header of the same
+# dimension. Columns found neither way are left out.
+def _locate_columns(normalized, columns):
+    found = {}
+    for column in columns:
+        if column in normalized:
+            found[column] = (normalized.index(column), None)
+            continue
+        stem, _, unit = column.rpartition('_')
+        # Rates per unit (rate_per_kwh) don't convert like the unit itself
+        target = units.lookup(unit) if stem and not stem.endswith('_per') else None
+        if target is None:
+            continue
+        for i, name in enumerate(normalized):
+            source = units.lookup(name[len(stem) + 1:]) if name.startswith(stem + '_') else None
+            if source is not None and units.resolve(source)[2] == units.resolve(target)[2]:
+                found[column] = (i, (source, target))
+                break
+    return found
+
+
+# Run one batch kind over CSV lines, writing the input columns plus results to output_path.
+# Rows that fail to parse or produce non-finite results are kept with an error message.
+# Returns the number of rows processed and the number with errors.
+# progress, when given, is called with the number of rows done after each chunk
+def process_csv_lines(lines, kind, output_path, chunk_rows=CHUNK_ROWS, progress=None):
+    spec = BATCH_KINDS[kind]
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError('The uploaded file is empty.')
+    normalized = [name.strip().lower() for name in header]
+    index = _locate_columns(normalized, spec['columns'])
+    missing = [c for c in spec['columns'] if c not in index and c not in spec['defaults']]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    total_rows = 0
+    error_rows = 0
+    with open(output_path, 'w', newline='') as output:
+        writer = csv.writer(output)
+        header_written = False
+        while True:
+            rows = []
+            for row in reader:
+                if any(cell.strip() for cell in row):
+                    rows.append(row)
+                    if len(rows) == chunk_rows:
+                        break
+            if not rows:
+                break
+
+            # Parse the chunk column by column
+            columns = {}
+            bad = np.zeros(len(rows), dtype=bool)
+            for column in spec['columns']:
+                if column in index:
+                    i, conversion = index[column]
+                    columns[column], column_bad = _parse_column([row[i] if i < len(row) else '' for row in rows])
+                    if conversion:
+                        columns[column] = units.convert(columns[column], *conversion)
+                    bad |= column_bad
+                else:
+                    columns[column] = np.full(len(rows), spec['defaults'][column])
+
+            with np.errstate(all='ignore'):
+                outputs = spec['compute'](columns)
+            numeric = [v for v in outputs.values() if v.dtype.kind == 'f']
+            failed = ~bad & ~np.logical_and.reduce([np.isfinite(v) for v in numeric])
+
+            if not header_written:
+                writer.writerow(header + list(outputs) + ['error'])
+                header_written = True
+            output_lists = [_format_column(v) for v in outputs.values()]
+            errors = [''] * len(rows)
+            # Blank the results of rows that failed and say why
+            for n in np.flatnonzero(bad | failed).tolist():
+                errors[n] = 'Could not parse a numeric input' if bad[n] else 'Inputs out of range'
+                for values in output_lists:
+                    values[n] = ''
+            writer.writerows(row + list(values) + [error]
+                             for row, values, error in zip(rows, zip(*output_lists), errors))
+            total_rows += len(rows)
+            error_rows += int(bad.sum() + failed.sum())
+            if progress is not None:
+                progress(total_rows)
+
+        if not header_written:
+            writer.writerow(header + ['error'])
+    return total_rows, error_rows
+
+
+# All rows of the named numeric columns of an uploaded CSV, for small files such as an hourly schedule.
+# Columns with a default may be missing from the file; a default of None leaves them out of the result.
+def read_upload_columns(contents, columns, defaults=None):
+    defaults = defaults or {}
+    reader = csv.reader(iter_data_url_lines(contents))
+    header = next(reader, None)
+    if header is None:
+        raise ValueError('The uploaded file is empty.')
+    normalized = [name.strip().lower() for name in header]
+    index = _locate_columns(normalized, columns)
+    missing = [c for c in columns if c not in index and c not in defaults]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    rows = [row for row in reader if any(cell.strip() for cell in row)]
+
+    result = {}
+    for column in columns:
+        if column in index:
+            i, conversion = index[column]
+            values, bad = _parse_column([row[i] if i < len(row) else '' for row in rows])
+            if bad.any():
+                raise ValueError(f"Row {np.flatnonzero(bad)[0] + 2}: '{header[i].strip()}' is not a number")
+            result[column] = units.convert(values, *conversion) if conversion else values
+        elif defaults[column] is not None:
+            result[column] = np.full(len(rows), defaults[column], dtype=float)
+    return result
+
+
+# Process an uploaded data URL into a temporary results CSV; the caller removes the file when done with it
+# progress, when given, is called after each chunk with the rows done and the fraction of the file read
+def process_upload(contents, kind, chunk_rows=CHUNK_ROWS, progress=None):
+    lines = iter_data_url_lines(contents)
+    on_chunk = None
+    if progress is not None:
+        # Decoded characters consumed so far against the decoded size implied by the base64 length
+        expected = max((len(contents) - contents.index(',') - 1) * 3 / 4, 1)
+        consumed = 0
+
+        def counted(lines):
+            nonlocal consumed
+            for line in lines:
+                consumed += len(line)
+                yield line
+
+        lines = counted(lines)
+        on_chunk = lambda rows: progress(rows, min(consumed / expected, 1.0))
+    fd, output_path = tempfile.mkstemp(prefix=f'{kind}-', suffix='.csv')
+    os.close(fd)
+    try:
+        total_rows, error_rows = process_csv_lines(lines, kind, output_path, chunk_rows, on_chunk)
+    except Exception:
+        os.remove(output_path)
+        raise
+    return output_path, total_rows, error_rows
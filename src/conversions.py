@@ -0,0 +1,36 @@
+# Unit conversions behind the Unit Conversions tabs and the JSON API.
+# The browser runs the same formulas in assets/unit_conversions.js; keep the two in step.
+# All functions work on scalars or NumPy arrays; the unit factors come from the unit registry (units.py).
+
+import units
+
+FT_HEAD_PER_PSI = units.factor('psi', 'ftH2O')  # Feet of water per psi
+# Kinematic viscosity in cSt from dynamic viscosity in cP over density in kg/m³
+CST_PER_CP_M3_KG = units.factor('cP*m3/kg', 'cSt')
+
+
+# Degrees API to specific gravity (60°F)
+def api_to_sg(api):
+    return 141.5 / (131.5 + api)
+
+
+def sg_to_api(sg):
+    return 141.5 / sg - 131.5
+
+
+# Pressure in psi to feet of head for a fluid of the given specific gravity
+def pressure_to_head(pressure_psi, specific_gravity):
+    return pressure_psi * FT_HEAD_PER_PSI / specific_gravity
+
+
+def head_to_pressure(head_ft, specific_gravity):
+    return head_ft * specific_gravity / FT_HEAD_PER_PSI
+
+
+# Dynamic viscosity in cP to kinematic viscosity in cSt for a density in kg/m³
+def dynamic_to_kinematic(dynamic_cp, density_kg_m3):
+    return dynamic_cp / density_kg_m3 * CST_PER_CP_M3_KG
+
+
+def kinematic_to_dynamic(kinematic_cst, density_kg_m3):
+    return kinematic_cst * density_kg_m3 / CST_PER_CP_M3_KG
@@ -0,0 +1,104 @@
+# Electrical calculations for the Power & Energy tools.
+
+import hashlib
+from math import sqrt
+
+import numpy as np
+
+import hydraulics
+import units
+
+
+# Ideal line current in amps for a load of P kW at V volts, for scalars or arrays.
+# Does not include power used by the motor's fan, starter or internal losses.
+def current_ideal(P, V, phase=3, PF=1):
+    phase = np.asarray(phase)
+    if not np.isin(phase, (1, 3)).all():
+        raise ValueError('Only 1 and 3 phase power supported')
+    return units.convert(np.asarray(P, dtype=float), 'kW', 'W') / (V * np.where(phase == 3, sqrt(3), 1.0) * PF)
+
+
+HOURS_PER_YEAR = 8760
+DAYS_PER_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+MONTH_OF_HOUR = np.repeat(np.arange(12), np.array(DAYS_PER_MONTH) * 24)
+MONTH_START_HOUR = np.concatenate([[0], np.cumsum(DAYS_PER_MONTH)[:-1] * 24])
+
+# Typical induction motor part-load behaviour, as fractions of the full-load efficiency and power factor
+MOTOR_LOAD_POINTS = (0.0, 0.25, 0.5, 0.75, 1.0, 1.25)
+MOTOR_EFFICIENCY_FRACTION = (0.0, 0.92, 0.98, 1.0, 1.0, 0.99)
+MOTOR_POWER_FACTOR_FRACTION = (0.2, 0.63, 0.86, 0.97, 1.0, 1.0)
+
+
+# Centrifugal pump efficiency at a flow rate, from a parabola through zero flow and the best efficiency point
+def pump_efficiency(flow_bpd, bep_flow_bpd, bep_efficiency):
+    ratio = np.asarray(flow_bpd, dtype=float) / bep_flow_bpd
+    return np.clip(bep_efficiency * ratio * (2 - ratio), 0.05, bep_efficiency)
+
+
+def motor_efficiency(load_fraction, full_load_efficiency):
+    return full_load_efficiency * np.interp(load_fraction, MOTOR_LOAD_POINTS, MOTOR_EFFICIENCY_FRACTION)
+
+
+def motor_power_factor(load_fraction, rated_power_factor):
+    return rated_power_factor * np.interp(load_fraction, MOTOR_LOAD_POINTS, MOTOR_POWER_FACTOR_FRACTION)
+
+
+# Key identifying an hourly schedule (flow and tariff arrays) for caching simulation results
+def schedule_key(*arrays):
+    digest = hashlib.sha1()
+    for values in arrays:
+        digest.update(np.ascontiguousarray(values, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+# Pumping power, current and cost for every hour of a year in one vectorized pass.
+# flow_bpd is an 8,760-value hourly schedule (0 means the pump is off); energy_rate is $/kWh, either one rate
+# or an hourly tariff; demand_charge is $/kW on each month's peak. Line and fluid inputs are as for
+# hydraulics.friction_pressure_loss; static_head_psi is the elevation and delivery pressure the pump also works
+# against. Efficiencies and power factors are fractions.
+def simulate_pumping_energy(flow_bpd, inner_diameter_in, length_mi, roughness_ft, viscosity_cst, specific_gravity,
+                            bep_flow_bpd, motor_rated_kw, static_head_psi=0.0, drag_reduction=0.0,
+                            bep_efficiency=0.8, motor_full_load_efficiency=0.95, rated_power_factor=0.88,
+                            voltage=4160, phase=3, energy_rate=0.08, demand_charge=0.0, method='Colebrook-White'):
+    flow_bpd = np.asarray(flow_bpd, dtype=float)
+    if flow_bpd.shape != (HOURS_PER_YEAR,):
+        raise ValueError(f'The flow schedule must have {HOURS_PER_YEAR:,} hourly values, not {flow_bpd.size:,}')
+    running = flow_bpd > 0
+
+    with np.errstate(all='ignore'):
+        loss = hydraulics.friction_pressure_loss(inner_diameter_in, flow_bpd, roughness_ft, viscosity_cst,
+                                                 specific_gravity, drag_reduction, methods=(method,))
+        differential_psi = np.where(running, loss['pressure_loss_psi_per_mile'][method] * length_mi
+                                    + static_head_psi, 0.0)
+        hydraulic_kw = flow_bpd * differential_psi * hydraulics.HHP_PER_BPD_PSI * hydraulics.KW_PER_HP
+        shaft_kw = hydraulic_kw / pump_efficiency(flow_bpd, bep_flow_bpd, bep_efficiency)
+        load = shaft_kw / motor_rated_kw
+        input_kw = np.where(running, shaft_kw / motor_efficiency(load, motor_full_load_efficiency), 0.0)
+        power_factor = motor_power_factor(load, rated_power_factor)
+        current_a = np.where(running, current_ideal(input_kw, voltage, phase, power_factor), 0.0)
+
+    energy_rate = np.broadcast_to(np.asarray(energy_rate, dtype=float), flow_bpd.shape)
+    monthly_kwh = np.bincount(MONTH_OF_HOUR, weights=input_kw, minlength=12)
+    monthly_peak_kw = np.maximum.reduceat(input_kw, MONTH_START_HOUR)
+    energy_cost = float(np.dot(input_kw, energy_rate))
+    demand_cost = float(np.sum(monthly_peak_kw * demand_charge))
+    kwh = float(input_kw.sum())
+    kvah = float(np.sum(np.where(running, input_kw / power_factor, 0.0)))
+
+    return {
+        'hydraulic_kw': hydraulic_kw,
+        'input_kw': input_kw,
+        'current_a': current_a,
+        'motor_load': np.where(running, load, 0.0),
+        'monthly_kwh': monthly_kwh,
+        'monthly_peak_kw': monthly_peak_kw,
+        'energy_kwh': kwh,
+        'peak_kw': float(input_kw.max()),
+        'peak_current_a': float(current_a.max()),
+        'average_power_factor': kwh / kvah if kvah else float('nan'),
+        'running_hours': int(running.sum()),
+        'overload_hours': int(np.count_nonzero(load[running] > 1.0)),
+        'energy_cost': energy_cost,
+        'demand_cost': demand_cost,
+        'total_cost': energy_cost + demand_cost,
+    }
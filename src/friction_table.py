@@ -0,0 +1,150 @@
+# Precomputed Colebrook-White friction factor grid for fast interpolated lookups.
+# The grid is uniform in log10(Re) x log10(ε/D) and stores x = 1/sqrt(f), which is close to linear in
+# both axes, so bilinear interpolation on the default 512 x 256 grid stays within about 0.01% of the
+# exact solver. Points outside the grid are solved exactly.
+#
+# Build the grid once per process with get_table(), or point HYDRAULIC_FRICTION_TABLE at a .npy file
+# to memory-map a grid saved by an earlier run (it is built and saved there if missing).
+#
+#   python friction_table.py [path.npy]   builds/saves the grid and prints the interpolation error report
+
+import os
+import sys
+import threading
+
+import numpy as np
+
+import hydraulics
+
+LOG_RE_RANGE = (3.0, 8.5)  # log10(Reynolds number)
+LOG_RR_RANGE = (-8.0, -1.0)  # log10(relative roughness)
+GRID_SHAPE = (512, 256)
+
+
+class FrictionTable:
+    def __init__(self, values, log_re_range=LOG_RE_RANGE, log_rr_range=LOG_RR_RANGE):
+        self.values = values  # 1/sqrt(f) at every grid node, shape (n_re, n_rr)
+        self.log_re_range = log_re_range
+        self.log_rr_range = log_rr_range
+        n_re, n_rr = values.shape
+        self._re_step = (log_re_range[1] - log_re_range[0]) / (n_re - 1)
+        self._rr_step = (log_rr_range[1] - log_rr_range[0]) / (n_rr - 1)
+        self._flat = values.reshape(-1)
+
+    @classmethod
+    def build(cls, shape=GRID_SHAPE, log_re_range=LOG_RE_RANGE, log_rr_range=LOG_RR_RANGE):
+        log_re = np.linspace(*log_re_range, shape[0])
+        log_rr = np.linspace(*log_rr_range, shape[1])
+        reynolds, relative_roughness = np.meshgrid(10 ** log_re, 10 ** log_rr, indexing='ij')
+        f, _, _ = hydraulics.solve_colebrook(reynolds, relative_roughness,
+                                             hydraulics.clamond(reynolds, relative_roughness))
+        return cls(1.0 / np.sqrt(f), log_re_range, log_rr_range)
+
+    # Memory-map a grid saved with save(); the axis ranges are the module defaults
+    @classmethod
+    def load(cls, path):
+        return cls(np.load(path, mmap_mode='r'))
+
+    def save(self, path):
+        np.save(path, np.ascontiguousarray(self.values))
+
+    # Interpolated friction factors for arrays of Reynolds number and relative roughness
+    def lookup(self, reynolds, relative_roughness):
+        reynolds, relative_roughness = np.broadcast_arrays(np.asarray(reynolds, dtype=float),
+                                                           np.asarray(relative_roughness, dtype=float))
+        shape = reynolds.shape
+        reynolds = reynolds.ravel()
+        relative_roughness = relative_roughness.ravel()
+        n_re, n_rr = self.values.shape
+        # Fractional grid coordinates, computed in place to keep the number of temporaries down
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = np.log10(reynolds)
+            u -= self.log_re_range[0]
+            u /= self._re_step
+            v = np.log10(relative_roughness)
+            v -= self.log_rr_range[0]
+            v /= self._rr_step
+        inside = (u >= 0) & (u <= n_re - 1) & (v >= 0) & (v <= n_rr - 1)
+        all_inside = inside.all()
+        if not all_inside:
+            u[~inside] = 0.0
+            v[~inside] = 0.0
+
+        # Cell corner indices and weights, then a bilinear blend of the four corners
+        i = u.astype(np.intp)
+        np.minimum(i, n_re - 2, out=i)
+        j = v.astype(np.intp)
+        np.minimum(j, n_rr - 2, out=j)
+        u -= i
+        v -= j
+        corner = i * n_rr
+        corner += j
+        flat = self._flat
+        low = flat[corner]
+        low += (flat[corner + 1] - low) * v
+        corner += n_rr
+        high = flat[corner]
+        high += (flat[corner + 1] - high) * v
+        high -= low
+        high *= u
+        low += high
+        f = 1.0 / (low * low)
+
+        # Anything off the grid gets the exact solution
+        if not all_inside:
+            outside = ~inside
+            f[outside] = hydraulics.colebrook_white(reynolds[outside], relative_roughness[outside])
+        return f.reshape(shape)
+
+    # Largest relative interpolation error against the exact solver, over random points plus
+    # the cell centres (where bilinear error peaks)
+    def max_error(self, n_samples=200_000, seed=0):
+        rng = np.random.default_rng(seed)
+        log_re = rng.uniform(*self.log_re_range, n_samples)
+        log_rr = rng.uniform(*self.log_rr_range, n_samples)
+        n_re, n_rr = self.values.shape
+        centre_re = self.log_re_range[0] + (np.arange(n_re - 1) + 0.5) * self._re_step
+        centre_rr = self.log_rr_range[0] + (np.arange(n_rr - 1) + 0.5) * self._rr_step
+        centre_re, centre_rr = (a.ravel() for a in np.meshgrid(centre_re, centre_rr, indexing='ij'))
+        reynolds = 10 ** np.concatenate([log_re, centre_re])
+        relative_roughness = 10 ** np.concatenate([log_rr, centre_rr])
+
+        exact = hydraulics.colebrook_white(reynolds, relative_roughness)
+        return float(np.max(np.abs(self.lookup(reynolds, relative_roughness) / exact - 1)))
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+# Shared table for the process: memory-mapped from HYDRAULIC_FRICTION_TABLE if set, otherwise built in memory
+def get_table():
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = load_or_build(os.environ.get('HYDRAULIC_FRICTION_TABLE'))
+    return _table
+
+
+def load_or_build(path=None):
+    if path and os.path.exists(path):
+        table = FrictionTable.load(path)
+        if table.values.shape == GRID_SHAPE:
+            return table
+    table = FrictionTable.build()
+    if path:
+        table.save(path)
+        table = FrictionTable.load(path)
+    return table
+
+
+if __name__ == '__main__':
+    import time
+
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    start = time.perf_counter()
+    table = load_or_build(path)
+    print(f"Grid {table.values.shape[0]} x {table.values.shape[1]} ready in {time.perf_counter() - start:.3f} s"
+          + (f" ({path})" if path else ""))
+    print(f"Max interpolation error vs Colebrook-White: {table.max_error():.2e}")
@@ -0,0 +1,28 @@
+# Production entry point: run from this directory with
+#   gunicorn -c gunicorn.conf.py
+# (app.run_server in hydraulic_reference.py is the single-process development server.)
+#
+# The app is imported once in the master before the workers fork (preload_app), so the loaded modules,
+# pipe schedule tables and cached layouts are shared copy-on-write instead of being rebuilt per worker.
+# Calculator results go to a SQLite cache file shared by all workers (see result_cache.py), so a result
+# computed by one worker is served by the others.
+#   HYDRAULIC_WORKERS              worker processes (default: 2 per CPU + 1)
+#   HYDRAULIC_THREADS              threads per worker (default 1)
+#   HYDRAULIC_BIND                 address to listen on (default 0.0.0.0:8050)
+#   HYDRAULIC_TIMEOUT              seconds before a stuck worker is restarted (default 120)
+#   HYDRAULIC_RESULT_CACHE_PATH    shared cache file (default: hydraulic-result-cache.sqlite3 in the temp dir)
+
+import multiprocessing
+import os
+import tempfile
+
+wsgi_app = 'hydraulic_reference:server'
+preload_app = True
+workers = int(os.environ.get('HYDRAULIC_WORKERS') or 2 * multiprocessing.cpu_count() + 1)
+threads = int(os.environ.get('HYDRAULIC_THREADS') or 1)
+bind = os.environ.get('HYDRAULIC_BIND') or '0.0.0.0:8050'
+timeout = int(os.environ.get('HYDRAULIC_TIMEOUT') or 120)
+
+# Set before the app is imported so hydraulic_reference picks the shared cache
+os.environ.setdefault('HYDRAULIC_RESULT_CACHE_PATH',
+                      os.path.join(tempfile.gettempdir(), 'hydraulic-result-cache.sqlite3'))
@@ -1,15 +1,35 @@
-# TODO add wall thicknes
 # TODO power factor references for sites
-# TODO motor efficiencies
 
 # Import necessary libraries
+# Plotly is imported inside the functions that build figures, so it only loads on the first calculation
+from functools import cache
 import dash
-from dash import html, dcc, Input, Output, State, callback_context
+from dash import html, dcc, dash_table, Input, Output, State, ClientsideFunction, Patch
 import dash_bootstrap_components as dbc
-import math
-from scipy.optimize import fsolve
-from math import log, sqrt
-import plotly.graph_objs as go
+import os
+import uuid
+from urllib.parse import quote
+import flask
+import numpy as np
+import api
+import bulk_csv
+import conversions
+import energy
+import hydraulics
+import inverse
+import jobs
+import line_fill
+import metrics
+import network
+from energy import current_ideal
+import pipe_schedule
+import pipeline_profile
+import pump_stations
+import thermal
+import transient
+import uncertainty
+import units
+from result_cache import cache_from_environment
 
 # Initialize the app with a dark Bootstrap stylesheet for styling
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.SOLAR], suppress_callback_exceptions=True)
@@ -17,11 +37,67 @@ app = dash.Dash(__name__, external_stylesheets=[dbc.themes.SOLAR], suppress_call
 # Define the server variable for deployment
 server = app.server
 
+# Time every server callback from here on and serve the numbers at /metrics (see metrics.py)
+metrics.instrument(app)
+
+# JSON API for scripts and other machine clients (see api.py)
+server.register_blueprint(api.blueprint)
+
+# Cache of calculator results keyed on the parsed inputs, so repeat clicks skip the math and figure build.
+# Per process by default; under gunicorn it's a file all the workers share (see result_cache.py)
+result_cache = cache_from_environment(max_entries=512, max_bytes=32 * 1024 * 1024, ttl_seconds=3600)
+
+# Publish the cache counters alongside the callback metrics
+def result_cache_metrics():
+    stats = result_cache.stats()
+    return {
+        'hydraulic_result_cache_hits_total': ('counter', 'Result cache hits.', stats['hits']),
+        'hydraulic_result_cache_misses_total': ('counter', 'Result cache misses.', stats['misses']),
+        'hydraulic_result_cache_evictions_total': ('counter', 'Result cache evictions.', stats['evictions']),
+        'hydraulic_result_cache_entries': ('gauge', 'Entries in the result cache.', stats['entries']),
+        'hydraulic_result_cache_bytes': ('gauge', 'Pickled size of the result cache.', stats['bytes']),
+    }
+
+metrics.metrics.collectors.append(result_cache_metrics)
+
+# Long calculations (big sweeps, batch uploads) run as background jobs the page polls (see jobs.py)
+background_jobs = jobs.manager_from_environment()
+JOB_POLL_MS = 750
+
+# Batch upload results are streamed from disk by this route instead of going back through a callback, which
+# would hold the whole CSV in memory base64-encoded. The job id finds the file and the first request claims
+# it with an atomic rename, so each result downloads once and is removed after it has been sent.
+@server.route('/batch-download/<job_id>')
+def batch_download(job_id):
+    status = background_jobs.status(job_id)
+    if status is None or status['state'] != jobs.DONE:
+        flask.abort(404)
+    output_path = status['result'][0]
+    claimed_path = f"{output_path}.{uuid.uuid4().hex}"
+    try:
+        os.replace(output_path, claimed_path)
+    except FileNotFoundError:
+        flask.abort(404)
+    download_name = os.path.basename(flask.request.args.get('name', '')) or 'results.csv'
+    response = flask.send_file(claimed_path, mimetype='text/csv', as_attachment=True, download_name=download_name)
+    # A passthrough response is handed to the server as is and never closed, so the file would never be removed
+    response.direct_passthrough = False
+    response.call_on_close(lambda: os.remove(claimed_path))
+    return response
+
+# Parse a text input like "100,000" or "25%" to a float
+def parse_number(value):
+    return float(str(value).replace(',', '').replace('%', '').strip())
+
 # Navbar component with corrected links
 navbar = dbc.NavbarSimple(
     children=[
         dbc.NavItem(dbc.NavLink("Pipeline Volume", href="/pipeline-volume")),
         dbc.NavItem(dbc.NavLink("Fluid Flow", href="/fluid-flow")),
+        dbc.NavItem(dbc.NavLink("Hydraulic Profile", href="/pipeline-profile")),
+        dbc.NavItem(dbc.NavLink("Pump Stations", href="/pump-stations")),
+        dbc.NavItem(dbc.NavLink("Pipe Network", href="/network")),
+        dbc.NavItem(dbc.NavLink("Surge", href="/surge")),
         dbc.NavItem(dbc.NavLink("Power & Energy", href="/power-energy")),
         dbc.NavItem(dbc.NavLink("Unit Conversions", href="/unit-conversions")),
     ],
@@ -30,7 +106,9 @@ navbar = dbc.NavbarSimple(
     color="success",
 )
 
+# Page layouts are static, so each one is built on first visit and the same component tree reused after that
 # Landing page content
+@cache
 def landing_page():
     return dbc.Container([
         dbc.Row(dbc.Col(html.H2("Welcome to Tuttle's Toolbox", className="text-center my-4 text-light"))),
@@ -57,6 +135,14 @@ def display_page(pathname):
         return pipeline_volume_layout()
     elif pathname == '/fluid-flow':
         return friction_factor_layout()
+    elif pathname == '/pipeline-profile':
+        return pipeline_profile_layout()
+    elif pathname == '/pump-stations':
+        return pump_stations_layout()
+    elif pathname == '/network':
+        return network_layout()
+    elif pathname == '/surge':
+        return surge_layout()
     elif pathname == '/power-energy':
         return energy_needs_layout()
     elif pathname == '/unit-conversions':
@@ -65,6 +151,7 @@ def display_page(pathname):
         return html.Div("404 Page Not Found", className="text-center text-light")
 
 # Offcanvas component with dummy data for the energy needs layout
+@cache
 def energy_needs_offcanvas():
    return dbc.Offcanvas(
        html.Div([
@@ -76,7 +163,118 @@ def energy_needs_offcanvas():
        is_open=False,
        style={"color": "white"}
    )
+# Batch CSV upload card shared by the Pipeline Volume and Fluid Flow pages.
+# The file is processed as a background job (see jobs.py) that the page polls for progress.
+def batch_upload_card(prefix, kind):
+    return dbc.Card([
+        dbc.CardBody([
+            html.H5("Batch Mode", className="text-white"),
+            html.P("Upload a CSV with columns: " + ", ".join(bulk_csv.BATCH_KINDS[kind]['columns'])
+                   + " (another unit of the same quantity also works, e.g. diameter_mm). Results download as a CSV.",
+                   className="text-light"),
+            dcc.Upload(
+                id=f'{prefix}-batch-upload',
+                children=html.Div(["Drag and drop or ", html.A("select a CSV file")]),
+                style={'borderWidth': '1px', 'borderStyle': 'dashed', 'borderRadius': '5px',
+                       'textAlign': 'center', 'padding': '20px', 'color': 'white'},
+                multiple=False
+            ),
+            html.Div(job_progress(prefix + '-batch'), id=f'{prefix}-batch-progress-row',
+                     style={'display': 'none'}),
+            html.Div(id=f'{prefix}-batch-status', className="text-light mt-2")
+        ])
+    ], className="mb-4")
+
+# Progress bar, cancel button, job id store and poll timer for a background job
+def job_progress(prefix):
+    return [
+        dbc.Row([
+            dbc.Col(dbc.Progress(id=f'{prefix}-progress', value=0, striped=True, animated=True), className="my-auto"),
+            dbc.Col(dbc.Button("Cancel", id=f'{prefix}-cancel', color='secondary', size='sm'), width='auto'),
+        ], className="mt-2"),
+        dcc.Store(id=f'{prefix}-job'),
+        dcc.Interval(id=f'{prefix}-poll', interval=JOB_POLL_MS, disabled=True),
+    ]
+
+
+# Job body for a batch upload: process the file, reporting progress after every chunk
+def batch_upload_job(job, contents, kind):
+    return bulk_csv.process_upload(
+        contents, kind,
+        progress=lambda rows, fraction: job.report(fraction, 1, f"{rows:,} rows processed")
+    )
+
+# Common poll step for background jobs: cancel if asked, then read the job's status.
+# Returns (status, progress value, progress label, poll disabled, progress row style); status is None when
+# there's no job.
+def poll_job(job_id, cancel_requested):
+    if not job_id:
+        return None, 0, '', True, {'display': 'none'}
+    if cancel_requested:
+        background_jobs.cancel(job_id)
+    status = background_jobs.status(job_id)
+    if status is None:
+        return None, 0, '', True, {'display': 'none'}
+    if status['state'] in jobs.FINISHED:
+        return status, 100, '', True, {'display': 'none'}
+    percent = round(status['fraction'] * 100)
+    return status, percent, f"{percent}%", False, {}
+
+# Poll a batch upload job and hand back (status message, progress value, progress label, poll disabled,
+# progress row style); once the job is done the message links to its results (see batch_download)
+def poll_batch_upload(job_id, cancel_requested, filename, kind):
+    status, percent, label, poll_disabled, progress_style = poll_job(job_id, cancel_requested)
+    if status is None:
+        return '', percent, label, poll_disabled, progress_style
+    state = status['state']
+    if state in (jobs.QUEUED, jobs.RUNNING):
+        message = status['message']
+        if state == jobs.RUNNING:
+            message = f"Processing {filename}: {message}" if message else f"Processing {filename}"
+
+        return message, percent, label, poll_disabled, progress_style
+    if state == jobs.CANCELLED:
+        return f"Cancelled processing {filename}", percent, label, poll_disabled, progress_style
+    if state != jobs.DONE:
+        return (dbc.Alert(f"Could not process {filename}: {status['error']}", color='danger'),
+                percent, label, poll_disabled, progress_style)
+
+    _, total_rows, error_rows = status['result']
+    status_message = f"Processed {total_rows:,} rows from {filename}"
+    if error_rows:
+        status_message += f" ({error_rows:,} rows with errors, see the error column)"
+    base_name = os.path.splitext(filename or kind)[0]
+    href = f"/batch-download/{job_id}?name={quote(base_name + '-results.csv')}"
+    return (html.Span([status_message, ". ", html.A("Download results", href=href)]),
+            percent, label, poll_disabled, progress_style)
+
+# NPS and schedule pickers that fill in the pipe dimension inputs from the pipe schedule table
+def pipe_size_select(prefix, nps, schedule):
+    return html.Div([
+        dbc.Label("Pipe Size:", className="text-white"),
+        dbc.InputGroup([
+            dbc.InputGroupText("NPS"),
+            dbc.Select(
+                id=f'{prefix}-nps',
+                options=[{'label': pipe_schedule.nps_label(n), 'value': f'{n:g}'} for n in pipe_schedule.NPS],
+                value=nps
+            ),
+            dbc.InputGroupText("Schedule"),
+            dbc.Select(id=f'{prefix}-schedule', options=schedule_options(nps), value=schedule),
+        ], className="mb-2"),
+    ])
+
+
+def schedule_options(nps):
+    try:
+        schedules = pipe_schedule.schedules_for(nps)
+    except (KeyError, ValueError):
+        schedules = pipe_schedule.SCHEDULES
+    return [{'label': schedule, 'value': schedule} for schedule in schedules]
+
+
 # Pipeline Volume Calculator Layout and Callback
+@cache
 def pipeline_volume_layout():
     return dbc.Container([
         dbc.Row(dbc.Col(html.H2("Pipeline Volume Calculator", className="text-left text-light"))),
@@ -84,6 +282,7 @@ def pipeline_volume_layout():
             dbc.Col(
                 dbc.Card([
                     dbc.CardBody([
+                        pipe_size_select('pv', '24', 'XS'),
                         dbc.Label("Diameter:", className="text-white"),
                         dbc.InputGroup([
                             dbc.Input(id='pv-diameter', type='text', value="{:,}".format(24), className="mb"),
@@ -110,9 +309,73 @@ def pipeline_volume_layout():
             )
         ], justify='center'),
         html.Hr(className="my-4"),
+        dbc.Row(dbc.Col(batch_upload_card('pv', 'pipeline-volume'), width=12)),
+        dbc.Row(dbc.Col(batch_tracking_card(), width=12)),
     ], fluid=True, className="bg-dark")
 
 
+BATCH_EVENT_HEADERS = {
+    'time_h': 'End Time (h)',
+    'product': 'Product',
+    'volume_bbl': 'Injected (bbl)',
+}
+
+# Batch tracking on the line described above: injections in, interface positions and line contents out
+def batch_tracking_card():
+    return dbc.Card([
+        dbc.CardBody([
+            html.H5("Batch Tracking", className="text-white"),
+            html.P("Each row pumps a volume of product into the inlet at a steady rate, finishing at its end time. "
+                   "The line above is full of the initial product at time 0.", className="text-light"),
+            dbc.Row([
+                dbc.Col([
+                    dbc.Label("Initial Line Fill:", className="text-white"),
+                    dbc.Input(id='pv-bt-initial', type='text', value="Diesel", className="mb"),
+                    dbc.Label("Query Milepost:", className="text-white"),
+                    dbc.InputGroup([
+                        dbc.Input(id='pv-bt-milepost', type='text', value="{:,}".format(5), className="mb"),
+                        dbc.InputGroupText("miles")
+                    ]),
+                    dbc.Label("Query Time:", className="text-white"),
+                    dbc.InputGroup([
+                        dbc.Input(id='pv-bt-time', type='text', value="{:,}".format(10), className="mb"),
+                        dbc.InputGroupText("hours")
+                    ]),
+                    dbc.ButtonGroup([
+                        dbc.Button('Track', id='pv-bt-btn', color='danger'),
+                        dbc.Button('Add Event', id='pv-bt-add-event-btn', color='secondary')
+                    ], className="mt-3")
+                ], width=4),
+                dbc.Col(
+                    dash_table.DataTable(
+                        id='pv-bt-events',
+                        columns=[{'name': name, 'id': column, 'type': 'text' if column == 'product' else 'numeric'}
+                                 for column, name in BATCH_EVENT_HEADERS.items()],
+                        data=[
+                            {'time_h': 4, 'product': 'Gasoline', 'volume_bbl': 10000},
+                            {'time_h': 8, 'product': 'Jet', 'volume_bbl': 8000},
+                            {'time_h': 14, 'product': 'Diesel', 'volume_bbl': 15000},
+                        ],
+                        editable=True,
+                        row_deletable=True,
+                        page_size=10,
+                        style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+                        style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+                    ),
+                    width=8
+                ),
+            ]),
+            html.Div(id='pv-bt-output', className="text-light mt-3"),
+        ])
+    ], className="mb-4")
+
+
+def compute_pipeline_volume(diameter, wall_thickness, distance):
+    inner_diameter = diameter - 2 * wall_thickness  # inches
+    volume_cuft, volume_bbl = hydraulics.pipe_volume(inner_diameter, distance)
+    return {'volume_cuft': float(volume_cuft), 'volume_bbl': float(volume_bbl)}
+
+
 @app.callback(
     Output('pv-output', 'children'),
     Input('pv-calculate-btn', 'n_clicks'),
@@ -123,18 +386,16 @@ def pipeline_volume_layout():
 def calculate_pipeline_volume(n_clicks, diameter, wall_thickness, distance):
     if n_clicks:
         # Remove commas and convert to float
-        diameter = float(diameter.replace(',', ''))
-        wall_thickness = float(wall_thickness.replace(',', ''))
-        distance = float(distance.replace(',', ''))
-
-        # Calculations
-        inner_diameter = diameter - 2 * wall_thickness  # inches
-        radius = inner_diameter / 2  # inches
-        area = math.pi * (radius ** 2)  # square inches
-        area_sqft = area / 144  # square feet
-        length_ft = distance * 5280  # feet
-        volume_cuft = area_sqft * length_ft  # cubic feet
-        volume_bbl = volume_cuft / 5.614583  # barrels (1 bbl = 5.614583 cubic feet)
+        diameter = parse_number(diameter)
+        wall_thickness = parse_number(wall_thickness)
+        distance = parse_number(distance)
+
+        result = result_cache.get_or_compute(
+            ('pipeline-volume', diameter, wall_thickness, distance),
+            lambda: compute_pipeline_volume(diameter, wall_thickness, distance)
+        )
+        volume_cuft = result['volume_cuft']
+        volume_bbl = result['volume_bbl']
 
         # Format outputs with commas
         volume_cuft_formatted = "{:,}".format(round(volume_cuft, 2))
@@ -149,15 +410,253 @@ def calculate_pipeline_volume(n_clicks, diameter, wall_thickness, distance):
         ])
     return ''
 
-def determine_flow_regime(reynolds_number):
-    if reynolds_number > 4000:
-        return 'Turbulent'
-    elif 2000 <= reynolds_number <= 4000:
-        return 'Transition'
-    else:
-        return 'Laminar'
+@app.callback(
+    Output('pv-schedule', 'options'),
+    Output('pv-diameter', 'value'),
+    Output('pv-wall-thickness', 'value'),
+    Input('pv-nps', 'value'),
+    Input('pv-schedule', 'value'),
+    prevent_initial_call=True
+)
+def fill_pipeline_volume_size(nps, schedule):
+    try:
+        pipe = pipe_schedule.lookup(nps, schedule)
+    except ValueError:
+        return schedule_options(nps), dash.no_update, dash.no_update
+    return (schedule_options(nps), "{:,.3f}".format(pipe['outside_diameter_in']),
+            "{:,.3f}".format(pipe['wall_thickness_in']))
+
+@app.callback(
+    Output('pv-batch-job', 'data'),
+    Input('pv-batch-upload', 'contents'),
+    prevent_initial_call=True
+)
+def batch_pipeline_volume(contents):
+    if not contents:
+        return dash.no_update
+    return background_jobs.submit(batch_upload_job, contents, 'pipeline-volume')
+
+@app.callback(
+    Output('pv-batch-status', 'children'),
+    Output('pv-batch-progress', 'value'),
+    Output('pv-batch-progress', 'label'),
+    Output('pv-batch-poll', 'disabled'),
+    Output('pv-batch-progress-row', 'style'),
+    Input('pv-batch-job', 'data'),
+    Input('pv-batch-poll', 'n_intervals'),
+    Input('pv-batch-cancel', 'n_clicks'),
+    State('pv-batch-upload', 'filename'),
+    prevent_initial_call=True
+)
+def poll_pipeline_volume_batch(job_id, n_intervals, cancel_clicks, filename):
+    cancel_requested = dash.ctx.triggered_id == 'pv-batch-cancel'
+    return poll_batch_upload(job_id, cancel_requested, filename, 'pipeline-volume')
+
+@app.callback(
+    Output('pv-bt-events', 'data'),
+    Input('pv-bt-add-event-btn', 'n_clicks'),
+    State('pv-bt-events', 'data')
+)
+def add_batch_event(n_clicks, rows):
+    rows = rows or []
+    if n_clicks:
+        last = rows[-1] if rows else {'time_h': 0, 'product': 'Diesel', 'volume_bbl': 10000}
+        rows = rows + [{'time_h': (last['time_h'] or 0) + 4, 'product': last['product'],
+                        'volume_bbl': last['volume_bbl']}]
+    return rows
+
+
+# Line contents at the query time, the product at the query milepost, deliveries, and interface positions over time
+def compute_batch_tracking(inner_diameter, distance, initial_product, events, query_milepost, query_time):
+    import plotly.graph_objs as go
+
+    tracker = line_fill.LineFill(distance, inner_diameter, fill_product=initial_product)
+    delivered = {}
+    for time_h, product, volume_bbl in events:
+        for delivered_product, barrels in tracker.inject(time_h, product, volume_bbl):
+            delivered[delivered_product] = delivered.get(delivered_product, 0.0) + barrels
+
+    times = np.linspace(0, tracker.time, 200) if tracker.time > 0 else np.array([0.0])
+    history = tracker.interface_history(times)
+    products = tracker.products
+    fig = go.Figure([
+        go.Scatter(x=times, y=history[i], mode='lines', name=f'{products[i - 1]} / {products[i]}')
+        for i in range(1, len(products))
+    ])
+    fig.update_layout(
+        title='Interface Positions',
+        xaxis_title='Time (h)',
+        yaxis_title='Milepost (mi)',
+        template='plotly_dark'
+    )
+    return {
+        'line_volume_bbl': tracker.line_volume_bbl,
+        'product_at_query': tracker.product_at(query_milepost, query_time),
+        'contents': [{'product': batch['product'], 'volume_bbl': round(batch['volume_bbl']),
+                      'tail_milepost': round(batch['tail_milepost'], 2),
+                      'head_milepost': round(batch['head_milepost'], 2)} for batch in tracker.contents(query_time)],
+        'delivered': delivered,
+        'figure': fig.to_dict(),
+    }
+
+
+@app.callback(
+    Output('pv-bt-output', 'children'),
+    Input('pv-bt-btn', 'n_clicks'),
+    State('pv-diameter', 'value'),
+    State('pv-wall-thickness', 'value'),
+    State('pv-distance', 'value'),
+    State('pv-bt-initial', 'value'),
+    State('pv-bt-events', 'data'),
+    State('pv-bt-milepost', 'value'),
+    State('pv-bt-time', 'value')
+)
+def track_batches(n_clicks, diameter, wall_thickness, distance, initial_product, rows, query_milepost, query_time):
+    if n_clicks:
+        # Skip rows with blank cells; events run in time order
+        rows = [row for row in rows or [] if all(row.get(column) not in (None, '') for column in BATCH_EVENT_HEADERS)]
+        events = tuple(sorted((float(row['time_h']), str(row['product']), float(row['volume_bbl'])) for row in rows))
+        inputs = (parse_number(diameter) - 2 * parse_number(wall_thickness), parse_number(distance),
+                  initial_product or 'Unknown', events, parse_number(query_milepost), parse_number(query_time))
+        try:
+            result = result_cache.get_or_compute(('batch-tracking',) + inputs, lambda: compute_batch_tracking(*inputs))
+        except ValueError as e:
+            return dbc.Alert(str(e), color='danger')
+
+        return html.Div([
+            html.H4("Line Fill", className="text-white"),
+            html.Ul([
+                html.Li(f"Line Volume: {result['line_volume_bbl']:,.0f} barrels"),
+                html.Li(f"At milepost {inputs[4]:,.2f} at {inputs[5]:,.2f} h: {result['product_at_query']}"),
+                html.Li("Delivered at the outlet: " + (", ".join(
+                    f"{product} {barrels:,.0f} bbl" for product, barrels in result['delivered'].items()) or "nothing")),
+            ]),
+            dash_table.DataTable(
+                columns=[{'name': 'Product', 'id': 'product'}, {'name': 'Volume (bbl)', 'id': 'volume_bbl'},
+                         {'name': 'From Milepost', 'id': 'tail_milepost'}, {'name': 'To Milepost', 'id': 'head_milepost'}],
+                data=result['contents'],
+                style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+                style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+            ),
+            dcc.Graph(figure=result['figure'])
+        ])
+    return ''
+
+# Friction factor sweep variables: label, unit, and default start, stop and number of points
+SWEEP_SETTINGS = {
+    'flow_rate_bpd': ("Flow Rate", "bpd", 10000, 200000, 100),
+    'diameter_in': ("Inside Diameter", "inches", 6, 24, 10),
+    'viscosity_cst': ("Kinematic Viscosity", "cSt", 1, 50, 10),
+    'drag_reduction': ("Drag Reduction", "%", 0, 50, 6),
+}
+
+
+def sweep_range_inputs(prefix, variable):
+    _, unit, start, stop, points = SWEEP_SETTINGS[variable]
+    return dbc.InputGroup([
+        dbc.Input(id=f'{prefix}-start', type='text', value="{:,}".format(start)),
+        dbc.InputGroupText("to"),
+        dbc.Input(id=f'{prefix}-stop', type='text', value="{:,}".format(stop)),
+        dbc.InputGroupText(unit, id=f'{prefix}-unit'),
+        dbc.Input(id=f'{prefix}-points', type='text', value="{:,}".format(points)),
+        dbc.InputGroupText("points"),
+    ], className="mb-2")
+
+
+# Sweep range over one input, plus an optional series of a second input drawn as separate curves
+def sweep_settings():
+    variables = [{'label': settings[0], 'value': name} for name, settings in SWEEP_SETTINGS.items()]
+    return html.Div([
+        dbc.Label("Sweep:", className="text-white"),
+        dbc.Select(id='ff-sweep-variable', options=variables, value='flow_rate_bpd', className="mb-1"),
+        sweep_range_inputs('ff-sweep', 'flow_rate_bpd'),
+        dbc.Label("Series:", className="text-white"),
+        dbc.Select(id='ff-series-variable', options=[{'label': 'None', 'value': 'none'}] + variables,
+                   value='none', className="mb-1"),
+        sweep_range_inputs('ff-series', 'diameter_in'),
+    ])
+
+
+# Uncertain inputs: the central value is the input above, the spread is a standard deviation for normal and
+# lognormal and a half-width for uniform and triangular
+UNCERTAINTY_SETTINGS = {
+    'roughness_ft': ('roughness-ft', "Roughness", "feet", 'lognormal', 0.00005),
+    'viscosity_cst': ('viscosity', "Kinematic Viscosity", "cSt", 'normal', 0.3),
+    'specific_gravity': ('specific-gravity', "Specific Gravity", "", 'uniform', 0.01),
+}
+UNCERTAINTY_DRAWS = 1_000_000
+MAX_UNCERTAINTY_DRAWS = 10_000_000
+
+
+def uncertainty_settings():
+    distributions = [{'label': name.capitalize(), 'value': name} for name in uncertainty.DISTRIBUTIONS]
+    rows = []
+    for suffix, label, unit, distribution, spread in UNCERTAINTY_SETTINGS.values():
+        rows += [
+            dbc.Label(f"{label}:", className="text-white"),
+            dbc.InputGroup([
+                dbc.Select(id=f'ff-{suffix}-distribution', options=distributions, value=distribution),
+                dbc.InputGroupText("\u00b1"),
+                dbc.Input(id=f'ff-{suffix}-spread', type='text', value="{:,}".format(spread)),
+            ] + ([dbc.InputGroupText(unit)] if unit else []), className="mb-2"),
+        ]
+    return html.Div(rows + [
+        dbc.Label("Draws:", className="text-white"),
+        dbc.Input(id='ff-draws', type='text', value="{:,}".format(UNCERTAINTY_DRAWS), className="mb-2"),
+    ])
+
+
+# Thermal mode inputs: label, unit and default. Viscosity comes from a Walther curve through the two
+# reference points instead of the single viscosity input.
+THERMAL_SETTINGS = {
+    'length_mi': ('length', "Line Length", "miles", 60),
+    'segments': ('segments', "Segments", "", 200),
+    'inlet_temperature_f': ('inlet-temperature', "Inlet Temperature", "°F", 130),
+    'ground_temperature_f': ('ground-temperature', "Ground Temperature", "°F", 50),
+    'heat_transfer': ('heat-transfer', "Heat Transfer Coefficient", "BTU/hr·ft²·°F", 0.3),
+    'specific_heat': ('specific-heat', "Specific Heat", "BTU/lb·°F", thermal.SPECIFIC_HEAT_BTU_LB_F),
+    'temperature_1_f': ('reference-1-temperature', "Reference 1 Temperature", "°F", 50),
+    'viscosity_1_cst': ('reference-1-viscosity', "Reference 1 Viscosity", "cSt", 120),
+    'temperature_2_f': ('reference-2-temperature', "Reference 2 Temperature", "°F", 120),
+    'viscosity_2_cst': ('reference-2-viscosity', "Reference 2 Viscosity", "cSt", 15),
+}
+
+
+def thermal_settings():
+    rows = [html.P("Viscosity follows an ASTM D341 curve through the two reference points.", className="text-light")]
+    for suffix, label, unit, value in THERMAL_SETTINGS.values():
+        rows += [
+            dbc.Label(f"{label}:", className="text-white"),
+            dbc.InputGroup([
+                dbc.Input(id=f'ff-{suffix}', type='text', value="{:,}".format(value)),
+            ] + ([dbc.InputGroupText(unit)] if unit else []), className="mb-2"),
+        ]
+    return html.Div(rows)
+
+
+# Inverse mode: what to solve for, against a pressure budget
+INVERSE_TARGETS = {
+    'max-flow': "Maximum flow rate (uses the drag reduction above)",
+    'drag-reduction': "Required drag reduction (at the flow rate above)",
+}
+
+
+def inverse_settings():
+    return html.Div([
+        dbc.Label("Solve For:", className="text-white"),
+        dbc.Select(id='ff-inverse-target', options=[{'label': label, 'value': target}
+                                                     for target, label in INVERSE_TARGETS.items()],
+                   value='max-flow', className="mb-1"),
+        dbc.Label("Allowable Pressure Loss:", className="text-white"),
+        dbc.InputGroup([
+            dbc.Input(id='ff-allowable-loss', type='text', value="{:,}".format(20)),
+            dbc.InputGroupText("psi/mile"),
+        ], className="mb-2"),
+    ])
+
 
 # Friction Factor Calculator Layout and Callback
+@cache
 def friction_factor_layout():
     return dbc.Container([
         dbc.Row(dbc.Col(html.H2("Friction Factor Calculator", className="text-left text-light"))),
@@ -165,7 +664,8 @@ def friction_factor_layout():
             dbc.Col(
                 dbc.Card([
                     dbc.CardBody([
-                        dbc.Label("Diameter:", className="text-white"),
+                        pipe_size_select('ff', '12', 'STD'),
+                        dbc.Label("Inside Diameter:", className="text-white"),
                         dbc.InputGroup([
                             dbc.Input(id='ff-diameter', type='text', value="{:,}".format(12), className="mb"),
                             dbc.InputGroupText("inches")
@@ -194,6 +694,22 @@ def friction_factor_layout():
                             dbc.Input(id='ff-drag-reduction', type='', value="0%", className="mb"),
                             dbc.InputGroupText("%")
                         ]),
+                        dbc.Label("Mode:", className="text-white mt-2"),
+                        dbc.RadioItems(
+                            id='ff-mode',
+                            options=[{'label': 'Single point', 'value': 'single'},
+                                     {'label': 'Sweep', 'value': 'sweep'},
+                                     {'label': 'Uncertainty', 'value': 'uncertainty'},
+                                     {'label': 'Thermal', 'value': 'thermal'},
+                                     {'label': 'Inverse', 'value': 'inverse'}],
+                            value='single',
+                            inline=True,
+                            className="text-white"
+                        ),
+                        dbc.Collapse(sweep_settings(), id='ff-sweep-settings', is_open=False),
+                        dbc.Collapse(uncertainty_settings(), id='ff-uncertainty-settings', is_open=False),
+                        dbc.Collapse(thermal_settings(), id='ff-thermal-settings', is_open=False),
+                        dbc.Collapse(inverse_settings(), id='ff-inverse-settings', is_open=False),
                         dbc.ButtonGroup([
                             dbc.Button('Calculate', id='ff-calculate-btn', color='danger'),
                             dbc.Button('Pipe Wall Thickness', id='fluid-flow-offcanvas-btn', color='secondary')
@@ -202,12 +718,17 @@ def friction_factor_layout():
                 ], className="mb-4"),
                 width=4  # Inputs on the left
             ),
-            dbc.Col(
+            dbc.Col([
                 html.Div(id='ff-output', className="text-light"),
-                width=8  # Output on the right
-            )
+                html.Div(job_progress('ff-job'), id='ff-job-progress-row', style={'display': 'none'}),
+                dcc.Store(id='ff-job-shown'),
+                # The chart stays in the page; single-point recalculations patch its values in place
+                dcc.Graph(id='ff-graph', figure={}, style={'display': 'none'}),
+                dcc.Store(id='ff-figure-kind'),
+            ], width=8)  # Output on the right
         ], justify='center'),
         html.Hr(className="my-4"),
+        dbc.Row(dbc.Col(batch_upload_card('ff', 'pressure-loss'), width=12)),
         fluid_flow_offcanvas()
     ], fluid=True, className="bg-dark")
 
@@ -232,105 +753,607 @@ def toggle_fluid_offcanvas(n_clicks, is_open):
        return not is_open
    return is_open
 
+@app.callback(
+    Output('ff-sweep-settings', 'is_open'),
+    Output('ff-uncertainty-settings', 'is_open'),
+    Output('ff-thermal-settings', 'is_open'),
+    Output('ff-inverse-settings', 'is_open'),
+    Input('ff-mode', 'value')
+)
+def toggle_mode_settings(mode):
+    return mode == 'sweep', mode == 'uncertainty', mode == 'thermal', mode == 'inverse'
+
+@app.callback(
+    Output('ff-sweep-start', 'value'),
+    Output('ff-sweep-stop', 'value'),
+    Output('ff-sweep-points', 'value'),
+    Output('ff-sweep-unit', 'children'),
+    Input('ff-sweep-variable', 'value'),
+    prevent_initial_call=True
+)
+def reset_sweep_range(variable):
+    _, unit, start, stop, points = SWEEP_SETTINGS[variable]
+    return "{:,}".format(start), "{:,}".format(stop), "{:,}".format(points), unit
+
+@app.callback(
+    Output('ff-series-start', 'value'),
+    Output('ff-series-stop', 'value'),
+    Output('ff-series-points', 'value'),
+    Output('ff-series-unit', 'children'),
+    Input('ff-series-variable', 'value'),
+    prevent_initial_call=True
+)
+def reset_series_range(variable):
+    if variable not in SWEEP_SETTINGS:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    _, unit, start, stop, points = SWEEP_SETTINGS[variable]
+    return "{:,}".format(start), "{:,}".format(stop), "{:,}".format(points), unit
+
+# Numbers for one operating point; the chart is filled from them by friction_figure
+def compute_friction_factor(diameter_in, flow_rate_bpd, roughness_ft, specific_gravity, viscosity_cst, drag_reduction):
+    # Run the vectorized engine for this single operating point
+    result = hydraulics.friction_pressure_loss(diameter_in, flow_rate_bpd, roughness_ft, viscosity_cst,
+                                               specific_gravity, drag_reduction)
+    methods = {method: float(f) for method, f in result['friction_factors'].items()}
+    pressure_losses = {method: float(dp) for method, dp in result['pressure_loss_psi_per_mile'].items()}
+
+    return {
+        'velocity_fps': float(result['velocity_fps']),
+        'reynolds_number': float(result['reynolds_number']),
+        'flow_regime': str(result['flow_regime']),
+        'friction_factors': methods,
+        'pressure_losses': pressure_losses,
+    }
+
+
+# Bar chart with one bar per method and no values yet, built once per process
+@cache
+def friction_figure_skeleton():
+    import plotly.graph_objs as go
+
+    fig = go.Figure(data=[
+        go.Bar(name=method, x=[method], y=[None], text=[''], textposition='auto')
+        for method in hydraulics.METHODS
+    ])
+    fig.update_layout(
+        title='Friction Factor Comparison',
+        xaxis_title='Method',
+        yaxis_title='Pressure Loss (psi)',
+        template='plotly_dark',
+        showlegend=False
+    )
+    return fig.to_dict()
+
+
+# The bar chart for a set of pressure losses. When the graph already shows the bars only the y-values and
+# labels are sent, as a Patch; otherwise the skeleton goes out once with the values filled in.
+def friction_figure(pressure_losses, graph_has_bars):
+    values = [pressure_losses[method] for method in hydraulics.METHODS]
+    labels = [f"{dp:,.1f} psi" for dp in values]
+    if graph_has_bars:
+        figure = Patch()
+        for i, (dp, label) in enumerate(zip(values, labels)):
+            figure['data'][i]['y'] = [dp]
+            figure['data'][i]['text'] = [label]
+        return figure
+    skeleton = friction_figure_skeleton()
+    return dict(skeleton, data=[dict(trace, y=[dp], text=[label])
+                                for trace, dp, label in zip(skeleton['data'], values, labels)])
+
+
+MAX_SWEEP_POINTS = 200000
+# Bigger sweeps run as a background job, a block of swept values at a time, drawing the curves as they grow
+BACKGROUND_SWEEP_POINTS = 20000
+SWEEP_JOB_BLOCKS = 10
+
+
+def sweep_grid(variable, start, stop, points):
+    display = np.linspace(start, stop, int(points))
+    # Drag reduction is entered in percent but calculated as a fraction
+    return display, display / 100 if variable == 'drag_reduction' else display
+
+
+# Pressure loss curves per method over a swept input, optionally for several values of a second input.
+# base holds the single-point inputs; every point of the grid is evaluated in one vectorized pass, or, when
+# running as a background job, one pass per block of swept values with a partial chart after each.
+def compute_friction_sweep(base, sweep_variable, sweep_range, series_variable=None, series_range=None, job=None):
+    x_display, x_values = sweep_grid(sweep_variable, *sweep_range)
+    if series_variable is None:
+        series_display, series_values = [None], None
+    else:
+        series_display, series_values = sweep_grid(series_variable, *series_range)
+
+    blocks = np.array_split(np.arange(x_values.size), 1 if job is None else min(SWEEP_JOB_BLOCKS, x_values.size))
+    pressure_losses = {}
+    not_converged = 0
+    for k, block in enumerate(blocks):
+        result = hydraulics.friction_sweep(base, sweep_variable, x_values[block], series_variable, series_values)
+        for method, dp in result['pressure_loss_psi_per_mile'].items():
+            pressure_losses.setdefault(method, []).append(np.broadcast_to(dp, (len(series_display), block.size)))
+        not_converged += int(np.size(result['converged']) - np.count_nonzero(result['converged']))
+        if job is not None and k + 1 < len(blocks):
+            done = int(block[-1]) + 1
+            job.report(k + 1, len(blocks), f"{done * len(series_display):,} points evaluated", partial=sweep_figure(
+                x_display[:done], series_display, {method: np.hstack(dp) for method, dp in pressure_losses.items()},
+                sweep_variable, series_variable))
+
+    return {
+        'points': int(x_values.size * len(series_display)),
+        'not_converged': not_converged,
+        'figure': sweep_figure(x_display, series_display,
+                               {method: np.hstack(dp) for method, dp in pressure_losses.items()},
+                               sweep_variable, series_variable),
+    }
+
+
+def sweep_figure(x_display, series_display, pressure_losses, sweep_variable, series_variable):
+    import plotly.graph_objs as go
+
+    x_label, x_unit = SWEEP_SETTINGS[sweep_variable][:2]
+    traces = []
+    for i, series_value in enumerate(series_display):
+        suffix = ''
+        if series_value is not None:
+            label, unit = SWEEP_SETTINGS[series_variable][:2]
+            suffix = f" ({label} {series_value:,.4g} {unit})"
+        for method, dp in pressure_losses.items():
+            traces.append(go.Scatter(x=x_display, y=dp[i], mode='lines', name=f"{method}{suffix}",
+                                     legendgroup=method))
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        title='System Curve',
+        xaxis_title=f'{x_label} ({x_unit})',
+        yaxis_title='Pressure Loss (psi/mile)',
+        template='plotly_dark'
+    )
+    return fig.to_dict()
+
+
+# Job body for a background sweep; the finished result goes into the result cache like an inline one.
+# Fluid-flow jobs return (details, figure) ready for the page.
+def friction_sweep_job(job, key, *sweep):
+    result = compute_friction_sweep(*sweep, job=job)
+    result_cache.set(key, result)
+    return sweep_details(result), result['figure']
+
+
+def sweep_details(result):
+    details = [html.Li(f"Points evaluated: {result['points']:,}")]
+    if result['not_converged']:
+        details.append(html.Li(f"Colebrook-White did not converge at {result['not_converged']:,} points"))
+    return html.Div([
+        html.H4("Sweep Details", className="text-white"),
+        html.Ul(details),
+        html.Hr(),
+    ])
+
+
+# Returns (details, figure, job id): the figure when the sweep was evaluated here, the job id when it was
+# handed to a background job instead, neither when the inputs were rejected
+def render_friction_sweep(base, sweep_variable, sweep_range, series_variable, series_range):
+    if series_variable == sweep_variable:
+        return html.P("Choose a series variable different from the swept one.", className="text-warning"), None, None
+    points = sweep_range[2] * (series_range[2] if series_range else 1)
+    if sweep_range[2] < 2 or (series_range and series_range[2] < 1) or points > MAX_SWEEP_POINTS:
+        return html.P(f"A sweep needs at least 2 points and at most {MAX_SWEEP_POINTS:,} in total.",
+                      className="text-warning"), None, None
+
+    key = ('fluid-flow-sweep', tuple(sorted(base.items())), sweep_variable, sweep_range, series_variable, series_range)
+    sweep = (base, sweep_variable, sweep_range, series_variable, series_range)
+    result = result_cache.get(key)
+    if result is None:
+        if points > BACKGROUND_SWEEP_POINTS:
+            job_id = background_jobs.submit(friction_sweep_job, key, *sweep)
+            return html.P(f"Evaluating {points:,.0f} points in the background...", className="text-light"), None, job_id
+        result = compute_friction_sweep(*sweep)
+        result_cache.set(key, result)
+    return sweep_details(result), result['figure'], None
+
+
+# Percentiles, histogram and chart of friction factor and pressure loss over random draws of the uncertain
+# inputs (see uncertainty.py); as a background job the histogram is redrawn after every chunk of draws
+def compute_friction_uncertainty(fixed, distributions, draws, job=None):
+    def progress(done, chunks, valid, summaries):
+        if done < chunks:
+            job.report(done, chunks, f"{valid:,} draws evaluated",
+                       partial=uncertainty_figure(uncertainty.histograms(summaries)))
+
+    result = uncertainty.run(fixed, distributions, draws, progress=None if job is None else progress)
+    result['figure'] = uncertainty_figure(result.pop('histogram'))
+    return result
+
+
+def uncertainty_figure(histograms):
+    import plotly.graph_objs as go
+
+    traces = []
+    for method, (edges, counts) in histograms.items():
+        traces.append(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), name=method,
+                             opacity=0.6))
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        title='Pressure Loss Distribution',
+        xaxis_title='Pressure Loss (psi/mile)',
+        yaxis_title='Draws',
+        barmode='overlay',
+        template='plotly_dark'
+    )
+    return fig.to_dict()
+
+
+def uncertainty_details(result):
+    percentiles = result['percentiles']
+    shown = [percentiles.index(q) for q in (5, 50, 95)]
+    rows = []
+    for method, f in result['friction_factor'].items():
+        dp = result['pressure_loss_psi_per_mile'][method]
+        row = {'method': method, 'mean': f"{dp['mean']:,.2f}", 'std': f"{dp['std']:,.2f}"}
+        for q, i in zip((5, 50, 95), shown):
+            row[f'p{q}'] = f"{dp['percentile_values'][i]:,.2f}"
+            row[f'f{q}'] = f"{f['percentile_values'][i]:.6f}"
+        rows.append(row)
+    columns = [('method', 'Method'), ('mean', 'Mean psi/mi'), ('std', 'Std Dev'), ('p5', 'P5 psi/mi'),
+               ('p50', 'P50 psi/mi'), ('p95', 'P95 psi/mi'), ('f5', 'P5 f'), ('f50', 'P50 f'), ('f95', 'P95 f')]
+    details = [html.Li(f"Draws: {result['draws']:,}")]
+    if result['valid_draws'] < result['draws']:
+        details.append(html.Li(f"Dropped {result['draws'] - result['valid_draws']:,} draws with a non-positive input"))
+    return html.Div([
+        html.H4("Uncertainty", className="text-white"),
+        html.Ul(details),
+        dash_table.DataTable(
+            columns=[{'name': name, 'id': column} for column, name in columns],
+            data=rows,
+            style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+            style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+        ),
+        html.Hr(),
+    ])
+
+
+def friction_uncertainty_job(job, key, *run):
+    result = compute_friction_uncertainty(*run, job=job)
+    result_cache.set(key, result)
+    return uncertainty_details(result), result['figure']
+
+
+# Returns (details, figure, job id) like render_friction_sweep; runs of more than one chunk of draws go to a
+# background job
+def render_friction_uncertainty(fixed, distributions, draws):
+    if not 1 <= draws <= MAX_UNCERTAINTY_DRAWS:
+        return html.P(f"Draws must be between 1 and {MAX_UNCERTAINTY_DRAWS:,}.", className="text-warning"), None, None
+    try:
+        uncertainty.validate(distributions)
+    except ValueError as e:
+        return html.P(str(e), className="text-warning"), None, None
+
+    key = ('fluid-flow-uncertainty', tuple(sorted(fixed.items())), tuple(sorted(distributions.items())), draws)
+    result = result_cache.get(key)
+    if result is None:
+        if draws > uncertainty.CHUNK_DRAWS:
+            job_id = background_jobs.submit(friction_uncertainty_job, key, fixed, distributions, draws)
+            return html.P(f"Evaluating {draws:,} draws in the background...", className="text-light"), None, job_id
+        result = compute_friction_uncertainty(fixed, distributions, draws)
+        result_cache.set(key, result)
+    return uncertainty_details(result), result['figure'], None
+
+
+# Temperature, viscosity and pressure along the line for every method (see thermal.py), next to the loss the
+# single-point calculation would give at the inlet viscosity
+def compute_friction_thermal(base, settings):
+    import plotly.graph_objs as go
+    from plotly.subplots import make_subplots
+
+    a, b = thermal.walther_curve(settings['temperature_1_f'], settings['viscosity_1_cst'],
+                                 settings['temperature_2_f'], settings['viscosity_2_cst'])
+    profiles = {
+        method: thermal.march(settings['length_mi'], base['diameter_in'], base['flow_rate_bpd'], base['roughness_ft'],
+                              base['specific_gravity'], settings['inlet_temperature_f'],
+                              settings['ground_temperature_f'], settings['heat_transfer'], a, b,
+                              settings['specific_heat'], base['drag_reduction'], settings['segments'], method)
+        for method in hydraulics.METHODS
+    }
+    isothermal = hydraulics.friction_pressure_loss(base['diameter_in'], base['flow_rate_bpd'], base['roughness_ft'],
+                                                   thermal.viscosity_at(settings['inlet_temperature_f'], a, b),
+                                                   base['specific_gravity'], base['drag_reduction'])
+
+    fig = make_subplots(specs=[[{'secondary_y': True}]])
+    for method, profile in profiles.items():
+        fig.add_trace(go.Scatter(x=profile['milepost'][:, 0], y=profile['cumulative_pressure_loss_psi'][:, 0],
+                                 mode='lines', name=f'{method} loss'), secondary_y=False)
+    reference = profiles[hydraulics.METHODS[0]]
+    fig.add_trace(go.Scatter(x=reference['milepost'][:, 0], y=reference['temperature_f'][:, 0], mode='lines',
+                             name='Temperature', line={'dash': 'dot'}), secondary_y=True)
+    fig.update_layout(
+        title='Thermal-Hydraulic Profile',
+        xaxis_title='Milepost (mi)',
+        template='plotly_dark'
+    )
+    fig.update_yaxes(title_text='Cumulative Pressure Loss (psi)', secondary_y=False)
+    fig.update_yaxes(title_text='Temperature (°F)', secondary_y=True)
+
+    return {
+        'outlet_temperature_f': float(reference['outlet_temperature_f'][0]),
+        'inlet_viscosity_cst': float(reference['inlet_viscosity_cst'][0]),
+        'outlet_viscosity_cst': float(reference['outlet_viscosity_cst'][0]),
+        'reynolds_range': (float(reference['reynolds_number'].min()), float(reference['reynolds_number'].max())),
+        'pressure_losses': {method: float(profile['total_pressure_loss_psi'][0])
+                            for method, profile in profiles.items()},
+        'isothermal_losses': {method: float(dp) * settings['length_mi']
+                              for method, dp in isothermal['pressure_loss_psi_per_mile'].items()},
+        'figure': fig.to_dict(),
+    }
+
+
+def thermal_details(result):
+    rows = [{'method': method, 'loss': f"{dp:,.1f}", 'isothermal': f"{result['isothermal_losses'][method]:,.1f}"}
+            for method, dp in result['pressure_losses'].items()]
+    return html.Div([
+        html.H4("Thermal-Hydraulic Details", className="text-white"),
+        html.Ul([
+            html.Li(f"Outlet temperature: {result['outlet_temperature_f']:,.1f} °F"),
+            html.Li(f"Viscosity: {result['inlet_viscosity_cst']:,.2f} cSt at the inlet, "
+                    f"{result['outlet_viscosity_cst']:,.2f} cSt at the outlet"),
+            html.Li("Reynolds number: {:,.0f} to {:,.0f}".format(*result['reynolds_range'])),
+        ]),
+        dash_table.DataTable(
+            columns=[{'name': 'Method', 'id': 'method'}, {'name': 'Line Loss (psi)', 'id': 'loss'},
+                     {'name': 'At Inlet Viscosity (psi)', 'id': 'isothermal'}],
+            data=rows,
+            style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+            style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+        ),
+        html.Hr(),
+    ])
+
+
+# Returns (details, figure, job id) like render_friction_sweep; a march is quick, so it never needs a job
+def render_friction_thermal(base, settings):
+    key = ('fluid-flow-thermal', tuple(sorted(base.items())), tuple(sorted(settings.items())))
+    try:
+        result = result_cache.get_or_compute(key, lambda: compute_friction_thermal(base, settings))
+    except ValueError as e:
+        return html.P(str(e), className="text-warning"), None, None
+    return thermal_details(result), result['figure'], None
+
+
+# Maximum flow or required drag reduction for every method (see inverse.py), with the loss curves the answer
+# is read from: loss against flow, the pressure budget, and the answer marked on each curve
+def compute_friction_inverse(base, target, allowable_psi_per_mile):
+    import plotly.graph_objs as go
+
+    if target == 'max-flow':
+        solutions = {method: inverse.max_flow_rate(base['diameter_in'], allowable_psi_per_mile, base['roughness_ft'],
+                                                   base['viscosity_cst'], base['specific_gravity'],
+                                                   base['drag_reduction'], method=method)
+                     for method in hydraulics.METHODS}
+        answers = {method: float(solution['flow_rate_bpd'][0]) for method, solution in solutions.items()}
+        if not all(np.isfinite(flow) for flow in answers.values()):
+            raise ValueError('No flow rate meets that pressure budget')
+        feasible = {method: True for method in hydraulics.METHODS}
+        marked_flow = answers
+        curve_drag_reduction = base['drag_reduction']
+    else:
+        solutions = {method: inverse.required_drag_reduction(base['diameter_in'], base['flow_rate_bpd'],
+                                                             allowable_psi_per_mile, base['roughness_ft'],
+                                                             base['viscosity_cst'], base['specific_gravity'],
+                                                             method=method)
+                     for method in hydraulics.METHODS}
+        answers = {method: float(solution['drag_reduction'][0]) for method, solution in solutions.items()}
+        feasible = {method: bool(solution['feasible'][0]) for method, solution in solutions.items()}
+        marked_flow = {method: base['flow_rate_bpd'] for method in hydraulics.METHODS}
+        curve_drag_reduction = 0.0
+
+    flows = np.linspace(0, 1.5 * max(marked_flow.values()), 201)[1:]
+    curves = hydraulics.friction_pressure_loss(base['diameter_in'], flows, base['roughness_ft'], base['viscosity_cst'],
+                                               base['specific_gravity'], curve_drag_reduction)
+    marked = hydraulics.friction_pressure_loss(base['diameter_in'], np.array(list(marked_flow.values())),
+                                               base['roughness_ft'], base['viscosity_cst'], base['specific_gravity'],
+                                               curve_drag_reduction)
+    fig = go.Figure()
+    for i, method in enumerate(hydraulics.METHODS):
+        fig.add_trace(go.Scatter(x=flows, y=curves['pressure_loss_psi_per_mile'][method], mode='lines', name=method))
+        fig.add_trace(go.Scatter(x=[marked_flow[method]], y=[marked['pressure_loss_psi_per_mile'][method][i]],
+                                 mode='markers', marker={'size': 9}, showlegend=False, name=method))
+    fig.add_hline(y=allowable_psi_per_mile, line_dash='dot', annotation_text='Allowable loss')
+    fig.update_layout(
+        title='Maximum Flow Rate' if target == 'max-flow' else 'Loss Without Drag Reduction',
+        xaxis_title='Flow Rate (bpd)',
+        yaxis_title='Pressure Loss (psi/mile)',
+        template='plotly_dark'
+    )
+    return {
+        'target': target,
+        'answers': answers,
+        'feasible': feasible,
+        'figure': fig.to_dict(),
+    }
+
+
+def inverse_details(result, allowable_psi_per_mile):
+    if result['target'] == 'max-flow':
+        heading = f"Maximum Flow Rate at {allowable_psi_per_mile:,.2f} psi/mile"
+        column = 'Flow Rate (bpd)'
+        rows = [{'method': method, 'answer': f"{flow:,.0f}"} for method, flow in result['answers'].items()]
+    else:
+        heading = f"Drag Reduction Needed for {allowable_psi_per_mile:,.2f} psi/mile"
+        column = 'Drag Reduction'
+        rows = [{'method': method, 'answer': f"{dr:.1%}" if result['feasible'][method]
+                 else f"{dr:.1%} (over the {inverse.MAX_DRAG_REDUCTION:.0%} achievable)"}
+                for method, dr in result['answers'].items()]
+    return html.Div([
+        html.H4(heading, className="text-white"),
+        dash_table.DataTable(
+            columns=[{'name': 'Method', 'id': 'method'}, {'name': column, 'id': 'answer'}],
+            data=rows,
+            style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+            style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+        ),
+        html.Hr(),
+    ])
+
+
+# Returns (details, figure, job id) like render_friction_sweep; the root finding is quick, so it never needs a job
+def render_friction_inverse(base, target, allowable_psi_per_mile):
+    if allowable_psi_per_mile <= 0:
+        return html.P("Allowable pressure loss must be positive.", className="text-warning"), None, None
+    key = ('fluid-flow-inverse', tuple(sorted(base.items())), target, allowable_psi_per_mile,
+           inverse.MAX_DRAG_REDUCTION)
+    try:
+        result = result_cache.get_or_compute(key, lambda: compute_friction_inverse(base, target,
+                                                                                   allowable_psi_per_mile))
+    except ValueError as e:
+        return html.P(str(e), className="text-warning"), None, None
+    return inverse_details(result, allowable_psi_per_mile), result['figure'], None
+
+
+@app.callback(
+    Output('ff-schedule', 'options'),
+    Output('ff-diameter', 'value'),
+    Input('ff-nps', 'value'),
+    Input('ff-schedule', 'value'),
+    prevent_initial_call=True
+)
+def fill_friction_factor_size(nps, schedule):
+    try:
+        pipe = pipe_schedule.lookup(nps, schedule)
+    except ValueError:
+        return schedule_options(nps), dash.no_update
+    return schedule_options(nps), "{:,.3f}".format(pipe['inside_diameter_in'])
+
+
 @app.callback(
     Output('ff-output', 'children'),
+    Output('ff-graph', 'figure'),
+    Output('ff-graph', 'style'),
+    Output('ff-figure-kind', 'data'),
+    Output('ff-job', 'data'),
     Input('ff-calculate-btn', 'n_clicks'),
     State('ff-diameter', 'value'),
     State('ff-flow-rate', 'value'),
     State('ff-roughness-ft', 'value'),
     State('ff-specific-gravity', 'value'),
     State('ff-viscosity', 'value'),
-    State('ff-drag-reduction', 'value')
+    State('ff-drag-reduction', 'value'),
+    State('ff-mode', 'value'),
+    State('ff-sweep-variable', 'value'),
+    State('ff-sweep-start', 'value'),
+    State('ff-sweep-stop', 'value'),
+    State('ff-sweep-points', 'value'),
+    State('ff-series-variable', 'value'),
+    State('ff-series-start', 'value'),
+    State('ff-series-stop', 'value'),
+    State('ff-series-points', 'value'),
+    State('ff-roughness-ft-distribution', 'value'),
+    State('ff-roughness-ft-spread', 'value'),
+    State('ff-viscosity-distribution', 'value'),
+    State('ff-viscosity-spread', 'value'),
+    State('ff-specific-gravity-distribution', 'value'),
+    State('ff-specific-gravity-spread', 'value'),
+    State('ff-draws', 'value'),
+    State('ff-length', 'value'),
+    State('ff-segments', 'value'),
+    State('ff-inlet-temperature', 'value'),
+    State('ff-ground-temperature', 'value'),
+    State('ff-heat-transfer', 'value'),
+    State('ff-specific-heat', 'value'),
+    State('ff-reference-1-temperature', 'value'),
+    State('ff-reference-1-viscosity', 'value'),
+    State('ff-reference-2-temperature', 'value'),
+    State('ff-reference-2-viscosity', 'value'),
+    State('ff-inverse-target', 'value'),
+    State('ff-allowable-loss', 'value'),
+    State('ff-figure-kind', 'data'),
+    State('ff-job', 'data')
 )
-def calculate_friction_factor(n_clicks, diameter_in, flow_rate_bpd, roughness_ft, specific_gravity, viscosity_cst, drag_reduction):
+def calculate_friction_factor(n_clicks, diameter_in, flow_rate_bpd, roughness_ft, specific_gravity, viscosity_cst, drag_reduction,
+                              mode='single', sweep_variable=None, sweep_start=None, sweep_stop=None, sweep_points=None,
+                              series_variable=None, series_start=None, series_stop=None, series_points=None,
+                              roughness_distribution='fixed', roughness_spread=None, viscosity_distribution='fixed',
+                              viscosity_spread=None, gravity_distribution='fixed', gravity_spread=None, draws=None,
+                              length_mi=None, segments=None, inlet_temperature_f=None, ground_temperature_f=None,
+                              heat_transfer=None, specific_heat=None, temperature_1_f=None, viscosity_1_cst=None,
+                              temperature_2_f=None, viscosity_2_cst=None, inverse_target='max-flow',
+                              allowable_loss=None, figure_kind=None, running_job=None):
     if n_clicks:
-        # Remove commas and convert to float
-        diameter_in = float(diameter_in.replace(',', ''))
-        flow_rate_bpd = float(flow_rate_bpd.replace(',', ''))
-        roughness_ft = float(roughness_ft.replace(',', ''))
-        specific_gravity = float(specific_gravity.replace(',', ''))
-        viscosity_cst = float(viscosity_cst.replace(',', ''))
-        drag_reduction = float(drag_reduction.replace('%',''))/100
-
-        # Convert inputs to consistent units
-        diameter_ft = diameter_in / 12  # Convert diameter to feet
-        diameter_m = diameter_ft * 0.3048  # Convert diameter to meters
-        area_sqft = math.pi * (diameter_ft / 2) ** 2  # Cross-sectional area in square feet
-        flow_rate_cfs = (flow_rate_bpd * 5.614583) / (24 * 3600)  # Convert flow rate to cubic feet per second
-        velocity_fps = flow_rate_cfs / area_sqft  # Velocity in feet per second
-        velocity_mps = velocity_fps * 0.3048  # Velocity in meters per second
-        viscosity_m2s = viscosity_cst * 1e-6  # Kinematic viscosity in m²/s
-        reynolds_number = (velocity_mps * diameter_m) / viscosity_m2s
-
-        # Friction Factor Calculations
-        methods = {}
-        # Colebrook-White equation using fsolve
-        def colebrook(f):
-            return 1.0 / math.sqrt(f) + 2.0 * math.log10(roughness_ft / 3.7 + 2.51 / (reynolds_number * math.sqrt(f)))
-        initial_guess = 0.02
-        friction_factor_cw = fsolve(colebrook, initial_guess)[0]
-        methods['Colebrook-White'] = friction_factor_cw
-
-        # Swamee-Jain equation
-        friction_factor_sj = 0.25 / (math.log10(roughness_ft / 3.7 + 5.74 / (reynolds_number ** 0.9))) ** 2
-        methods['Swamee-Jain'] = friction_factor_sj
-
-
-        # Clamond equation
-        X1 = (roughness_ft / diameter_ft) * reynolds_number * 0.1239681863354175460160858261654858382699  # (log(10)/18.574).evalf(40)
-        X2 = log(reynolds_number) - 0.7793974884556819406441139701653776731705  # log(log(10)/5.02).evalf(40)
-        F = X2 - 0.2
-        X1F = X1 + F
-        X1F1 = 1. + X1F
-
-        E = (log(X1F) - 0.2) / (X1F1)
-        F = F - (X1F1 + 0.5 * E) * E * (X1F) / (X1F1 + E * (1. + (1.0 / 3.0) * E))
-
-        X1F = X1 + F
-        X1F1 = 1. + X1F
-        E = (log(X1F) + F - X2) / (X1F1)
-
-        b = (X1F1 + E * (1. + 1.0 / 3.0 * E))
-        F = b / (b * F - ((X1F1 + 0.5 * E) * E * (X1F)))
-
-        friction_factor_clamond = 1.325474527619599502640416597148504422899 * (F * F)  # ((0.5*log(10))**2).evalf(40)
-        methods['Clamond'] = friction_factor_clamond
-
-        # Pressure Loss Calculations (Darcy-Weisbach equation)
-        # Pressure loss per mile in psi
-        pressure_losses = {}
-        for method, f in methods.items():
-            # Darcy-Weisbach equation: ΔP = f * (L/D) * (ρ * v^2 / 2)
-            # For pressure loss per mile, L = 5280 ft
-            # ρ (density) of water at room temperature = 62.4 lb/ft³
-            # Convert pressure loss from lb/ft² to psi (1 psi = 144 lb/ft²)
-            L = 5280  # Length in feet (1 mile)
-            D = diameter_ft  # Diameter in feet
-            v = velocity_fps  # Velocity in ft/s
-            g = 32.17405 # Gravitational acceleration in ft/s^2
-            head_loss = L * f * (v ** 2) / (D * 2 * g)
-            delta_p_psi = head_loss * specific_gravity / 2.31
-            pressure_losses[method] = delta_p_psi * (1 - drag_reduction)
-
-        # Create Bar Chart
-        fig = go.Figure(data=[
-            go.Bar(
-                name=method,
-                x=[method],
-                y=[pressure_losses[method]],
-                text=[f"{pressure_losses[method]:,.1f} psi"],
-                textposition='auto'
-            )
-            for method in methods.keys()
-        ])
+        # A new calculation replaces any job still running in the background
+        if running_job:
+            background_jobs.cancel(running_job)
 
-        fig.update_layout(
-            title='Friction Factor Comparison',
-            xaxis_title='Method',
-            yaxis_title='Pressure Loss (psi)',
-            template='plotly_dark',
-            showlegend=False
+        # Remove commas and percent signs and convert to float
+        diameter_in = parse_number(diameter_in)
+        flow_rate_bpd = parse_number(flow_rate_bpd)
+        roughness_ft = parse_number(roughness_ft)
+        specific_gravity = parse_number(specific_gravity)
+        viscosity_cst = parse_number(viscosity_cst)
+        drag_reduction = parse_number(drag_reduction) / 100
+
+        if mode == 'sweep':
+            base = {'diameter_in': diameter_in, 'flow_rate_bpd': flow_rate_bpd, 'roughness_ft': roughness_ft,
+                    'viscosity_cst': viscosity_cst, 'specific_gravity': specific_gravity,
+                    'drag_reduction': drag_reduction}
+            sweep_range = (parse_number(sweep_start), parse_number(sweep_stop), parse_number(sweep_points))
+            if series_variable in SWEEP_SETTINGS:
+                series_range = (parse_number(series_start), parse_number(series_stop), parse_number(series_points))
+            else:
+                series_variable, series_range = None, None
+            details, figure, job_id = render_friction_sweep(base, sweep_variable, sweep_range, series_variable,
+                                                            series_range)
+            if figure is None:
+                return details, dash.no_update, {'display': 'none'}, dash.no_update, job_id
+            return details, figure, {}, 'sweep', None
+
+        if mode == 'uncertainty':
+            fixed = {'diameter_in': diameter_in, 'flow_rate_bpd': flow_rate_bpd, 'roughness_ft': roughness_ft,
+                     'viscosity_cst': viscosity_cst, 'specific_gravity': specific_gravity,
+                     'drag_reduction': drag_reduction}
+            distributions = {
+                'roughness_ft': (roughness_distribution, roughness_ft, parse_number(roughness_spread)),
+                'viscosity_cst': (viscosity_distribution, viscosity_cst, parse_number(viscosity_spread)),
+                'specific_gravity': (gravity_distribution, specific_gravity, parse_number(gravity_spread)),
+            }
+            details, figure, job_id = render_friction_uncertainty(fixed, distributions, int(parse_number(draws)))
+            if figure is None:
+                return details, dash.no_update, {'display': 'none'}, dash.no_update, job_id
+            return details, figure, {}, 'histogram', None
+
+        if mode == 'thermal':
+            base = {'diameter_in': diameter_in, 'flow_rate_bpd': flow_rate_bpd, 'roughness_ft': roughness_ft,
+                    'specific_gravity': specific_gravity, 'drag_reduction': drag_reduction}
+            settings = {
+                'length_mi': parse_number(length_mi),
+                'segments': int(parse_number(segments)),
+                'inlet_temperature_f': parse_number(inlet_temperature_f),
+                'ground_temperature_f': parse_number(ground_temperature_f),
+                'heat_transfer': parse_number(heat_transfer),
+                'specific_heat': parse_number(specific_heat),
+                'temperature_1_f': parse_number(temperature_1_f),
+                'viscosity_1_cst': parse_number(viscosity_1_cst),
+                'temperature_2_f': parse_number(temperature_2_f),
+                'viscosity_2_cst': parse_number(viscosity_2_cst),
+            }
+            details, figure, _ = render_friction_thermal(base, settings)
+            if figure is None:
+                return details, dash.no_update, {'display': 'none'}, dash.no_update, None
+            return details, figure, {}, 'thermal', None
+
+        if mode == 'inverse':
+            base = {'diameter_in': diameter_in, 'flow_rate_bpd': flow_rate_bpd, 'roughness_ft': roughness_ft,
+                    'viscosity_cst': viscosity_cst, 'specific_gravity': specific_gravity,
+                    'drag_reduction': drag_reduction}
+            details, figure, _ = render_friction_inverse(base, inverse_target, parse_number(allowable_loss))
+            if figure is None:
+                return details, dash.no_update, {'display': 'none'}, dash.no_update, None
+            return details, figure, {}, 'inverse', None
+
+        result = result_cache.get_or_compute(
+            ('fluid-flow', diameter_in, flow_rate_bpd, roughness_ft, specific_gravity, viscosity_cst, drag_reduction),
+            lambda: compute_friction_factor(diameter_in, flow_rate_bpd, roughness_ft, specific_gravity,
+                                            viscosity_cst, drag_reduction)
         )
+        velocity_fps = result['velocity_fps']
+        reynolds_number = result['reynolds_number']
+        flow_regime = result['flow_regime']
+        methods = result['friction_factors']
 
         # Output
         return html.Div([
@@ -338,26 +1361,941 @@ def calculate_friction_factor(n_clicks, diameter_in, flow_rate_bpd, roughness_ft
             html.Ul([
                 html.Li(f"Velocity: {velocity_fps:,.1f} ft/s"),
                 html.Li(f"Reynolds Number: {reynolds_number:,.0f}"),
-                html.Li(f"Flow Regime: {determine_flow_regime(reynolds_number)}")
+                html.Li(f"Flow Regime: {flow_regime}")
             ]),
             html.Hr(),
             html.H4("Friction Factors", className="text-white"),
             html.Ul([html.Li(f"{method}: {f:.6f}") for method, f in methods.items()]),
             html.Hr(),
             html.H4(f"Pressure Loss per Mile (at {drag_reduction:.0%} DR)", className="text-white"),
+        ]), friction_figure(result['pressure_losses'], figure_kind == 'bars'), {}, 'bars', None
+    return '', dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+@app.callback(
+    Output('ff-job-progress', 'value'),
+    Output('ff-job-progress', 'label'),
+    Output('ff-job-poll', 'disabled'),
+    Output('ff-job-progress-row', 'style'),
+    Output('ff-output', 'children', allow_duplicate=True),
+    Output('ff-graph', 'figure', allow_duplicate=True),
+    Output('ff-graph', 'style', allow_duplicate=True),
+    Output('ff-figure-kind', 'data', allow_duplicate=True),
+    Output('ff-job-shown', 'data'),
+    Input('ff-job', 'data'),
+    Input('ff-job-poll', 'n_intervals'),
+    Input('ff-job-cancel', 'n_clicks'),
+    State('ff-job-shown', 'data'),
+    prevent_initial_call=True
+)
+def poll_friction_job(job_id, n_intervals, cancel_clicks, shown):
+    if dash.ctx.triggered_id == 'ff-job':
+        shown = None  # A new job; nothing of it drawn yet
+    status, percent, label, poll_disabled, progress_style = poll_job(
+        job_id, dash.ctx.triggered_id == 'ff-job-cancel')
+    progress = (percent, label, poll_disabled, progress_style)
+    unchanged = (dash.no_update,) * 5
+    if status is None:
+        return progress + unchanged
+    state = status['state']
+    if state in (jobs.QUEUED, jobs.RUNNING):
+        message = html.P(status['message'], className="text-light") if status['message'] else dash.no_update
+        # Only resend the chart when the job has drawn more of it
+        if status['partial'] is None or status['done'] == shown:
+            return progress + (message,) + unchanged[1:]
+        return progress + (message, status['partial'], {}, 'job', status['done'])
+    if state == jobs.DONE:
+        details, figure = status['result']
+        return progress + (details, figure, {}, 'job', None)
+    if state == jobs.CANCELLED:
+        return progress + (html.P("Calculation cancelled.", className="text-warning"),) + unchanged[1:]
+    return progress + (dbc.Alert(f"The calculation failed: {status['error']}", color='danger'),) + unchanged[1:]
+
+@app.callback(
+    Output('ff-batch-job', 'data'),
+    Input('ff-batch-upload', 'contents'),
+    prevent_initial_call=True
+)
+def batch_friction_factor(contents):
+    if not contents:
+        return dash.no_update
+    return background_jobs.submit(batch_upload_job, contents, 'pressure-loss')
+
+@app.callback(
+    Output('ff-batch-status', 'children'),
+    Output('ff-batch-progress', 'value'),
+    Output('ff-batch-progress', 'label'),
+    Output('ff-batch-poll', 'disabled'),
+    Output('ff-batch-progress-row', 'style'),
+    Input('ff-batch-job', 'data'),
+    Input('ff-batch-poll', 'n_intervals'),
+    Input('ff-batch-cancel', 'n_clicks'),
+    State('ff-batch-upload', 'filename'),
+    prevent_initial_call=True
+)
+def poll_friction_factor_batch(job_id, n_intervals, cancel_clicks, filename):
+    cancel_requested = dash.ctx.triggered_id == 'ff-batch-cancel'
+    return poll_batch_upload(job_id, cancel_requested, filename, 'pressure-loss')
+
+# Pipeline Hydraulic Profile Layout and Callbacks
+PROFILE_SEGMENT_HEADERS = {
+    'length_mi': 'Length (mi)',
+    'od_in': 'OD (in)',
+    'wall_in': 'Wall (in)',
+    'elevation_ft': 'End Elevation (ft)',
+}
+
+@cache
+def pipeline_profile_layout():
+    return dbc.Container([
+        dbc.Row(dbc.Col(html.H2("Pipeline Hydraulic Profile", className="text-left text-light"))),
+        dbc.Row([
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardBody([
+                        dbc.Label("Flow Rate:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='hp-flow-rate', type='text', value="{:,}".format(100000), className="mb"),
+                            dbc.InputGroupText("barrels per day")
+                        ]),
+                        dbc.Label("Roughness:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='hp-roughness-ft', type='text', value="{:,.5f}".format(0.00015), className="mb"),
+                            dbc.InputGroupText("feet")
+                        ]),
+                        dbc.Label("Kinematic Viscosity:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='hp-viscosity', type='text', value="{:,}".format(3.6), className="mb"),
+                            dbc.InputGroupText("cSt")
+                        ]),
+                        dbc.Label("Specific Gravity:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='hp-specific-gravity', type='text', value="{:,}".format(0.84), className="mb"),
+                        ]),
+                        dbc.Label("Drag Reduction:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='hp-drag-reduction', type='text', value="0%", className="mb"),
+                            dbc.InputGroupText("%")
+                        ]),
+                        dbc.Label("Inlet Pressure:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='hp-inlet-pressure', type='text', value="{:,}".format(1000), className="mb"),
+                            dbc.InputGroupText("psi")
+                        ]),
+                        dbc.Label("Inlet Elevation:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='hp-inlet-elevation', type='text', value="{:,}".format(0), className="mb"),
+                            dbc.InputGroupText("ft")
+                        ]),
+                        dbc.Label("Friction Factor Method:", className="text-white mt-2"),
+                        dbc.Select(
+                            id='hp-method',
+                            options=[{'label': method, 'value': method} for method in hydraulics.METHODS],
+                            value='Colebrook-White'
+                        ),
+                        dbc.ButtonGroup([
+                            dbc.Button('Calculate', id='hp-calculate-btn', color='danger'),
+                            dbc.Button('Add Segment', id='hp-add-segment-btn', color='secondary')
+                        ], className="mt-3")
+                    ])
+                ], className="mb-4"),
+                width=4  # Inputs on the left
+            ),
+            dbc.Col(
+                dash_table.DataTable(
+                    id='hp-segments',
+                    columns=[{'name': name, 'id': column, 'type': 'numeric'}
+                             for column, name in PROFILE_SEGMENT_HEADERS.items()],
+                    data=[
+                        {'length_mi': 10, 'od_in': 24, 'wall_in': 0.375, 'elevation_ft': 150},
+                        {'length_mi': 15, 'od_in': 24, 'wall_in': 0.375, 'elevation_ft': 420},
+                        {'length_mi': 20, 'od_in': 20, 'wall_in': 0.375, 'elevation_ft': 300},
+                    ],
+                    editable=True,
+                    row_deletable=True,
+                    page_size=15,
+                    style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+                    style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+                ),
+                width=8  # Segment table on the right
+            )
+        ], justify='center'),
+        html.Hr(className="my-4"),
+        html.Div(id='hp-output', className="text-light")
+    ], fluid=True, className="bg-dark")
+
+
+@app.callback(
+    Output('hp-segments', 'data'),
+    Input('hp-add-segment-btn', 'n_clicks'),
+    State('hp-segments', 'data')
+)
+def add_profile_segment(n_clicks, rows):
+    rows = rows or []
+    if n_clicks:
+        # Start the new segment from the last one's pipe size
+        last = rows[-1] if rows else {'od_in': 24, 'wall_in': 0.375, 'elevation_ft': 0}
+        rows = rows + [{'length_mi': 1, 'od_in': last['od_in'], 'wall_in': last['wall_in'],
+                        'elevation_ft': last['elevation_ft']}]
+    return rows
+
+
+@app.callback(
+    Output('hp-output', 'children'),
+    Input('hp-calculate-btn', 'n_clicks'),
+    State('hp-segments', 'data'),
+    State('hp-flow-rate', 'value'),
+    State('hp-roughness-ft', 'value'),
+    State('hp-viscosity', 'value'),
+    State('hp-specific-gravity', 'value'),
+    State('hp-drag-reduction', 'value'),
+    State('hp-inlet-pressure', 'value'),
+    State('hp-inlet-elevation', 'value'),
+    State('hp-method', 'value')
+)
+def calculate_hydraulic_profile(n_clicks, rows, flow_rate_bpd, roughness_ft, viscosity_cst, specific_gravity,
+                                drag_reduction, inlet_pressure_psi, inlet_elevation_ft, method):
+    if n_clicks:
+        # Skip rows with blank cells
+        rows = [row for row in rows or [] if all(row.get(column) not in (None, '') for column in PROFILE_SEGMENT_HEADERS)]
+        if not rows:
+            return dbc.Alert("Enter at least one complete segment.", color='danger')
+        segments = {column: [float(row[column]) for row in rows] for column in PROFILE_SEGMENT_HEADERS}
+        specific_gravity = parse_number(specific_gravity)
+        try:
+            profile = pipeline_profile.hydraulic_profile(
+                segments['length_mi'], segments['od_in'], segments['wall_in'], segments['elevation_ft'],
+                parse_number(flow_rate_bpd), parse_number(roughness_ft), parse_number(viscosity_cst),
+                specific_gravity, parse_number(drag_reduction) / 100,
+                inlet_elevation_ft=parse_number(inlet_elevation_ft),
+                inlet_pressure_psi=parse_number(inlet_pressure_psi), method=method
+            )
+        except ValueError as e:
+            return dbc.Alert(str(e), color='danger')
+
+        # Hydraulic gradient plot: ground profile and hydraulic grade line along the line
+        import plotly.graph_objs as go
+        inlet_elevation_ft = parse_number(inlet_elevation_ft)
+        inlet_grade_ft = inlet_elevation_ft + parse_number(inlet_pressure_psi) * hydraulics.FT_HEAD_PER_PSI / specific_gravity
+        milepost = [0.0] + profile['milepost_end'].tolist()
+        fig = go.Figure([
+            go.Scatter(x=milepost, y=[inlet_elevation_ft] + segments['elevation_ft'], name='Elevation',
+                       mode='lines', fill='tozeroy'),
+            go.Scatter(x=milepost, y=[inlet_grade_ft] + profile['hydraulic_grade_ft'].tolist(),
+                       name='Hydraulic Grade Line', mode='lines'),
+        ])
+        fig.update_layout(
+            title='Hydraulic Gradient',
+            xaxis_title='Milepost (mi)',
+            yaxis_title='Head (ft)',
+            template='plotly_dark'
+        )
+
+        return html.Div([
+            html.H4("Line Summary", className="text-white"),
+            html.Ul([
+                html.Li(f"Length: {profile['total_length_mi']:,.2f} miles in {len(rows):,} segments"),
+                html.Li(f"Friction Loss: {profile['total_friction_psi']:,.1f} psi"),
+                html.Li(f"Static Head: {profile['total_static_psi']:,.1f} psi"),
+                html.Li(f"Outlet Pressure: {profile['pressure_psi'][-1]:,.1f} psi"),
+                html.Li(f"Minimum Pressure: {profile['pressure_psi'].min():,.1f} psi "
+                        f"at milepost {profile['milepost_end'][profile['pressure_psi'].argmin()]:,.2f}"),
+                html.Li(f"Line Fill: {profile['total_line_fill_bbl']:,.0f} barrels"),
+            ]),
             dcc.Graph(figure=fig)
         ])
     return ''
 
-# Energy Needs Calculator Layout and Callback
-def current_ideal(P, V, phase=3, PF=1):
-    if phase not in (1, 3):
-        raise ValueError('Only 1 and 3 phase power supported')
-    if phase == 3:
-        return (P * 1000) / (V * sqrt(3) * PF)
-    else:
-        return (P * 1000) / (V * PF)
+# Pump Station Layout and Callbacks
+PUMP_STATION_PROFILE_HEADERS = {
+    'milepost_mi': 'Milepost (mi)',
+    'elevation_ft': 'Elevation (ft)',
+}
+
+@cache
+def pump_stations_layout():
+    return dbc.Container([
+        dbc.Row(dbc.Col(html.H2("Pump Station Planner", className="text-left text-light"))),
+        dbc.Row([
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardBody([
+                        dbc.Label("Flow Rates:", className="text-white"),
+                        sweep_range_inputs('ps-flow', 'flow_rate_bpd'),
+                        dbc.Label("Pipe Sizes (NPS):", className="text-white"),
+                        dbc.Checklist(
+                            id='ps-nps',
+                            options=[{'label': pipe_schedule.nps_label(n), 'value': f'{n:g}'} for n in pipe_schedule.NPS],
+                            value=['12', '16', '20', '24'],
+                            inline=True,
+                            className="text-white"
+                        ),
+                        dbc.Label("Schedule:", className="text-white"),
+                        dbc.Select(
+                            id='ps-schedule',
+                            options=[{'label': schedule, 'value': schedule} for schedule in pipe_schedule.SCHEDULES],
+                            value='STD'
+                        ),
+                        dbc.Label("MAOP:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='ps-maop', type='text', value="{:,}".format(1440), className="mb"),
+                            dbc.InputGroupText("psi")
+                        ]),
+                        dbc.Label("Minimum Suction Pressure:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='ps-min-suction', type='text', value="{:,}".format(50), className="mb"),
+                            dbc.InputGroupText("psi")
+                        ]),
+                        dbc.Label("Roughness:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='ps-roughness-ft', type='text', value="{:,.5f}".format(0.00015), className="mb"),
+                            dbc.InputGroupText("feet")
+                        ]),
+                        dbc.Label("Kinematic Viscosity:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='ps-viscosity', type='text', value="{:,}".format(3.6), className="mb"),
+                            dbc.InputGroupText("cSt")
+                        ]),
+                        dbc.Label("Specific Gravity:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='ps-specific-gravity', type='text', value="{:,}".format(0.84), className="mb"),
+                        ]),
+                        dbc.Label("Drag Reduction:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='ps-drag-reduction', type='text', value="0%", className="mb"),
+                            dbc.InputGroupText("%")
+                        ]),
+                        dbc.Label("Friction Factor Method:", className="text-white mt-2"),
+                        dbc.Select(
+                            id='ps-method',
+                            options=[{'label': method, 'value': method} for method in hydraulics.METHODS],
+                            value='Colebrook-White'
+                        ),
+                        dbc.ButtonGroup([
+                            dbc.Button('Calculate', id='ps-calculate-btn', color='danger'),
+                            dbc.Button('Add Point', id='ps-add-point-btn', color='secondary')
+                        ], className="mt-3")
+                    ])
+                ], className="mb-4"),
+                width=4  # Inputs on the left
+            ),
+            dbc.Col(
+                dash_table.DataTable(
+                    id='ps-profile',
+                    columns=[{'name': name, 'id': column, 'type': 'numeric'}
+                             for column, name in PUMP_STATION_PROFILE_HEADERS.items()],
+                    data=[
+                        {'milepost_mi': 0, 'elevation_ft': 150},
+                        {'milepost_mi': 40, 'elevation_ft': 420},
+                        {'milepost_mi': 95, 'elevation_ft': 1200},
+                        {'milepost_mi': 150, 'elevation_ft': 800},
+                        {'milepost_mi': 210, 'elevation_ft': 300},
+                    ],
+                    editable=True,
+                    row_deletable=True,
+                    page_size=15,
+                    style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+                    style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+                ),
+                width=8  # Elevation profile on the right
+            )
+        ], justify='center'),
+        html.Hr(className="my-4"),
+        html.Div(id='ps-output', className="text-light")
+    ], fluid=True, className="bg-dark")
+
+
+@app.callback(
+    Output('ps-profile', 'data'),
+    Input('ps-add-point-btn', 'n_clicks'),
+    State('ps-profile', 'data')
+)
+def add_pump_station_point(n_clicks, rows):
+    rows = rows or []
+    if n_clicks:
+        last = rows[-1] if rows else {'milepost_mi': 0, 'elevation_ft': 0}
+        rows = rows + [{'milepost_mi': last['milepost_mi'] + 10, 'elevation_ft': last['elevation_ft']}]
+    return rows
+
+
+# Station counts for every flow rate and pipe size, with a chart and a table of the design alternatives
+def compute_pump_stations(milepost, elevation_ft, flow_range, nps, schedule, maop_psi, min_suction_psi,
+                          roughness_ft, viscosity_cst, specific_gravity, drag_reduction, method):
+    import plotly.graph_objs as go
+
+    flow_rates = np.linspace(flow_range[0], flow_range[1], int(flow_range[2]))
+    # Sizes that aren't made in the chosen schedule are left out
+    nps = [n for n in nps if schedule in pipe_schedule.schedules_for(n)]
+    if not nps:
+        raise ValueError(f'None of the selected pipe sizes are made in schedule {schedule}.')
+    od_in, wall_in, _ = pipe_schedule.gather(nps, schedule)
+    result = pump_stations.optimize_stations(milepost, elevation_ft, flow_rates, od_in, wall_in, maop_psi,
+                                             min_suction_psi, roughness_ft, viscosity_cst, specific_gravity,
+                                             drag_reduction, method)
+
+    counts = np.where(result['feasible'], result['station_count'], np.nan)
+    fig = go.Figure([
+        go.Scatter(x=flow_rates, y=counts[:, j], mode='lines+markers', name=f'NPS {pipe_schedule.nps_label(float(n))}',
+                   line_shape='hv')
+        for j, n in enumerate(nps)
+    ])
+    fig.update_layout(
+        title='Pump Stations Required',
+        xaxis_title='Flow Rate (bpd)',
+        yaxis_title='Stations',
+        template='plotly_dark'
+    )
+
+    rows = []
+    for i, j in zip(*np.nonzero(result['feasible'])):
+        count = result['station_count'][i, j]
+        rows.append({
+            'flow_rate_bpd': round(float(flow_rates[i])),
+            'nps': pipe_schedule.nps_label(float(nps[j])),
+            'inner_diameter_in': round(float(result['inner_diameter_in'][i, j]), 3),
+            'velocity_fps': round(float(result['velocity_fps'][i, j]), 2),
+            'gradient_psi_per_mile': round(float(result['gradient_psi_per_mile'][i, j]), 2),
+            'station_count': int(count),
+            'station_milepost': ', '.join(f'{mp:,.1f}' for mp in result['station_milepost'][i, j, :count]),
+            'total_hhp': round(float(result['total_hhp'][i, j])),
+            'delivery_pressure_psi': round(float(result['delivery_pressure_psi'][i, j]), 1),
+            'exceeds_maop': 'Yes' if result['exceeds_maop'][i, j] else '',
+        })
+    return {
+        'designs': int(result['feasible'].size),
+        'infeasible': int(result['feasible'].size - np.count_nonzero(result['feasible'])),
+        'rows': rows,
+        'figure': fig.to_dict(),
+    }
+
+
+PUMP_STATION_RESULT_HEADERS = {
+    'flow_rate_bpd': 'Flow (bpd)',
+    'nps': 'NPS',
+    'inner_diameter_in': 'ID (in)',
+    'velocity_fps': 'Velocity (ft/s)',
+    'gradient_psi_per_mile': 'Gradient (psi/mi)',
+    'station_count': 'Stations',
+    'station_milepost': 'Station Mileposts',
+    'total_hhp': 'Installed HHP',
+    'delivery_pressure_psi': 'Delivery (psi)',
+    'exceeds_maop': 'Over MAOP',
+}
+
+
+@app.callback(
+    Output('ps-output', 'children'),
+    Input('ps-calculate-btn', 'n_clicks'),
+    State('ps-profile', 'data'),
+    State('ps-flow-start', 'value'),
+    State('ps-flow-stop', 'value'),
+    State('ps-flow-points', 'value'),
+    State('ps-nps', 'value'),
+    State('ps-schedule', 'value'),
+    State('ps-maop', 'value'),
+    State('ps-min-suction', 'value'),
+    State('ps-roughness-ft', 'value'),
+    State('ps-viscosity', 'value'),
+    State('ps-specific-gravity', 'value'),
+    State('ps-drag-reduction', 'value'),
+    State('ps-method', 'value')
+)
+def calculate_pump_stations(n_clicks, rows, flow_start, flow_stop, flow_points, nps, schedule, maop_psi,
+                            min_suction_psi, roughness_ft, viscosity_cst, specific_gravity, drag_reduction, method):
+    if n_clicks:
+        # Skip rows with blank cells
+        rows = [row for row in rows or []
+                if all(row.get(column) not in (None, '') for column in PUMP_STATION_PROFILE_HEADERS)]
+        if len(rows) < 2:
+            return dbc.Alert("Enter at least two profile points.", color='danger')
+        if not nps:
+            return dbc.Alert("Select at least one pipe size.", color='danger')
+        milepost = tuple(float(row['milepost_mi']) for row in rows)
+        elevation_ft = tuple(float(row['elevation_ft']) for row in rows)
+        flow_range = (parse_number(flow_start), parse_number(flow_stop), parse_number(flow_points))
+        if flow_range[2] < 1:
+            return dbc.Alert("Enter at least one flow rate.", color='danger')
+        inputs = (milepost, elevation_ft, flow_range, tuple(sorted(nps, key=float)), schedule,
+                  parse_number(maop_psi), parse_number(min_suction_psi), parse_number(roughness_ft),
+                  parse_number(viscosity_cst), parse_number(specific_gravity), parse_number(drag_reduction) / 100,
+                  method)
+        try:
+            result = result_cache.get_or_compute(('pump-stations',) + inputs,
+                                                 lambda: compute_pump_stations(*inputs))
+        except ValueError as e:
+            return dbc.Alert(str(e), color='danger')
+
+        return html.Div([
+            html.H4("Design Alternatives", className="text-white"),
+            html.Ul([
+                html.Li(f"Designs evaluated: {result['designs']:,}"),
+                html.Li(f"Infeasible (suction limit can't be met within {pump_stations.MAX_STATIONS} stations): "
+                        f"{result['infeasible']:,}"),
+            ]),
+            dcc.Graph(figure=result['figure']),
+            dash_table.DataTable(
+                columns=[{'name': name, 'id': column} for column, name in PUMP_STATION_RESULT_HEADERS.items()],
+                data=result['rows'],
+                sort_action='native',
+                page_size=15,
+                style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+                style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+            )
+        ])
+    return ''
+
+# Pipe Network Layout and Callbacks
+NETWORK_NODE_HEADERS = {
+    'node': 'Node',
+    'elevation_ft': 'Elevation (ft)',
+    'demand_bpd': 'Demand (bpd)',
+    'fixed_pressure_psi': 'Fixed Pressure (psi)',
+}
+NETWORK_PIPE_HEADERS = {
+    'from_node': 'From',
+    'to_node': 'To',
+    'length_mi': 'Length (mi)',
+    'inner_diameter_in': 'ID (in)',
+}
+
+@cache
+def network_layout():
+    table_style = {
+        'editable': True,
+        'row_deletable': True,
+        'page_size': 15,
+        'style_header': {'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+        'style_cell': {'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+    }
+    return dbc.Container([
+        dbc.Row(dbc.Col(html.H2("Pipe Network", className="text-left text-light"))),
+        dbc.Row([
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardBody([
+                        html.P("Nodes with a fixed pressure are supplies or held delivery points; the rest take "
+                               "their demand (negative for an injection).", className="text-light"),
+                        dbc.Label("Roughness:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='nw-roughness-ft', type='text', value="{:,.5f}".format(0.00015), className="mb"),
+                            dbc.InputGroupText("feet")
+                        ]),
+                        dbc.Label("Kinematic Viscosity:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='nw-viscosity', type='text', value="{:,}".format(3.6), className="mb"),
+                            dbc.InputGroupText("cSt")
+                        ]),
+                        dbc.Label("Specific Gravity:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='nw-specific-gravity', type='text', value="{:,}".format(0.84), className="mb"),
+                        ]),
+                        dbc.Label("Drag Reduction:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='nw-drag-reduction', type='text', value="0%", className="mb"),
+                            dbc.InputGroupText("%")
+                        ]),
+                        dbc.Label("Friction Factor Method:", className="text-white mt-2"),
+                        dbc.Select(
+                            id='nw-method',
+                            options=[{'label': method, 'value': method} for method in hydraulics.METHODS],
+                            value='Colebrook-White'
+                        ),
+                        dbc.ButtonGroup([
+                            dbc.Button('Solve', id='nw-calculate-btn', color='danger'),
+                            dbc.Button('Add Node', id='nw-add-node-btn', color='secondary'),
+                            dbc.Button('Add Pipe', id='nw-add-pipe-btn', color='secondary')
+                        ], className="mt-3")
+                    ])
+                ], className="mb-4"),
+                width=4  # Inputs on the left
+            ),
+            dbc.Col([
+                html.H5("Nodes", className="text-white"),
+                dash_table.DataTable(
+                    id='nw-nodes',
+                    columns=[{'name': name, 'id': column, 'type': 'text' if column == 'node' else 'numeric'}
+                             for column, name in NETWORK_NODE_HEADERS.items()],
+                    data=[
+                        {'node': 'Supply', 'elevation_ft': 100, 'demand_bpd': 0, 'fixed_pressure_psi': 900},
+                        {'node': 'A', 'elevation_ft': 150, 'demand_bpd': 0, 'fixed_pressure_psi': None},
+                        {'node': 'B', 'elevation_ft': 120, 'demand_bpd': 30000, 'fixed_pressure_psi': None},
+                        {'node': 'C', 'elevation_ft': 200, 'demand_bpd': 50000, 'fixed_pressure_psi': None},
+                        {'node': 'D', 'elevation_ft': 80, 'demand_bpd': -20000, 'fixed_pressure_psi': None},
+                    ],
+                    **table_style
+                ),
+                html.H5("Pipes", className="text-white mt-3"),
+                dash_table.DataTable(
+                    id='nw-pipes',
+                    columns=[{'name': name, 'id': column, 'type': 'text' if column.endswith('_node') else 'numeric'}
+                             for column, name in NETWORK_PIPE_HEADERS.items()],
+                    data=[
+                        {'from_node': 'Supply', 'to_node': 'A', 'length_mi': 10, 'inner_diameter_in': 15.25},
+                        {'from_node': 'A', 'to_node': 'B', 'length_mi': 8, 'inner_diameter_in': 12},
+                        {'from_node': 'A', 'to_node': 'C', 'length_mi': 12, 'inner_diameter_in': 12},
+                        {'from_node': 'B', 'to_node': 'C', 'length_mi': 6, 'inner_diameter_in': 10.02},
+                        {'from_node': 'B', 'to_node': 'D', 'length_mi': 5, 'inner_diameter_in': 7.981},
+                        {'from_node': 'D', 'to_node': 'C', 'length_mi': 7, 'inner_diameter_in': 7.981},
+                    ],
+                    **table_style
+                ),
+            ], width=8)  # Network tables on the right
+        ], justify='center'),
+        html.Hr(className="my-4"),
+        html.Div(id='nw-output', className="text-light")
+    ], fluid=True, className="bg-dark")
+
+
+@app.callback(
+    Output('nw-nodes', 'data'),
+    Input('nw-add-node-btn', 'n_clicks'),
+    State('nw-nodes', 'data')
+)
+def add_network_node(n_clicks, rows):
+    rows = rows or []
+    if n_clicks:
+        rows = rows + [{'node': f'N{len(rows) + 1}', 'elevation_ft': 0, 'demand_bpd': 0, 'fixed_pressure_psi': None}]
+    return rows
+
+
+@app.callback(
+    Output('nw-pipes', 'data'),
+    Input('nw-add-pipe-btn', 'n_clicks'),
+    State('nw-pipes', 'data')
+)
+def add_network_pipe(n_clicks, rows):
+    rows = rows or []
+    if n_clicks:
+        last = rows[-1] if rows else {'to_node': '', 'inner_diameter_in': 12}
+        rows = rows + [{'from_node': last['to_node'], 'to_node': '', 'length_mi': 1,
+                        'inner_diameter_in': last['inner_diameter_in']}]
+    return rows
+
+
+def _blank(value):
+    return value is None or str(value).strip() == ''
+
+
+# Network topology and fluid are cached together with their last solution, so a change to the demands alone
+# re-solves from the previous flows (see network.Network.solve)
+def solve_network(nodes, pipes, fixed_pressure_psi, demand_bpd, roughness_ft, viscosity_cst, specific_gravity,
+                  drag_reduction, method):
+    names = [name for name, _ in nodes]
+    index = {name: i for i, name in enumerate(names)}
+    if len(index) < len(names):
+        raise ValueError('Node names must be unique')
+    try:
+        from_node = [index[pipe[0]] for pipe in pipes]
+        to_node = [index[pipe[1]] for pipe in pipes]
+    except KeyError as e:
+        raise ValueError(f'Pipe end {e.args[0]!r} is not in the node table')
+    net = network.Network(from_node, to_node, [pipe[2] for pipe in pipes], [pipe[3] for pipe in pipes],
+                          [elevation for _, elevation in nodes], fixed_pressure_psi, roughness_ft, viscosity_cst,
+                          specific_gravity, drag_reduction, method)
+    # The last converged flows for this topology and fluid start the next solve, so changing only demands
+    # takes a couple of iterations; only the flow array is cached, never the solver itself
+    key = ('network-flows', tuple(nodes), tuple(pipes), fixed_pressure_psi, roughness_ft, viscosity_cst,
+           specific_gravity, drag_reduction, method)
+    flows = result_cache.get(key)
+    warm = flows is not None
+    result = net.solve(demand_bpd, initial={'flow_bpd': flows} if warm else None, warm_start=False)
+    if result['converged']:
+        result_cache.set(key, result['flow_bpd'])
+    return names, result, warm
+
+
+@app.callback(
+    Output('nw-output', 'children'),
+    Input('nw-calculate-btn', 'n_clicks'),
+    State('nw-nodes', 'data'),
+    State('nw-pipes', 'data'),
+    State('nw-roughness-ft', 'value'),
+    State('nw-viscosity', 'value'),
+    State('nw-specific-gravity', 'value'),
+    State('nw-drag-reduction', 'value'),
+    State('nw-method', 'value')
+)
+def calculate_network(n_clicks, node_rows, pipe_rows, roughness_ft, viscosity_cst, specific_gravity, drag_reduction,
+                      method):
+    if n_clicks:
+        # Skip rows with blank cells (a blank fixed pressure just means the node's pressure is solved for)
+        node_rows = [row for row in node_rows or []
+                     if not any(_blank(row.get(column)) for column in ('node', 'elevation_ft'))]
+        pipe_rows = [row for row in pipe_rows or []
+                     if not any(_blank(row.get(column)) for column in NETWORK_PIPE_HEADERS)]
+        if not node_rows or not pipe_rows:
+            return dbc.Alert("Enter at least two nodes and one pipe.", color='danger')
+        try:
+            nodes = tuple((str(row['node']).strip(), float(row['elevation_ft'])) for row in node_rows)
+            pipes = tuple((str(row['from_node']).strip(), str(row['to_node']).strip(), float(row['length_mi']),
+                           float(row['inner_diameter_in'])) for row in pipe_rows)
+            fixed_pressure_psi = tuple(np.nan if _blank(row.get('fixed_pressure_psi'))
+                                       else float(row['fixed_pressure_psi']) for row in node_rows)
+            demand_bpd = tuple(0.0 if _blank(row.get('demand_bpd')) else float(row['demand_bpd'])
+                               for row in node_rows)
+            names, result, warm = solve_network(
+                nodes, pipes, fixed_pressure_psi, demand_bpd, parse_number(roughness_ft), parse_number(viscosity_cst),
+                parse_number(specific_gravity), parse_number(drag_reduction) / 100, method)
+        except ValueError as e:
+            return dbc.Alert(str(e), color='danger')
+
+        node_table = [{'node': name, 'pressure_psi': round(float(p), 1), 'hydraulic_grade_ft': round(float(h), 1),
+                       'supply_bpd': round(float(q)) if not np.isnan(fixed) else ''}
+                      for name, p, h, q, fixed in zip(names, result['pressure_psi'], result['hydraulic_grade_ft'],
+                                                      result['supply_bpd'], fixed_pressure_psi)]
+        pipe_table = [{'pipe': f'{pipe[0]} - {pipe[1]}', 'flow_bpd': round(float(q)), 'velocity_fps': round(float(v), 2),
+                       'friction_loss_psi': round(float(dp), 1)}
+                      for pipe, q, v, dp in zip(pipes, result['flow_bpd'], result['velocity_fps'],
+                                                result['friction_loss_psi'])]
+        style = {
+            'style_header': {'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+            'style_cell': {'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+        }
+        summary = [
+            html.Li(f"Newton iterations: {result['iterations']}" + (" (from the previous solution)" if warm else "")),
+            html.Li(f"Largest flow imbalance: {result['imbalance_bpd']:,.4f} bpd"),
+        ]
+        if not result['converged']:
+            summary.append(html.Li("The solution did not converge; check for isolated or badly conditioned parts.",
+                                   className="text-warning"))
+        return html.Div([
+            html.H4("Network Solution", className="text-white"),
+            html.Ul(summary),
+            dbc.Row([
+                dbc.Col(dash_table.DataTable(
+                    columns=[{'name': 'Node', 'id': 'node'}, {'name': 'Pressure (psi)', 'id': 'pressure_psi'},
+                             {'name': 'HGL (ft)', 'id': 'hydraulic_grade_ft'}, {'name': 'Supply (bpd)', 'id': 'supply_bpd'}],
+                    data=node_table, page_size=15, sort_action='native', **style
+                ), width=5),
+                dbc.Col(dash_table.DataTable(
+                    columns=[{'name': 'Pipe', 'id': 'pipe'}, {'name': 'Flow (bpd)', 'id': 'flow_bpd'},
+                             {'name': 'Velocity (ft/s)', 'id': 'velocity_fps'},
+                             {'name': 'Friction Loss (psi)', 'id': 'friction_loss_psi'}],
+                    data=pipe_table, page_size=15, sort_action='native', **style
+                ), width=7),
+            ]),
+        ])
+    return ''
+
+# Surge Analysis Layout and Callbacks
+SURGE_PROFILE_HEADERS = {
+    'milepost_mi': 'Milepost (mi)',
+    'elevation_ft': 'Elevation (ft)',
+}
+
+@cache
+def surge_layout():
+    def number_input(label, id, value, unit=None):
+        group = [dbc.Input(id=id, type='text', value=value, className="mb")]
+        if unit:
+            group.append(dbc.InputGroupText(unit))
+        return [dbc.Label(label, className="text-white"), dbc.InputGroup(group)]
+
+    return dbc.Container([
+        dbc.Row(dbc.Col(html.H2("Surge Analysis", className="text-left text-light"))),
+        dbc.Row([
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardBody([
+                        dbc.Label("Event:", className="text-white"),
+                        dbc.RadioItems(
+                            id='sg-event',
+                            options=[{'label': 'Outlet valve closure', 'value': 'valve-closure'},
+                                     {'label': 'Inlet pump trip', 'value': 'pump-trip'}],
+                            value='valve-closure',
+                            className="text-white"
+                        ),
+                        *number_input("Closure / Rundown Time:", 'sg-event-time', "{:,}".format(30), "s"),
+                        *number_input("Simulated Time:", 'sg-duration', "{:,}".format(300), "s"),
+                        *number_input("Reach Length:", 'sg-reach', "{:,}".format(250), "ft"),
+                        dbc.Label("Pipe Size (NPS):", className="text-white"),
+                        dbc.Select(
+                            id='sg-nps',
+                            options=[{'label': pipe_schedule.nps_label(n), 'value': f'{n:g}'} for n in pipe_schedule.NPS],
+                            value='16'
+                        ),
+                        dbc.Label("Schedule:", className="text-white"),
+                        dbc.Select(
+                            id='sg-schedule',
+                            options=[{'label': schedule, 'value': schedule} for schedule in pipe_schedule.SCHEDULES],
+                            value='STD'
+                        ),
+                        *number_input("Flow Rate:", 'sg-flow-rate', "{:,}".format(150000), "bpd"),
+                        *number_input("Outlet Pressure:", 'sg-outlet-pressure', "{:,}".format(100), "psi"),
+                        *number_input("MAOP:", 'sg-maop', "{:,}".format(1440), "psi"),
+                        *number_input("Bulk Modulus:", 'sg-bulk-modulus', "{:,}".format(transient.BULK_MODULUS_PSI), "psi"),
+                        *number_input("Roughness:", 'sg-roughness-ft', "{:,.5f}".format(0.00015), "feet"),
+                        *number_input("Kinematic Viscosity:", 'sg-viscosity', "{:,}".format(3.6), "cSt"),
+                        *number_input("Specific Gravity:", 'sg-specific-gravity', "{:,}".format(0.84)),
+                        *number_input("Drag Reduction:", 'sg-drag-reduction', "0%", "%"),
+                        dbc.ButtonGroup([
+                            dbc.Button('Simulate', id='sg-calculate-btn', color='danger'),
+                            dbc.Button('Add Point', id='sg-add-point-btn', color='secondary')
+                        ], className="mt-3")
+                    ])
+                ], className="mb-4"),
+                width=4  # Inputs on the left
+            ),
+            dbc.Col([
+                html.P("Elevation profile; the line runs from the first milepost to the last.", className="text-light"),
+                dash_table.DataTable(
+                    id='sg-profile',
+                    columns=[{'name': name, 'id': column, 'type': 'numeric'}
+                             for column, name in SURGE_PROFILE_HEADERS.items()],
+                    data=[
+                        {'milepost_mi': 0, 'elevation_ft': 100},
+                        {'milepost_mi': 20, 'elevation_ft': 600},
+                        {'milepost_mi': 50, 'elevation_ft': 200},
+                    ],
+                    editable=True,
+                    row_deletable=True,
+                    page_size=15,
+                    style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+                    style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+                )
+            ], width=8)  # Elevation profile on the right
+        ], justify='center'),
+        html.Hr(className="my-4"),
+        html.Div(id='sg-output', className="text-light")
+    ], fluid=True, className="bg-dark")
+
+
+@app.callback(
+    Output('sg-profile', 'data'),
+    Input('sg-add-point-btn', 'n_clicks'),
+    State('sg-profile', 'data')
+)
+def add_surge_point(n_clicks, rows):
+    rows = rows or []
+    if n_clicks:
+        last = rows[-1] if rows else {'milepost_mi': 0, 'elevation_ft': 0}
+        rows = rows + [{'milepost_mi': last['milepost_mi'] + 10, 'elevation_ft': last['elevation_ft']}]
+    return rows
+
+
+# Envelopes along the line and traces at its ends, as figures and a summary
+def compute_surge(milepost, elevation_ft, nps, schedule, flow_rate_bpd, outlet_pressure_psi, maop_psi, event,
+                  event_time_s, duration_s, reach_ft, bulk_modulus_psi, roughness_ft, viscosity_cst, specific_gravity,
+                  drag_reduction):
+    import plotly.graph_objs as go
+
+    if any(b <= a for a, b in zip(milepost, milepost[1:])):
+        raise ValueError('Profile mileposts must be increasing.')
+    pipe = pipe_schedule.lookup(nps, schedule)
+    offset = np.asarray(milepost) - milepost[0]
+    result = transient.simulate(float(offset[-1]), pipe['outside_diameter_in'], pipe['wall_thickness_in'],
+                                flow_rate_bpd, outlet_pressure_psi, roughness_ft, viscosity_cst, specific_gravity,
+                                drag_reduction, event, event_time_s, duration_s=duration_s, reach_ft=reach_ft,
+                                profile_milepost=offset, profile_elevation_ft=elevation_ft,
+                                bulk_modulus_psi=bulk_modulus_psi)
+    x = result['milepost'] + milepost[0]
+
+    envelope = go.Figure([
+        go.Scatter(x=x, y=result['max_pressure_psi'], mode='lines', name='Maximum'),
+        go.Scatter(x=x, y=result['steady_pressure_psi'], mode='lines', name='Steady state', line={'dash': 'dot'}),
+        go.Scatter(x=x, y=result['min_pressure_psi'], mode='lines', name='Minimum'),
+    ])
+    envelope.add_hline(y=maop_psi, line_dash='dash', line_color='red', annotation_text='MAOP')
+    envelope.add_hline(y=0, line_dash='dot', line_color='gray')
+    envelope.update_layout(
+        title='Pressure Envelope',
+        xaxis_title='Milepost (mi)',
+        yaxis_title='Pressure (psi)',
+        template='plotly_dark'
+    )
+    traces = go.Figure([
+        go.Scatter(x=result['trace_time_s'], y=result['inlet_pressure_psi'], mode='lines', name='Inlet'),
+        go.Scatter(x=result['trace_time_s'], y=result['outlet_pressure_psi'], mode='lines', name='Outlet'),
+    ])
+    traces.update_layout(
+        title='Pressure at the Line Ends',
+        xaxis_title='Time (s)',
+        yaxis_title='Pressure (psi)',
+        template='plotly_dark'
+    )
+
+    peak = int(np.argmax(result['max_pressure_psi']))
+    low = int(np.argmin(result['min_pressure_psi']))
+    over = result['max_pressure_psi'] > maop_psi
+    return {
+        'wave_speed_fps': result['wave_speed_fps'],
+        'wave_period_s': result['wave_period_s'],
+        'joukowsky_psi': result['joukowsky_psi'],
+        'reach_ft': result['reach_ft'],
+        'time_step_s': result['time_step_s'],
+        'steps': result['steps'],
+        'max_pressure_psi': float(result['max_pressure_psi'][peak]),
+        'max_milepost': float(x[peak]),
+        'max_time_s': float(result['max_pressure_time_s'][peak]),
+        'min_pressure_psi': float(result['min_pressure_psi'][low]),
+        'min_milepost': float(x[low]),
+        'over_maop_mi': float(np.count_nonzero(over) * result['reach_ft'] / hydraulics.FT_PER_MILE),
+        'envelope': envelope.to_dict(),
+        'traces': traces.to_dict(),
+    }
+
+
+@app.callback(
+    Output('sg-output', 'children'),
+    Input('sg-calculate-btn', 'n_clicks'),
+    State('sg-profile', 'data'),
+    State('sg-nps', 'value'),
+    State('sg-schedule', 'value'),
+    State('sg-flow-rate', 'value'),
+    State('sg-outlet-pressure', 'value'),
+    State('sg-maop', 'value'),
+    State('sg-event', 'value'),
+    State('sg-event-time', 'value'),
+    State('sg-duration', 'value'),
+    State('sg-reach', 'value'),
+    State('sg-bulk-modulus', 'value'),
+    State('sg-roughness-ft', 'value'),
+    State('sg-viscosity', 'value'),
+    State('sg-specific-gravity', 'value'),
+    State('sg-drag-reduction', 'value')
+)
+def calculate_surge(n_clicks, rows, nps, schedule, flow_rate_bpd, outlet_pressure_psi, maop_psi, event, event_time_s,
+                    duration_s, reach_ft, bulk_modulus_psi, roughness_ft, viscosity_cst, specific_gravity,
+                    drag_reduction):
+    if n_clicks:
+        # Skip rows with blank cells
+        rows = [row for row in rows or []
+                if all(row.get(column) not in (None, '') for column in SURGE_PROFILE_HEADERS)]
+        if len(rows) < 2:
+            return dbc.Alert("Enter at least two profile points.", color='danger')
+        try:
+            inputs = (tuple(float(row['milepost_mi']) for row in rows), tuple(float(row['elevation_ft']) for row in rows),
+                      nps, schedule, parse_number(flow_rate_bpd), parse_number(outlet_pressure_psi),
+                      parse_number(maop_psi), event, parse_number(event_time_s), parse_number(duration_s),
+                      parse_number(reach_ft), parse_number(bulk_modulus_psi), parse_number(roughness_ft),
+                      parse_number(viscosity_cst), parse_number(specific_gravity), parse_number(drag_reduction) / 100)
+            result = result_cache.get_or_compute(('surge',) + inputs, lambda: compute_surge(*inputs))
+        except ValueError as e:
+            return dbc.Alert(str(e), color='danger')
+
+        summary = [
+            html.Li(f"Wave speed: {result['wave_speed_fps']:,.0f} ft/s; round trip {result['wave_period_s']:,.1f} s"),
+            html.Li(f"Joukowsky surge for an instant stop: {result['joukowsky_psi']:,.1f} psi"),
+            html.Li(f"Grid: {result['reach_ft']:,.1f} ft reaches, {result['time_step_s']:,.4f} s steps, "
+                    f"{result['steps']:,} steps"),
+            html.Li(f"Highest pressure: {result['max_pressure_psi']:,.1f} psi at milepost {result['max_milepost']:,.2f} "
+                    f"({result['max_time_s']:,.1f} s)"),
+            html.Li(f"Lowest pressure: {result['min_pressure_psi']:,.1f} psi at milepost {result['min_milepost']:,.2f}"),
+        ]
+        if result['over_maop_mi'] > 0:
+            summary.append(html.Li(f"Over MAOP along {result['over_maop_mi']:,.2f} mi of line", className="text-danger"))
+        if result['min_pressure_psi'] < 0:
+            summary.append(html.Li("Pressure falls below vapour pressure: expect column separation, which this "
+                                   "model does not follow, so later peaks may be understated.", className="text-warning"))
+        return html.Div([
+            html.H4("Surge Results", className="text-white"),
+            html.Ul(summary),
+            dcc.Graph(figure=result['envelope']),
+            dcc.Graph(figure=result['traces']),
+        ])
+    return ''
 
+# Energy Needs Calculator Layout and Callback
+@cache
 def energy_needs_layout():
     return dbc.Container([
         dbc.Row(dbc.Col(html.H2("Power & Energy", className="text-left text-light"))),
@@ -408,51 +2346,85 @@ def energy_needs_layout():
             )
         ], justify='center'),
         html.Hr(className="my-4"),
+        annual_energy_section(),
         energy_needs_offcanvas()
     ], fluid=True, className="bg-dark")
 
-# Offcanvas component with dummy data for the fluid flow layout
-def fluid_flow_offcanvas():
-    # Data for the table
-    table_data = [
-        {"NPS": '1"', "STD": 0.133, "40": 0.133, "XS": 0.179, "XXS": 0.358},
-        {"NPS": '2"', "STD": 0.154, "40": 0.154, "XS": 0.218, "XXS": 0.436},
-        {"NPS": '3"', "STD": 0.216, "40": 0.216, "XS": 0.30, "XXS": 0.600},
-        {"NPS": '4"', "STD": 0.237, "40": 0.237, "XS": 0.337, "XXS": 0.674},
-        {"NPS": '6"', "STD": 0.280, "40": 0.280, "XS": 0.432, "XXS": 0.864},
-        {"NPS": '8"', "STD": 0.322, "40": 0.322, "XS": 0.500, "XXS": 0.875},
-        {"NPS": '10"', "STD": 0.365, "40": 0.365, "XS": 0.500, "XXS": 1.000},
-        {"NPS": '12"', "STD": 0.375, "40": 0.406, "XS": 0.500, "XXS": 1.000},
-        {"NPS": '14"', "STD": 0.375, "40": 0.438, "XS": 0.500, "XXS": None},
-        {"NPS": '16"', "STD": 0.375, "40": 0.500, "XS": 0.500, "XXS": None},
-        {"NPS": '18"', "STD": 0.375, "40": 0.562, "XS": 0.500, "XXS": None},
-        {"NPS": '20"', "STD": 0.375, "40": 0.594, "XS": 0.500, "XXS": None},
-        {"NPS": '22"', "STD": 0.375, "40": None, "XS": 0.500, "XXS": None},
-        {"NPS": '24"', "STD": 0.375, "40": 0.688, "XS": 0.500, "XXS": None},
-        {"NPS": '30"', "STD": 0.375, "40": None, "XS": 0.500, "XXS": None},
-        {"NPS": '32"', "STD": 0.375, "40": 0.688, "XS": None, "XXS": None},
-        {"NPS": '34"', "STD": 0.375, "40": 0.688, "XS": None, "XXS": None},
-        {"NPS": '36"', "STD": 0.375, "40": 0.750, "XS": None, "XXS": None},
-        {"NPS": '42"', "STD": 0.375, "40": 0.750, "XS": None, "XXS": None},
-    ]
 
-    # Format numbers with 3 decimal places, or return empty string if None
+# Text input with a label and optional unit, as used throughout the annual energy form
+def simulation_input(input_id, label, value, unit=None):
+    return html.Div([
+        dbc.Label(label, className="text-white"),
+        dbc.InputGroup([dbc.Input(id=input_id, type='text', value=value, className="mb")]
+                       + ([dbc.InputGroupText(unit)] if unit else [])),
+    ])
+
+
+# Annual pumping simulation: hourly flow schedule and tariff in, energy, demand, current and cost out
+def annual_energy_section():
+    return html.Div([
+        dbc.Row(dbc.Col(html.H3("Annual Pumping Energy", className="text-left text-light"))),
+        dbc.Row([
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.H5("Flow Schedule", className="text-white"),
+                html.P("Upload a CSV with 8,760 hourly rows and a flow_bpd column (0 when the pump is off), "
+                       "plus an optional rate_per_kwh column for a time-of-use tariff. Without a schedule the "
+                       "constant flow rate below is used for every hour.", className="text-light"),
+                dcc.Upload(
+                    id='en-sim-upload',
+                    children=html.Div(["Drag and drop or ", html.A("select a CSV file")]),
+                    style={'borderWidth': '1px', 'borderStyle': 'dashed', 'borderRadius': '5px',
+                           'textAlign': 'center', 'padding': '20px', 'color': 'white'},
+                    multiple=False
+                ),
+                html.Div(id='en-sim-schedule-status', className="text-light mt-2"),
+                dcc.Store(id='en-sim-schedule'),
+                simulation_input('en-sim-flow', "Constant Flow Rate:", "{:,}".format(150000), "barrels per day"),
+                simulation_input('en-sim-energy-rate', "Energy Rate:", "{:,}".format(0.08), "$/kWh"),
+                simulation_input('en-sim-demand-charge', "Demand Charge:", "{:,}".format(12), "$/kW-month"),
+            ]), className="mb-4"), width=4),
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.H5("Line and Fluid", className="text-white"),
+                simulation_input('en-sim-diameter', "Inside Diameter:", "{:,}".format(15.25), "inches"),
+                simulation_input('en-sim-length', "Length:", "{:,}".format(60), "miles"),
+                simulation_input('en-sim-roughness-ft', "Roughness:", "{:,.5f}".format(0.00015), "feet"),
+                simulation_input('en-sim-viscosity', "Kinematic Viscosity:", "{:,}".format(3.6), "cSt"),
+                simulation_input('en-sim-specific-gravity', "Specific Gravity:", "{:,}".format(0.84)),
+                simulation_input('en-sim-static-head', "Static Head and Delivery Pressure:", "{:,}".format(100), "psi"),
+                simulation_input('en-sim-drag-reduction', "Drag Reduction:", "0%", "%"),
+            ]), className="mb-4"), width=4),
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.H5("Pump and Motor", className="text-white"),
+                simulation_input('en-sim-bep-flow', "Pump Best Efficiency Flow:", "{:,}".format(180000), "barrels per day"),
+                simulation_input('en-sim-bep-efficiency', "Pump Best Efficiency:", "80%", "%"),
+                simulation_input('en-sim-motor-kw', "Motor Rating:", "{:,}".format(4000), "kW"),
+                simulation_input('en-sim-motor-efficiency', "Motor Full-Load Efficiency:", "95%", "%"),
+                simulation_input('en-sim-power-factor', "Motor Rated Power Factor:", "{:,}".format(0.88)),
+                simulation_input('en-sim-voltage', "Voltage (three-phase):", "{:,}".format(4160), "V"),
+                dbc.Button('Simulate Year', id='en-sim-btn', color='danger', className="mt-3"),
+            ]), className="mb-4"), width=4),
+        ]),
+        dcc.Loading(html.Div(id='en-sim-output', className="text-light")),
+    ])
+
+# Offcanvas component listing the pipe schedule table for the fluid flow layout
+@cache
+def fluid_flow_offcanvas():
+    # Format numbers with 3 decimal places, or return empty string if the size isn't made
     def format_value(value):
-        return f"{value:.3f}" if value is not None else ""
+        return "" if np.isnan(value) else f"{value:.3f}"
 
     # Create table rows with formatted values
     table_header = [
-        html.Thead(html.Tr([html.Th("NPS"), html.Th("STD"), html.Th("40"), html.Th("XS"), html.Th("XXS")]))
+        html.Thead(html.Tr([html.Th("NPS"), html.Th("OD")] + [html.Th(schedule) for schedule in pipe_schedule.SCHEDULES]))
     ]
     table_body = [
         html.Tbody([
-            html.Tr([
-                html.Td(row["NPS"]),
-                html.Td(format_value(row["STD"])),
-                html.Td(format_value(row["40"])),
-                html.Td(format_value(row["XS"])),
-                html.Td(format_value(row["XXS"]))
-            ]) for row in table_data
+            html.Tr(
+                [html.Td(pipe_schedule.nps_label(nps)), html.Td(format_value(od))]
+                + [html.Td(format_value(wall)) for wall in walls]
+            ) for nps, od, walls in zip(pipe_schedule.NPS, pipe_schedule.OUTSIDE_DIAMETER_IN,
+                                        pipe_schedule.WALL_THICKNESS_IN)
         ])
     ]
 
@@ -494,7 +2466,135 @@ def calculate_energy_needs(n_clicks, power, voltage, phase, power_factor):
         ])
     return ''
 
+@app.callback(
+    Output('en-sim-schedule', 'data'),
+    Output('en-sim-schedule-status', 'children'),
+    Input('en-sim-upload', 'contents'),
+    State('en-sim-upload', 'filename'),
+    prevent_initial_call=True
+)
+def load_energy_schedule(contents, filename):
+    try:
+        columns = bulk_csv.read_upload_columns(contents, ('flow_bpd', 'rate_per_kwh'), defaults={'rate_per_kwh': None})
+    except (ValueError, UnicodeDecodeError) as e:
+        return None, dbc.Alert(f"Could not read {filename}: {e}", color='danger')
+    if columns['flow_bpd'].size != energy.HOURS_PER_YEAR:
+        return None, dbc.Alert(f"{filename} has {columns['flow_bpd'].size:,} rows; a year needs "
+                               f"{energy.HOURS_PER_YEAR:,}.", color='danger')
+    schedule = {name: values.tolist() for name, values in columns.items()}
+    tariff = " and hourly tariff" if 'rate_per_kwh' in schedule else ""
+    return schedule, f"Using the flow schedule{tariff} from {filename}."
+
+
+# Annual simulation summary, hourly power chart and monthly table
+def compute_energy_simulation(flow_bpd, energy_rate, line, demand_charge):
+    import plotly.graph_objs as go
+
+    result = energy.simulate_pumping_energy(flow_bpd, energy_rate=energy_rate, demand_charge=demand_charge, **line)
+    fig = go.Figure([
+        go.Scattergl(x=np.arange(energy.HOURS_PER_YEAR), y=result['input_kw'], mode='lines', name='Input Power'),
+    ])
+    fig.update_layout(
+        title='Hourly Motor Input Power',
+        xaxis_title='Hour of Year',
+        yaxis_title='Power (kW)',
+        template='plotly_dark'
+    )
+    monthly_rate = np.bincount(energy.MONTH_OF_HOUR, weights=result['input_kw'] * energy_rate, minlength=12)
+    months = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+    monthly = [
+        {'month': month, 'kwh': round(kwh), 'peak_kw': round(peak), 'cost': round(cost + peak * demand_charge)}
+        for month, kwh, peak, cost in zip(months, result['monthly_kwh'].tolist(), result['monthly_peak_kw'].tolist(),
+                                          monthly_rate.tolist())
+    ]
+    summary = {key: value for key, value in result.items() if np.ndim(value) == 0}
+    return {'summary': summary, 'monthly': monthly, 'figure': fig.to_dict()}
+
+
+@app.callback(
+    Output('en-sim-output', 'children'),
+    Input('en-sim-btn', 'n_clicks'),
+    State('en-sim-schedule', 'data'),
+    State('en-sim-flow', 'value'),
+    State('en-sim-energy-rate', 'value'),
+    State('en-sim-demand-charge', 'value'),
+    State('en-sim-diameter', 'value'),
+    State('en-sim-length', 'value'),
+    State('en-sim-roughness-ft', 'value'),
+    State('en-sim-viscosity', 'value'),
+    State('en-sim-specific-gravity', 'value'),
+    State('en-sim-static-head', 'value'),
+    State('en-sim-drag-reduction', 'value'),
+    State('en-sim-bep-flow', 'value'),
+    State('en-sim-bep-efficiency', 'value'),
+    State('en-sim-motor-kw', 'value'),
+    State('en-sim-motor-efficiency', 'value'),
+    State('en-sim-power-factor', 'value'),
+    State('en-sim-voltage', 'value')
+)
+def simulate_annual_energy(n_clicks, schedule, flow_bpd, energy_rate, demand_charge, diameter_in, length_mi,
+                           roughness_ft, viscosity_cst, specific_gravity, static_head_psi, drag_reduction,
+                           bep_flow_bpd, bep_efficiency, motor_rated_kw, motor_efficiency, power_factor, voltage):
+    if n_clicks:
+        if schedule:
+            flow = np.array(schedule['flow_bpd'], dtype=float)
+        else:
+            flow = np.full(energy.HOURS_PER_YEAR, parse_number(flow_bpd))
+        if schedule and 'rate_per_kwh' in schedule:
+            rate = np.array(schedule['rate_per_kwh'], dtype=float)
+        else:
+            rate = np.full(energy.HOURS_PER_YEAR, parse_number(energy_rate))
+        line = {
+            'inner_diameter_in': parse_number(diameter_in),
+            'length_mi': parse_number(length_mi),
+            'roughness_ft': parse_number(roughness_ft),
+            'viscosity_cst': parse_number(viscosity_cst),
+            'specific_gravity': parse_number(specific_gravity),
+            'static_head_psi': parse_number(static_head_psi),
+            'drag_reduction': parse_number(drag_reduction) / 100,
+            'bep_flow_bpd': parse_number(bep_flow_bpd),
+            'bep_efficiency': parse_number(bep_efficiency) / 100,
+            'motor_rated_kw': parse_number(motor_rated_kw),
+            'motor_full_load_efficiency': parse_number(motor_efficiency) / 100,
+            'rated_power_factor': parse_number(power_factor),
+            'voltage': parse_number(voltage),
+        }
+        demand_charge = parse_number(demand_charge)
+
+        # The schedule is keyed by a digest of its values, so the same year with new pump data still reruns
+        result = result_cache.get_or_compute(
+            ('energy-simulation', energy.schedule_key(flow, rate), tuple(sorted(line.items())), demand_charge),
+            lambda: compute_energy_simulation(flow, rate, line, demand_charge)
+        )
+        summary = result['summary']
+        details = [
+            html.Li(f"Energy: {summary['energy_kwh']:,.0f} kWh over {summary['running_hours']:,} running hours"),
+            html.Li(f"Peak Demand: {summary['peak_kw']:,.0f} kW"),
+            html.Li(f"Peak Current: {summary['peak_current_a']:,.0f} A"),
+            html.Li(f"Average Power Factor: {summary['average_power_factor']:.3f}"),
+            html.Li(f"Energy Cost: ${summary['energy_cost']:,.0f}"),
+            html.Li(f"Demand Cost: ${summary['demand_cost']:,.0f}"),
+            html.Li(f"Total Cost: ${summary['total_cost']:,.0f}"),
+        ]
+        if summary['overload_hours']:
+            details.append(html.Li(f"Motor above rating for {summary['overload_hours']:,} hours",
+                                   className="text-warning"))
+        return html.Div([
+            html.H4("Annual Results", className="text-white"),
+            html.Ul(details),
+            dcc.Graph(figure=result['figure']),
+            dash_table.DataTable(
+                columns=[{'name': 'Month', 'id': 'month'}, {'name': 'Energy (kWh)', 'id': 'kwh'},
+                         {'name': 'Peak (kW)', 'id': 'peak_kw'}, {'name': 'Cost ($)', 'id': 'cost'}],
+                data=result['monthly'],
+                style_header={'backgroundColor': '#073642', 'color': 'white', 'fontWeight': 'bold'},
+                style_cell={'backgroundColor': '#002b36', 'color': 'white', 'textAlign': 'right'},
+            )
+        ])
+    return ''
+
 # Unit Conversions Layout and Callbacks
+@cache
 def unit_conversions_layout():
     return dbc.Container([
         dbc.Row(dbc.Col(html.H2("Unit Conversions", className="text-center my-4 text-light"))),
@@ -502,8 +2602,15 @@ def unit_conversions_layout():
             dbc.Tab(label='Degrees API to Specific Gravity', tab_id='tab-api-sg'),
             dbc.Tab(label='Pressure to Head (ft)', tab_id='tab-pressure-head'),
             dbc.Tab(label='Dynamic to Kinematic Viscosity', tab_id='tab-viscosity'),
+            dbc.Tab(label='Units', tab_id='tab-units'),
         ], id='unit-tabs', active_tab='tab-api-sg', className="mb-3"),
-        html.Div(id='tab-content')
+        html.Div(id='tab-content'),
+        # Factors from the unit registry for the converters that run in the browser
+        dcc.Store(id='unit-factors', data={
+            'ftHeadPerPsi': conversions.FT_HEAD_PER_PSI,
+            'cstPerCpM3Kg': conversions.CST_PER_CP_M3_KG,
+            'units': units.table(),
+        }),
     ], fluid=True, className="bg-dark")
 
 @app.callback(
@@ -517,9 +2624,12 @@ def render_tab_content(active_tab):
         return pressure_to_head_layout()
     elif active_tab == 'tab-viscosity':
         return viscosity_conversion_layout()
+    elif active_tab == 'tab-units':
+        return general_units_layout()
     return ''
 
 # Degrees API to Specific Gravity Layout
+@cache
 def api_to_sg_layout():
     return dbc.Container([
         dbc.Row([
@@ -544,8 +2654,9 @@ def api_to_sg_layout():
         ], justify='center')
     ], fluid=True, className="bg-dark")
 
-# Bidirectional conversion between API and SG with error handling
-@app.callback(
+# Bidirectional conversion between API and SG with error handling, run in the browser (assets/unit_conversions.js)
+app.clientside_callback(
+    ClientsideFunction(namespace='conversions', function_name='apiToSg'),
     [Output('api-value', 'value'),
      Output('sg-value', 'value'),
      Output('api-error-message', 'children'),
@@ -553,38 +2664,9 @@ def api_to_sg_layout():
     [Input('api-value', 'value'),
      Input('sg-value', 'value')]
 )
-def convert_api_to_sg(api, sg):
-    ctx = callback_context
-    error_message = ''
-    is_open = False
-    if not ctx.triggered:
-        return api, sg, error_message, is_open
-    else:
-        input_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        try:
-            if input_id == 'api-value':
-                if api is None:
-                    error_message = 'Please enter a valid API value.'
-                    is_open = True
-                    return api, sg, error_message, is_open
-                # Convert from API to SG
-                sg = 141.5 / (131.5 + api)
-                return api, round(sg, 4), error_message, is_open
-            elif input_id == 'sg-value':
-                if sg is None or sg == 0:
-                    error_message = 'Specific Gravity cannot be zero.'
-                    is_open = True
-                    return api, sg, error_message, is_open
-                # Convert from SG to API
-                api = 141.5 / sg - 131.5
-                return round(api, 2), sg, error_message, is_open
-        except Exception as e:
-            error_message = f"An error occurred: {str(e)}"
-            is_open = True
-            return api, sg, error_message, is_open
-    return api, sg, error_message, is_open
 
 # Pressure to Head Layout
+@cache
 def pressure_to_head_layout():
     return dbc.Container([
         dbc.Row([
@@ -613,52 +2695,21 @@ def pressure_to_head_layout():
         ], justify='center')
     ], fluid=True, className="bg-dark")
 
-# Bidirectional conversion between Pressure and Head with error handling
-@app.callback(
+# Bidirectional conversion between Pressure and Head with error handling, run in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace='conversions', function_name='pressureToHead'),
     [Output('pressure-value', 'value'),
      Output('head-value', 'value'),
      Output('pressure-error-message', 'children'),
      Output('pressure-error-message', 'is_open')],
     [Input('pressure-value', 'value'),
      Input('head-value', 'value'),
-     Input('pressure-sg', 'value')]
-)
-def convert_pressure_to_head(pressure, head, sg):
-    ctx = callback_context
-    error_message = ''
-    is_open = False
-    if not ctx.triggered:
-        return pressure, head, error_message, is_open
-    else:
-        input_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        try:
-            if sg is None or sg == 0:
-                error_message = 'Specific Gravity cannot be zero.'
-                is_open = True
-                return pressure, head, error_message, is_open
-            if input_id == 'pressure-value':
-                if pressure is None:
-                    error_message = 'Please enter a valid pressure value.'
-                    is_open = True
-                    return pressure, head, error_message, is_open
-                # Convert pressure to head
-                head = (pressure * 2.31) / sg
-                return pressure, round(head, 2), error_message, is_open
-            elif input_id == 'head-value':
-                if head is None:
-                    error_message = 'Please enter a valid head value.'
-                    is_open = True
-                    return pressure, head, error_message, is_open
-                # Convert head to pressure
-                pressure = (head * sg) / 2.31
-                return round(pressure, 2), head, error_message, is_open
-        except Exception as e:
-            error_message = f"An error occurred: {str(e)}"
-            is_open = True
-            return pressure, head, error_message, is_open
-    return pressure, head, error_message, is_open
+     Input('pressure-sg', 'value')],
+    State('unit-factors', 'data')
+)
 
 # Dynamic to Kinematic Viscosity Layout
+@cache
 def viscosity_conversion_layout():
     return dbc.Container([
         dbc.Row([
@@ -687,50 +2738,76 @@ def viscosity_conversion_layout():
         ], justify='center')
     ], fluid=True, className="bg-dark")
 
-# Bidirectional conversion between Dynamic and Kinematic Viscosity with error handling
-@app.callback(
+# Bidirectional conversion between Dynamic and Kinematic Viscosity with error handling, run in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace='conversions', function_name='dynamicToKinematic'),
     [Output('dynamic-viscosity', 'value'),
      Output('kinematic-viscosity', 'value'),
      Output('viscosity-error-message', 'children'),
      Output('viscosity-error-message', 'is_open')],
     [Input('dynamic-viscosity', 'value'),
      Input('kinematic-viscosity', 'value'),
-     Input('fluid-density', 'value')]
-)
-def convert_dynamic_to_kinematic(dynamic_viscosity, kinematic_viscosity, density):
-    ctx = callback_context
-    error_message = ''
-    is_open = False
-    if not ctx.triggered:
-        return dynamic_viscosity, kinematic_viscosity, error_message, is_open
-    else:
-        input_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        try:
-            if density is None or density == 0:
-                error_message = 'Density cannot be zero.'
-                is_open = True
-                return dynamic_viscosity, kinematic_viscosity, error_message, is_open
-            if input_id == 'dynamic-viscosity':
-                if dynamic_viscosity is None:
-                    error_message = 'Please enter a valid dynamic viscosity.'
-                    is_open = True
-                    return dynamic_viscosity, kinematic_viscosity, error_message, is_open
-                # Convert dynamic to kinematic viscosity
-                kinematic_viscosity = (dynamic_viscosity / density) * 1e6
-                return dynamic_viscosity, round(kinematic_viscosity, 2), error_message, is_open
-            elif input_id == 'kinematic-viscosity':
-                if kinematic_viscosity is None:
-                    error_message = 'Please enter a valid kinematic viscosity.'
-                    is_open = True
-                    return dynamic_viscosity, kinematic_viscosity, error_message, is_open
-                # Convert kinematic to dynamic viscosity
-                dynamic_viscosity = (kinematic_viscosity * density) / 1e6
-                return round(dynamic_viscosity, 2), kinematic_viscosity, error_message, is_open
-        except Exception as e:
-            error_message = f"An error occurred: {str(e)}"
-            is_open = True
-            return dynamic_viscosity, kinematic_viscosity, error_message, is_open
-    return dynamic_viscosity, kinematic_viscosity, error_message, is_open
+     Input('fluid-density', 'value')],
+    State('unit-factors', 'data')
+)
+
+# Any-to-any conversion within one kind of quantity, from the unit registry's table
+@cache
+def general_units_layout():
+    dimensions = list(units.COMMON_UNITS)
+    first = units.COMMON_UNITS[dimensions[0]]
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(
+                dbc.Card([
+                    dbc.CardBody([
+                        dbc.Label("Quantity:", className="text-white"),
+                        dcc.Dropdown(id='units-dimension',
+                                     options=[{'label': d.capitalize(), 'value': d} for d in dimensions],
+                                     value=dimensions[0], clearable=False, className="mb-2"),
+                        dbc.Label("From:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='units-from-value', type='number', value=1, className="mb-2"),
+                            dbc.Select(id='units-from-unit', options=first, value=first[0]),
+                        ]),
+                        dbc.Label("To:", className="text-white"),
+                        dbc.InputGroup([
+                            dbc.Input(id='units-to-value', type='number', value=None, className="mb-2"),
+                            dbc.Select(id='units-to-unit', options=first, value=first[1]),
+                        ]),
+                        dbc.Alert(id='units-error-message', color='danger', dismissable=True, is_open=False, className='mt-2'),
+                    ])
+                ], className="mb-4"),
+                width=4
+            )
+        ], justify='center')
+    ], fluid=True, className="bg-dark")
+
+# Unit choices for the selected quantity, run in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace='conversions', function_name='unitOptions'),
+    [Output('units-from-unit', 'options'),
+     Output('units-from-unit', 'value'),
+     Output('units-to-unit', 'options'),
+     Output('units-to-unit', 'value')],
+    Input('units-dimension', 'value'),
+    State('unit-factors', 'data')
+)
+
+# Bidirectional conversion between the two selected units with error handling, run in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace='conversions', function_name='convertUnits'),
+    [Output('units-from-value', 'value'),
+     Output('units-to-value', 'value'),
+     Output('units-error-message', 'children'),
+     Output('units-error-message', 'is_open')],
+    [Input('units-from-value', 'value'),
+     Input('units-to-value', 'value'),
+     Input('units-from-unit', 'value'),
+     Input('units-to-unit', 'value')],
+    [State('units-dimension', 'value'),
+     State('unit-factors', 'data')]
+)
 
 # Run the app
 if __name__ == '__main__':
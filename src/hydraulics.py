@@ -0,0 +1,213 @@
+# Vectorized hydraulics engine for the Fluid Flow tool.
+# Every function takes plain floats or NumPy arrays and broadcasts them against each other,
+# so the same code answers one click in the UI or a screening run over thousands of operating points.
+
+import numpy as np
+
+import units
+
+# Unit factors shared by the calculators, resolved once from the unit registry (see units.py)
+FT3_PER_BBL = units.factor('bbl', 'ft3')
+FT_PER_MILE = units.factor('mi', 'ft')
+FT2_PER_IN2 = units.factor('in2', 'ft2')
+SECONDS_PER_DAY = units.factor('day', 's')
+M_PER_FT = units.factor('ft', 'm')
+CST_TO_M2S = units.factor('cSt', 'm2/s')
+G_FT_S2 = 32.17405  # Gravitational acceleration in ft/s^2
+FT_HEAD_PER_PSI = units.factor('psi', 'ftH2O')  # Feet of water per psi
+# Hydraulic horsepower for 1 bpd pumped through 1 psi
+HHP_PER_BPD_PSI = units.factor('bpd*psi', 'hp')
+KW_PER_HP = units.factor('hp', 'kW')
+
+# Friction factor methods in the order they are displayed
+METHODS = ('Colebrook-White', 'Swamee-Jain', 'Clamond')
+# Optional interpolated Colebrook-White lookup (see friction_table.py); not part of the default set
+TABLE_METHOD = 'Table'
+
+
+def _as_float_array(value):
+    return np.asarray(value, dtype=float)
+
+
+# Mean velocity in ft/s for a flow rate in barrels per day through a pipe of the given inner diameter
+def flow_velocity_fps(diameter_in, flow_rate_bpd):
+    diameter_ft = _as_float_array(diameter_in) / 12
+    area_sqft = np.pi * (diameter_ft / 2) ** 2  # Cross-sectional area in square feet
+    flow_rate_cfs = _as_float_array(flow_rate_bpd) * FT3_PER_BBL / SECONDS_PER_DAY  # Cubic feet per second
+    return flow_rate_cfs / area_sqft
+
+
+# Line fill of a pipe: returns (cubic feet, barrels) for an inner diameter (in) and length (miles)
+def pipe_volume(inner_diameter_in, length_miles):
+    area_sqft = np.pi * (_as_float_array(inner_diameter_in) / 2) ** 2 * FT2_PER_IN2
+    volume_cuft = area_sqft * _as_float_array(length_miles) * FT_PER_MILE
+    return volume_cuft, volume_cuft / FT3_PER_BBL
+
+
+# Reynolds number from diameter (in), flow rate (bpd) and kinematic viscosity (cSt)
+def reynolds_number(diameter_in, flow_rate_bpd, viscosity_cst):
+    diameter_m = _as_float_array(diameter_in) / 12 * M_PER_FT
+    velocity_mps = flow_velocity_fps(diameter_in, flow_rate_bpd) * M_PER_FT
+    viscosity_m2s = _as_float_array(viscosity_cst) * CST_TO_M2S
+    return velocity_mps * diameter_m / viscosity_m2s
+
+
+# Flow regime labels for an array of Reynolds numbers
+def flow_regime(reynolds):
+    reynolds = _as_float_array(reynolds)
+    return np.where(reynolds > 4000, 'Turbulent', np.where(reynolds >= 2000, 'Transition', 'Laminar'))
+
+
+# Colebrook-White equation solved by Newton iteration on x = 1/sqrt(f):
+# g(x) = x + 2 log10(rr/3.7 + 2.51 x / Re) = 0
+# The iteration runs on whole arrays at once. Each element starts from initial_guess (a friction factor,
+# normally Clamond or Swamee-Jain) and stops updating once its relative step is below tol.
+# Returns the friction factors, a per-element converged flag and the per-element iteration counts.
+def solve_colebrook(reynolds, relative_roughness, initial_guess=None, tol=1e-10, max_iterations=50):
+    reynolds, relative_roughness = np.broadcast_arrays(_as_float_array(reynolds), _as_float_array(relative_roughness))
+    if initial_guess is None:
+        initial_guess = swamee_jain(reynolds, relative_roughness)
+    a = relative_roughness / 3.7
+    b = 2.51 / reynolds
+    x = np.broadcast_to(1.0 / np.sqrt(_as_float_array(initial_guess)), reynolds.shape)
+    converged = np.zeros(reynolds.shape, dtype=bool)
+    iterations = np.zeros(reynolds.shape, dtype=int)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            inner = a + b * x
+            g = x + 2.0 * np.log10(inner)
+            dg = 1.0 + 2.0 * b / (inner * np.log(10))
+            # Converged elements are frozen; only the rest take a Newton step
+            step = np.where(converged, 0.0, g / dg)
+            x = x - step
+            iterations += ~converged
+            converged |= np.abs(step) <= tol * np.abs(x)
+            if converged.all():
+                break
+
+    # Anything that went non-finite along the way did not converge
+    converged &= np.isfinite(x)
+    return 1.0 / (x * x), converged, iterations
+
+
+# Colebrook-White friction factor only, for callers that don't need the convergence report
+def colebrook_white(reynolds, relative_roughness, initial_guess=None, tol=1e-10):
+    return solve_colebrook(reynolds, relative_roughness, initial_guess, tol)[0]
+
+
+# Swamee-Jain explicit approximation
+def swamee_jain(reynolds, relative_roughness):
+    reynolds = _as_float_array(reynolds)
+    relative_roughness = _as_float_array(relative_roughness)
+    return 0.25 / np.log10(relative_roughness / 3.7 + 5.74 / reynolds ** 0.9) ** 2
+
+
+# Clamond's explicit solution of Colebrook-White
+def clamond(reynolds, relative_roughness):
+    reynolds = _as_float_array(reynolds)
+    X1 = _as_float_array(relative_roughness) * reynolds * 0.1239681863354175460160858261654858382699  # (log(10)/18.574).evalf(40)
+    X2 = np.log(reynolds) - 0.7793974884556819406441139701653776731705  # log(log(10)/5.02).evalf(40)
+    F = X2 - 0.2
+    X1F = X1 + F
+    X1F1 = 1. + X1F
+
+    E = (np.log(X1F) - 0.2) / X1F1
+    F = F - (X1F1 + 0.5 * E) * E * X1F / (X1F1 + E * (1. + (1.0 / 3.0) * E))
+
+    X1F = X1 + F
+    X1F1 = 1. + X1F
+    E = (np.log(X1F) + F - X2) / X1F1
+
+    b = X1F1 + E * (1. + 1.0 / 3.0 * E)
+    F = b / (b * F - ((X1F1 + 0.5 * E) * E * X1F))
+
+    return 1.325474527619599502640416597148504422899 * (F * F)  # ((0.5*log(10))**2).evalf(40)
+
+
+# Friction factor for every requested method, keyed by method name.
+# Also returns the Colebrook-White per-element converged flags (all True when it isn't requested).
+def friction_factors(reynolds, roughness_ft, diameter_ft, methods=METHODS, tol=1e-10):
+    reynolds = _as_float_array(reynolds)
+    relative_roughness = _as_float_array(roughness_ft) / _as_float_array(diameter_ft)
+    reynolds, relative_roughness = np.broadcast_arrays(reynolds, relative_roughness)
+
+    # Explicit correlations first, so Colebrook-White can start from the Clamond value
+    explicit = {}
+    if 'Clamond' in methods or 'Colebrook-White' in methods:
+        explicit['Clamond'] = clamond(reynolds, relative_roughness)
+    if 'Swamee-Jain' in methods:
+        explicit['Swamee-Jain'] = swamee_jain(reynolds, relative_roughness)
+
+    converged = np.ones(reynolds.shape, dtype=bool)
+    results = {}
+    for method in methods:
+        if method == 'Colebrook-White':
+            seed = explicit['Clamond']
+            # Clamond has no real solution for laminar-range inputs; fall back to Swamee-Jain there
+            seed = np.where(np.isfinite(seed) & (seed > 0), seed, swamee_jain(reynolds, relative_roughness))
+            results[method], converged, _ = solve_colebrook(reynolds, relative_roughness, seed, tol)
+        elif method in explicit:
+            results[method] = explicit[method]
+        elif method == TABLE_METHOD:
+            from friction_table import get_table
+            results[method] = get_table().lookup(reynolds, relative_roughness)
+        else:
+            raise ValueError(f'Unknown friction factor method: {method}')
+    return results, converged
+
+
+# Darcy-Weisbach pressure loss per mile in psi
+def pressure_loss_psi_per_mile(friction_factor, diameter_in, velocity_fps, specific_gravity, drag_reduction=0.0):
+    # Darcy-Weisbach equation: h = f * (L/D) * v^2 / 2g, with L = one mile
+    diameter_ft = _as_float_array(diameter_in) / 12
+    velocity_fps = _as_float_array(velocity_fps)
+    head_loss_ft = FT_PER_MILE * _as_float_array(friction_factor) * velocity_fps ** 2 / (diameter_ft * 2 * G_FT_S2)
+    # Convert feet of head to psi for the fluid's specific gravity, then apply drag reduction
+    delta_p_psi = head_loss_ft * _as_float_array(specific_gravity) / FT_HEAD_PER_PSI
+    return delta_p_psi * (1 - _as_float_array(drag_reduction))
+
+
+# Full calculation for arrays of operating points.
+# drag_reduction is a fraction (0.25 for 25%). Returns velocity, Reynolds number, flow regime,
+# per-method friction factors and pressure losses (psi/mile), and the Colebrook-White convergence flags.
+def friction_pressure_loss(diameter_in, flow_rate_bpd, roughness_ft, viscosity_cst, specific_gravity,
+                           drag_reduction=0.0, methods=METHODS, tol=1e-10):
+    diameter_in, flow_rate_bpd, roughness_ft, viscosity_cst, specific_gravity, drag_reduction = np.broadcast_arrays(
+        *(_as_float_array(v) for v in (diameter_in, flow_rate_bpd, roughness_ft, viscosity_cst, specific_gravity,
+                                       drag_reduction)))
+
+    velocity_fps = flow_velocity_fps(diameter_in, flow_rate_bpd)
+    reynolds = reynolds_number(diameter_in, flow_rate_bpd, viscosity_cst)
+    factors, converged = friction_factors(reynolds, roughness_ft, diameter_in / 12, methods, tol)
+    pressure_losses = {
+        method: pressure_loss_psi_per_mile(f, diameter_in, velocity_fps, specific_gravity, drag_reduction)
+        for method, f in factors.items()
+    }
+    return {
+        'velocity_fps': velocity_fps,
+        'reynolds_number': reynolds,
+        'flow_regime': flow_regime(reynolds),
+        'friction_factors': factors,
+        'pressure_loss_psi_per_mile': pressure_losses,
+        'converged': converged,
+    }
+
+
+# Inputs of friction_pressure_loss that can be swept
+SWEEP_VARIABLES = ('flow_rate_bpd', 'diameter_in', 'viscosity_cst', 'drag_reduction')
+
+
+# friction_pressure_loss over a range of one input (x_values, along the last axis) and optionally a set of
+# values of a second input (series_values, along the first axis), in a single vectorized pass.
+# base holds the fixed inputs as friction_pressure_loss keyword arguments.
+def friction_sweep(base, x_name, x_values, series_name=None, series_values=None, methods=METHODS, tol=1e-10):
+    if x_name not in SWEEP_VARIABLES or series_name not in SWEEP_VARIABLES + (None,):
+        raise ValueError(f'Sweep variables must be one of: {", ".join(SWEEP_VARIABLES)}')
+    if series_name == x_name:
+        raise ValueError('The series variable must differ from the swept variable')
+    inputs = dict(base)
+    inputs[x_name] = _as_float_array(x_values).reshape(1, -1)
+    if series_name is not None:
+        inputs[series_name] = _as_float_array(series_values).reshape(-1, 1)
+    return friction_pressure_loss(**inputs, methods=methods, tol=tol)
@@ -0,0 +1,127 @@
+# Inverse fluid-flow calculations: the largest flow a pressure budget allows, and the drag reduction a flow
+# needs to stay within one. Both run on whole arrays of cases (a nomination schedule) at once.
+# Pressure loss rises monotonically with flow, so the maximum flow is the root of
+# log(loss(Q)) - log(budget) in log Q, found with the Illinois variant of regula falsi: a bracket that
+# always holds the root, with secant steps that converge in a handful of iterations because loss is close
+# to a power of flow. Each iteration is one call of the forward calculation on the cases still open.
+# Drag reduction scales the loss by (1 - DR), so the one a flow needs is closed form from the loss without it.
+
+import numpy as np
+
+import hydraulics
+
+# Initial bracket: a flow estimated from a typical friction factor, then widened by this factor each way
+# until it holds the root
+ESTIMATE_FRICTION_FACTOR = 0.02
+BRACKET_STEP = 4.0
+MAX_BRACKET_STEPS = 30
+# Most drag reduction drag-reducing agents give in practice; more than this is reported as not feasible
+MAX_DRAG_REDUCTION = 0.7
+
+
+def _broadcast(*values):
+    return [np.atleast_1d(v) for v in np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in values))]
+
+
+# Largest flow rate (bpd) whose friction loss is allowable_psi_per_mile, for arrays of cases.
+# drag_reduction is a fraction. Returns the flow with its velocity and Reynolds number, the iterations used
+# and per-case converged flags; cases with no solution (a non-positive budget, or inputs the friction
+# correlation can't handle) come back as NaN.
+def max_flow_rate(diameter_in, allowable_psi_per_mile, roughness_ft, viscosity_cst, specific_gravity,
+                  drag_reduction=0.0, method='Colebrook-White', rtol=1e-10, max_iterations=100):
+    diameter_in, allowable, roughness_ft, viscosity_cst, specific_gravity, drag_reduction = _broadcast(
+        diameter_in, allowable_psi_per_mile, roughness_ft, viscosity_cst, specific_gravity, drag_reduction)
+    if np.any(diameter_in <= 0):
+        raise ValueError('Diameter must be positive')
+    if np.any(drag_reduction >= 1):
+        raise ValueError('Drag reduction must be less than 100%')
+
+    def residual(index, log_flow):
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            result = hydraulics.friction_pressure_loss(
+                diameter_in[index], np.exp(log_flow), roughness_ft[index], viscosity_cst[index],
+                specific_gravity[index], drag_reduction[index], methods=(method,))
+            return np.log(result['pressure_loss_psi_per_mile'][method] / allowable[index])
+
+    # Flow at which the typical friction factor gives the allowable loss (loss goes as flow squared)
+    reference_loss = hydraulics.pressure_loss_psi_per_mile(
+        ESTIMATE_FRICTION_FACTOR, diameter_in, hydraulics.flow_velocity_fps(diameter_in, 1.0), specific_gravity,
+        drag_reduction)
+    cases = np.flatnonzero(allowable > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        estimate = 0.5 * np.log(allowable[cases] / reference_loss[cases])
+    step = np.log(BRACKET_STEP)
+    low, high = estimate - step, estimate + step
+    low_residual, high_residual = residual(cases, low), residual(cases, high)
+    for _ in range(MAX_BRACKET_STEPS):
+        short = low_residual > 0
+        long = high_residual < 0
+        if not (short.any() or long.any()):
+            break
+        low[short] -= step
+        low_residual[short] = residual(cases[short], low[short])
+        high[long] += step
+        high_residual[long] = residual(cases[long], high[long])
+    # Cases the correlation returned NaN for, or that never bracketed, are left unsolved
+    bracketed = (low_residual <= 0) & (high_residual >= 0)
+    cases, low, high = cases[bracketed], low[bracketed], high[bracketed]
+    low_residual, high_residual = low_residual[bracketed], high_residual[bracketed]
+
+    log_flow = np.full(diameter_in.shape, np.nan)
+    converged = np.zeros(diameter_in.shape, dtype=bool)
+    # Which end of the bracket moved last (-1 low, 1 high), for the Illinois halving
+    side = np.zeros(cases.size, dtype=np.int8)
+    iterations = 0
+    open_ = np.arange(cases.size)
+    while open_.size and iterations < max_iterations:
+        iterations += 1
+        lo, hi, r_lo, r_hi = low[open_], high[open_], low_residual[open_], high_residual[open_]
+        guess = hi - r_hi * (hi - lo) / (r_hi - r_lo)
+        guess = np.where(np.isfinite(guess), guess, 0.5 * (lo + hi))
+        r = residual(cases[open_], guess)
+        finished = (np.abs(r) < rtol) | (hi - lo < rtol)
+        log_flow[cases[open_[finished]]] = guess[finished]
+        converged[cases[open_[finished]]] = True
+
+        # Move the end on the residual's side; halve the other end's residual when the same end moves twice
+        above = r > 0
+        moved_high = open_[above]
+        high[moved_high], high_residual[moved_high] = guess[above], r[above]
+        low_residual[moved_high[side[moved_high] == 1]] *= 0.5
+        side[moved_high] = 1
+        moved_low = open_[~above]
+        low[moved_low], low_residual[moved_low] = guess[~above], r[~above]
+        high_residual[moved_low[side[moved_low] == -1]] *= 0.5
+        side[moved_low] = -1
+        open_ = open_[~finished]
+    # Out of iterations: the bracket midpoint is the best answer, but not a converged one
+    log_flow[cases[open_]] = 0.5 * (low[open_] + high[open_])
+
+    flow_rate_bpd = np.exp(log_flow)
+    return {
+        'flow_rate_bpd': flow_rate_bpd,
+        'velocity_fps': hydraulics.flow_velocity_fps(diameter_in, flow_rate_bpd),
+        'reynolds_number': hydraulics.reynolds_number(diameter_in, flow_rate_bpd, viscosity_cst),
+        'iterations': iterations,
+        'converged': converged,
+    }
+
+
+# Drag reduction (fraction) that brings the loss at flow_rate_bpd down to allowable_psi_per_mile, for arrays
+# of cases; 0 where the flow is within the budget without it. Returns it with the loss without drag
+# reduction; feasible is False where it would take more than max_drag_reduction.
+def required_drag_reduction(diameter_in, flow_rate_bpd, allowable_psi_per_mile, roughness_ft, viscosity_cst,
+                            specific_gravity, method='Colebrook-White', max_drag_reduction=MAX_DRAG_REDUCTION):
+    diameter_in, flow_rate_bpd, allowable, roughness_ft, viscosity_cst, specific_gravity, max_drag_reduction = (
+        _broadcast(diameter_in, flow_rate_bpd, allowable_psi_per_mile, roughness_ft, viscosity_cst,
+                   specific_gravity, max_drag_reduction))
+    result = hydraulics.friction_pressure_loss(diameter_in, flow_rate_bpd, roughness_ft, viscosity_cst,
+                                               specific_gravity, 0.0, methods=(method,))
+    loss = result['pressure_loss_psi_per_mile'][method]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drag_reduction = np.maximum(1 - allowable / loss, 0.0)
+    return {
+        'drag_reduction': drag_reduction,
+        'pressure_loss_psi_per_mile': loss,
+        'feasible': drag_reduction <= max_drag_reduction,
+    }
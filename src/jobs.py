@@ -0,0 +1,149 @@
+# Background jobs for long calculations (big sweeps, batch uploads) so they don't tie up a request.
+# A job runs on a thread pool in the process that submitted it; its state, progress, partial and final
+# results live in a SQLite file, so with several gunicorn workers any of them can answer the page's polls.
+# A job function takes a Job as its first argument and calls job.report() as it goes: that publishes its
+# progress and raises JobCancelled once someone has asked for it to stop, so cancellation happens between
+# chunks of work rather than by killing a thread.
+#   HYDRAULIC_JOBS_PATH      job state file (default: hydraulic-jobs.sqlite3 in the temp directory)
+#   HYDRAULIC_JOB_THREADS    jobs run at once per process (default 2); the rest wait in the queue
+
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, LOST = 'queued', 'running', 'done', 'failed', 'cancelled', 'lost'
+FINISHED = (DONE, FAILED, CANCELLED, LOST)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.id = job_id
+
+    # Record progress (done of total steps) and optionally a partial result the page can show meanwhile
+    def report(self, done, total, message='', partial=None):
+        if self.manager._update(self.id, done, total, message, partial):
+            raise JobCancelled()
+
+
+class JobManager:
+    # Running jobs that haven't reported for stale_seconds are reported lost (their worker went away);
+    # finished jobs are purged keep_seconds after they were last updated
+    def __init__(self, path, max_threads=2, stale_seconds=600, keep_seconds=3600):
+        self.path = path
+        self.max_threads = max_threads
+        self.stale_seconds = stale_seconds
+        self.keep_seconds = keep_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, state TEXT, cancel INTEGER, '
+                       'done REAL, total REAL, message TEXT, partial BLOB, result BLOB, error TEXT, '
+                       'updated_at REAL)')
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    # One connection per thread, reopened after a fork (the app may be imported before gunicorn forks)
+    def _db(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.db = self._connect()
+            local.pid = os.getpid()
+        return local.db
+
+    def _pool(self):
+        with self._lock:
+            if self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.max_threads, thread_name_prefix='hydraulic-job')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    # Queue func(job, *args) and return the job id to poll
+    def submit(self, func, *args):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        db = self._db()
+        db.execute('DELETE FROM jobs WHERE state IN (?, ?, ?, ?) AND updated_at < ?',
+                   FINISHED + (now - self.keep_seconds,))
+        db.execute('INSERT INTO jobs VALUES (?, ?, 0, 0, 1, ?, NULL, NULL, NULL, ?)',
+                   (job_id, QUEUED, 'Waiting to start', now))
+        self._pool().submit(self._run, job_id, func, args)
+        return job_id
+
+    def _run(self, job_id, func, args):
+        db = self._db()
+        started = db.execute("UPDATE jobs SET state = ?, message = '', updated_at = ? WHERE id = ? AND cancel = 0",
+                             (RUNNING, time.time(), job_id)).rowcount
+        if not started:
+            self._finish(job_id, CANCELLED)
+            return
+        try:
+            result = func(Job(self, job_id), *args)
+        except JobCancelled:
+            self._finish(job_id, CANCELLED)
+        except Exception as e:
+            self._finish(job_id, FAILED, error=str(e) or type(e).__name__)
+        else:
+            self._finish(job_id, DONE, result=pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _finish(self, job_id, state, result=None, error=None):
+        self._db().execute('UPDATE jobs SET state = ?, result = ?, error = ?, partial = NULL, updated_at = ? '
+                           'WHERE id = ?', (state, result, error, time.time(), job_id))
+
+    # Returns True when the job has been asked to stop
+    def _update(self, job_id, done, total, message, partial):
+        db = self._db()
+        if partial is None:
+            db.execute('UPDATE jobs SET done = ?, total = ?, message = ?, updated_at = ? WHERE id = ?',
+                       (done, total, message, time.time(), job_id))
+        else:
+            db.execute('UPDATE jobs SET done = ?, total = ?, message = ?, partial = ?, updated_at = ? WHERE id = ?',
+                       (done, total, message, pickle.dumps(partial, protocol=pickle.HIGHEST_PROTOCOL),
+                        time.time(), job_id))
+        row = db.execute('SELECT cancel FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    # Ask a queued or running job to stop; it does so at its next report
+    def cancel(self, job_id):
+        self._db().execute('UPDATE jobs SET cancel = 1 WHERE id = ?', (job_id,))
+
+    # State, progress and results of a job, or None if there's no such job (or it has been purged).
+    # partial is the latest partial result while running; result is set once the job is done.
+    def status(self, job_id):
+        row = self._db().execute('SELECT state, done, total, message, partial, result, error, updated_at '
+                                 'FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        state, done, total, message, partial, result, error, updated_at = row
+        if state == RUNNING and time.time() - updated_at > self.stale_seconds:
+            state, error = LOST, 'The job stopped reporting progress (its worker may have restarted)'
+        return {
+            'state': state,
+            'done': done,
+            'total': total,
+            'fraction': min(done / total, 1.0) if total else 0.0,
+            'message': message,
+            'partial': None if partial is None else pickle.loads(partial),
+            'result': None if result is None else pickle.loads(result),
+            'error': error,
+        }
+
+
+def manager_from_environment():
+    path = os.environ.get('HYDRAULIC_JOBS_PATH') or os.path.join(tempfile.gettempdir(), 'hydraulic-jobs.sqlite3')
+    return JobManager(path, max_threads=int(os.environ.get('HYDRAULIC_JOB_THREADS') or 2))
@@ -0,0 +1,154 @@
+# Batch (line-fill) tracking for multi-product pipelines.
+# The line is always full, so every barrel injected at the inlet pushes one barrel out at the outlet.
+# Fluid is tracked by its injected-volume coordinate: the total barrels injected before it entered the line.
+# A batch is just the coordinate where it started, and the barrel at V bbl from the inlet has coordinate
+# (total injected - V). Injecting therefore moves every interface at once by updating a single counter, and
+# finding what is at a point is a binary search on the cumulative-volume index of the line and on the sorted
+# batch starts, so each event and query is O(log n) rather than a rescan of the line.
+
+import bisect
+
+import numpy as np
+
+import hydraulics
+
+
+class LineFill:
+    # length_mi and inner_diameter_in describe the segments in flow order.
+    # initial_fill lists (product, barrels) already in the line, from the outlet back to the inlet; any
+    # volume it doesn't account for is a batch of fill_product at the outlet.
+    def __init__(self, length_mi, inner_diameter_in, initial_fill=(), start_time=0.0, fill_product='Unknown'):
+        length_mi, inner_diameter_in = np.broadcast_arrays(np.atleast_1d(np.asarray(length_mi, dtype=float)),
+                                                           np.atleast_1d(np.asarray(inner_diameter_in, dtype=float)))
+        if np.any(length_mi <= 0) or np.any(inner_diameter_in <= 0):
+            raise ValueError('Segment lengths and diameters must be positive')
+        _, segment_bbl = hydraulics.pipe_volume(inner_diameter_in, length_mi)
+        # Cumulative-volume index: milepost and barrels from the inlet at every segment boundary
+        self.mileposts = np.concatenate([[0.0], np.cumsum(length_mi)])
+        self.volumes = np.concatenate([[0.0], np.cumsum(segment_bbl)])
+        self.line_volume_bbl = float(self.volumes[-1])
+
+        # Batch history: start coordinates (ascending) and products; batches are never removed so past
+        # times can still be queried
+        self._starts = []
+        self._products = []
+        # Injection history: event times and total injected volume after each event
+        self._times = [float(start_time)]
+        self._injected = [0.0]
+        # First batch with any fluid still in the line
+        self._first_in_line = 0
+
+        fill = list(initial_fill)
+        unaccounted = self.line_volume_bbl - sum(volume for _, volume in fill)
+        if unaccounted > 1e-9 * self.line_volume_bbl:
+            fill.insert(0, (fill_product, unaccounted))
+        coordinate = -sum(volume for _, volume in fill)
+        for product, volume in fill:
+            self._add_batch(coordinate, product)
+            coordinate += volume
+
+    def _add_batch(self, start, product):
+        if self._products and self._products[-1] == product:
+            return
+        self._starts.append(start)
+        self._products.append(product)
+
+    @property
+    def time(self):
+        return self._times[-1]
+
+    def volume_at_milepost(self, milepost):
+        if np.any((np.asarray(milepost) < 0) | (np.asarray(milepost) > self.mileposts[-1])):
+            raise ValueError(f'Milepost must be between 0 and {self.mileposts[-1]:,.2f}')
+        return np.interp(milepost, self.mileposts, self.volumes)
+
+    def milepost_at_volume(self, volume_bbl):
+        return np.interp(volume_bbl, self.volumes, self.mileposts)
+
+    # Total barrels injected by a time; volume is pumped at a steady rate between events
+    def injected_at(self, time=None):
+        if time is None or time >= self._times[-1]:
+            return self._injected[-1]
+        i = bisect.bisect_right(self._times, time)
+        if i == 0:
+            raise ValueError(f'Time {time} is before the start of tracking')
+        return float(np.interp(time, self._times[i - 1:i + 1], self._injected[i - 1:i + 1]))
+
+    # Pump volume_bbl of product into the inlet, finishing at time. Returns what was delivered at the
+    # outlet meanwhile as (product, barrels) pairs in delivery order.
+    def inject(self, time, product, volume_bbl):
+        if time < self._times[-1]:
+            raise ValueError(f'Events must be in time order ({time} is before {self._times[-1]})')
+        if volume_bbl < 0:
+            raise ValueError('Injected volume must not be negative')
+        before = self._injected[-1]
+        after = before + volume_bbl
+        self._add_batch(before, product)
+        self._times.append(float(time))
+        self._injected.append(after)
+
+        # Coordinates leaving the outlet during this event
+        out_from, out_to = before - self.line_volume_bbl, after - self.line_volume_bbl
+        deliveries = []
+        i = self._first_in_line
+        while i < len(self._starts) and self._starts[i] < out_to:
+            end = self._starts[i + 1] if i + 1 < len(self._starts) else after
+            delivered = min(end, out_to) - max(self._starts[i], out_from)
+            if delivered > 0:
+                deliveries.append((self._products[i], delivered))
+            if end <= out_to:
+                i += 1  # Fully delivered
+            else:
+                break
+        self._first_in_line = i
+        return deliveries
+
+    def _batch_index(self, coordinate):
+        return bisect.bisect_right(self._starts, coordinate) - 1
+
+    # Product at a milepost at a time (now when time is None)
+    def product_at(self, milepost, time=None):
+        coordinate = self.injected_at(time) - float(self.volume_at_milepost(milepost))
+        return self._products[max(self._batch_index(coordinate), 0)]
+
+    # Batches in the line at a time, from the inlet to the outlet
+    def contents(self, time=None):
+        injected = self.injected_at(time)
+        first = max(self._batch_index(injected - self.line_volume_bbl), 0)
+        last = self._batch_index(injected)
+        batches = []
+        for i in range(last, first - 1, -1):
+            start = self._starts[i]
+            # A batch still being injected (mid-event) only reaches as far as what has been injected so far
+            end = min(self._starts[i + 1], injected) if i + 1 < len(self._starts) else injected
+            # Volume from the inlet to the batch's tail (upstream end) and head (downstream end)
+            tail = injected - end
+            head = min(injected - start, self.line_volume_bbl)
+            if head > tail:
+                batches.append({
+                    'product': self._products[i],
+                    'volume_bbl': head - tail,
+                    'tail_milepost': float(self.milepost_at_volume(tail)),
+                    'head_milepost': float(self.milepost_at_volume(head)),
+                })
+        return batches
+
+    # Interfaces in the line at a time, from the inlet to the outlet
+    def interfaces(self, time=None):
+        batches = self.contents(time)
+        return [{'milepost': upstream['head_milepost'], 'upstream': upstream['product'],
+                 'downstream': downstream['product']}
+                for upstream, downstream in zip(batches, batches[1:])]
+
+    # Milepost of every interface at each of the given times; NaN where an interface is not in the line.
+    # Rows are batch starts (the interface at the tail of each batch), columns are times.
+    def interface_history(self, times):
+        injected = np.array([self.injected_at(t) for t in times])
+        distance = injected[None, :] - np.asarray(self._starts)[:, None]
+        inside = (distance > 0) & (distance < self.line_volume_bbl)
+        mileposts = self.milepost_at_volume(np.clip(distance, 0, self.line_volume_bbl))
+        return np.where(inside, mileposts, np.nan)
+
+    @property
+    def products(self):
+        return list(self._products)
@@ -0,0 +1,198 @@
+# Per-callback latency instrumentation with a Prometheus-format /metrics endpoint.
+# instrument(app) must run before any callbacks are registered: it wraps app.callback so every server
+# callback records its call count, error count, latency histogram and response payload size.
+# The cost per call is two perf_counter reads and a short locked update.
+#
+# Optional cProfile sampling, for finding out why a callback is slow in production:
+#   HYDRAULIC_PROFILE_SAMPLE_RATE   fraction of callback calls to profile (e.g. 0.01); off when unset or 0
+#   HYDRAULIC_PROFILE_DIR           where the slowest sampled calls are dumped as .prof files
+#                                   (default: hydraulic-profiles in the system temp directory)
+#   HYDRAULIC_PROFILE_KEEP          how many of the slowest profiles to keep (default 20)
+# Open a dump with: python -m pstats <file>.prof
+
+import bisect
+import cProfile
+import functools
+import heapq
+import os
+import random
+import tempfile
+import threading
+import time
+
+from flask import Response, g, has_request_context
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class CallbackStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+
+
+class Metrics:
+    def __init__(self):
+        self.callbacks = {}
+        # Callables returning {metric name: (type, help, value)} for gauges/counters owned elsewhere
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def _stats(self, name):
+        stats = self.callbacks.get(name)
+        if stats is None:
+            stats = self.callbacks.setdefault(name, CallbackStats())
+        return stats
+
+    def record_call(self, name, seconds, failed):
+        with self._lock:
+            stats = self._stats(name)
+            stats.calls += 1
+            stats.errors += failed
+            stats.latency.observe(seconds)
+
+    def record_response(self, name, size):
+        with self._lock:
+            self._stats(name).response_bytes.observe(size)
+
+    # Everything in the Prometheus text exposition format
+    def render(self):
+        lines = []
+        with self._lock:
+            callbacks = sorted(self.callbacks.items())
+            lines += ['# HELP hydraulic_callback_calls_total Server callback calls.',
+                      '# TYPE hydraulic_callback_calls_total counter']
+            lines += [f'hydraulic_callback_calls_total{{callback="{name}"}} {s.calls}' for name, s in callbacks]
+            lines += ['# HELP hydraulic_callback_errors_total Server callback calls that raised.',
+                      '# TYPE hydraulic_callback_errors_total counter']
+            lines += [f'hydraulic_callback_errors_total{{callback="{name}"}} {s.errors}' for name, s in callbacks]
+            lines += ['# HELP hydraulic_callback_latency_seconds Time spent inside server callbacks.',
+                      '# TYPE hydraulic_callback_latency_seconds histogram']
+            for name, s in callbacks:
+                lines += s.latency.lines('hydraulic_callback_latency_seconds', f'callback="{name}"')
+            lines += ['# HELP hydraulic_callback_response_bytes Size of callback responses sent to the browser.',
+                      '# TYPE hydraulic_callback_response_bytes histogram']
+            for name, s in callbacks:
+                lines += s.response_bytes.lines('hydraulic_callback_response_bytes', f'callback="{name}"')
+        for collect in self.collectors:
+            for name, (metric_type, help_text, value) in collect().items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+class Profiler:
+    def __init__(self, sample_rate, directory, keep):
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.keep = keep
+        self._slowest = []  # min-heap of (seconds, path)
+        self._heap_lock = threading.Lock()
+        # Only one cProfile session can be active at a time, so concurrent samples are skipped
+        self._active = threading.Lock()
+
+    def call(self, name, func, args, kwargs):
+        if random.random() >= self.sample_rate or not self._active.acquire(blocking=False):
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._active.release()
+            self._keep_if_slow(name, time.perf_counter() - start, profile)
+
+    def _keep_if_slow(self, name, seconds, profile):
+        with self._heap_lock:
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return
+            path = os.path.join(self.directory, f'{name}-{seconds * 1000:.1f}ms-{time.time_ns()}.prof')
+            profile.dump_stats(path)
+            heapq.heappush(self._slowest, (seconds, path))
+            if len(self._slowest) > self.keep:
+                _, evicted = heapq.heappop(self._slowest)
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
+
+
+def _profiler_from_environment():
+    sample_rate = float(os.environ.get('HYDRAULIC_PROFILE_SAMPLE_RATE') or 0)
+    if sample_rate <= 0:
+        return None
+    directory = os.environ.get('HYDRAULIC_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'hydraulic-profiles')
+    os.makedirs(directory, exist_ok=True)
+    return Profiler(sample_rate, directory, int(os.environ.get('HYDRAULIC_PROFILE_KEEP') or 20))
+
+
+metrics = Metrics()
+
+
+# Wrap app.callback so every callback registered from here on is measured, and serve /metrics
+def instrument(app):
+    profiler = _profiler_from_environment()
+    register_callback = app.callback
+
+    def instrumented(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if has_request_context():
+                g.hydraulic_callback = name
+            start = time.perf_counter()
+            failed = True
+            try:
+                if profiler is None:
+                    result = func(*args, **kwargs)
+                else:
+                    result = profiler.call(name, func, args, kwargs)
+                failed = False
+                return result
+            finally:
+                metrics.record_call(name, time.perf_counter() - start, failed)
+        return wrapper
+
+    @functools.wraps(register_callback)
+    def callback(*args, **kwargs):
+        register = register_callback(*args, **kwargs)
+        return lambda func: register(instrumented(func))
+
+    app.callback = callback
+
+    @app.server.after_request
+    def record_response_size(response):
+        name = g.get('hydraulic_callback')
+        if name is not None and response.content_length is not None:
+            metrics.record_response(name, response.content_length)
+        return response
+
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    app.server.add_url_rule('/metrics', 'metrics', metrics_endpoint)
+    return metrics
@@ -0,0 +1,162 @@
+# Steady-state flows and pressures in a looped pipeline network.
+# Nodes are numbered 0..N-1; every pipe joins a from_node to a to_node (positive flow runs from -> to).
+# Nodes with a fixed pressure (supply points, tanks, held delivery pressures) are boundary conditions; every
+# other node has a demand in bpd (negative for an injection).
+# Solved with the global gradient method (Todini-Pilati): Newton's method on pipe flows and node heads
+# together, where each iteration is one sparse symmetric solve for the node heads,
+#   (A^T D^-1 A) H = A^T Q - q - A^T D^-1 (h(Q) + A0 H0)
+# followed by a closed-form update of every pipe flow. A is the pipe-node incidence matrix restricted to the
+# free nodes, h(Q) the friction loss of each pipe (the project's correlations, vectorized over all pipes) and
+# D its derivative. Heads are piezometric pressures in psi (pressure plus elevation as psi of the fluid).
+# Iterations are a few sparse factorizations, so networks of 10^5 pipes solve in seconds, and a solve started
+# from the previous solution (only demands changed) needs only a couple of them.
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu
+
+import hydraulics
+import units
+
+# Laminar friction (64/Re) can take over below this Reynolds number, which keeps the loss and its derivative
+# finite for pipes carrying almost nothing
+LAMINAR_REYNOLDS = 2000
+# Flows below this (bpd) are treated as laminar-linear, so a pipe with no flow has a usable derivative
+MIN_FLOW_BPD = 1e-3
+
+
+class Network:
+    # from_node, to_node, length_mi and inner_diameter_in are per pipe; node_elevation_ft and
+    # fixed_pressure_psi are per node, with fixed_pressure_psi NaN at nodes whose pressure is solved for.
+    # roughness_ft may be per pipe; the fluid properties apply to the whole network.
+    def __init__(self, from_node, to_node, length_mi, inner_diameter_in, node_elevation_ft, fixed_pressure_psi,
+                 roughness_ft, viscosity_cst, specific_gravity, drag_reduction=0.0, method='Colebrook-White'):
+        self.from_node = np.asarray(from_node, dtype=np.intp)
+        self.to_node = np.asarray(to_node, dtype=np.intp)
+        pipes = self.from_node.size
+        self.length_mi, self.inner_diameter_in, self.roughness_ft = (
+            np.broadcast_to(np.asarray(v, dtype=float), (pipes,)).copy()
+            for v in (length_mi, inner_diameter_in, roughness_ft))
+        self.node_elevation_ft = np.asarray(node_elevation_ft, dtype=float)
+        self.fixed_pressure_psi = np.asarray(fixed_pressure_psi, dtype=float)
+        nodes = self.node_elevation_ft.size
+        if self.to_node.shape != self.from_node.shape or self.fixed_pressure_psi.shape != (nodes,):
+            raise ValueError('Every pipe needs a from and to node, and every node an elevation and fixed pressure')
+        if pipes == 0:
+            raise ValueError('The network has no pipes')
+        if self.from_node.min() < 0 or max(self.from_node.max(), self.to_node.max()) >= nodes:
+            raise ValueError(f'Pipe ends must be node numbers from 0 to {nodes - 1}')
+        if np.any(self.from_node == self.to_node):
+            raise ValueError('A pipe must join two different nodes')
+        if np.any(self.length_mi <= 0) or np.any(self.inner_diameter_in <= 0):
+            raise ValueError('Pipe lengths and diameters must be positive')
+        self.viscosity_cst = float(viscosity_cst)
+        self.specific_gravity = float(specific_gravity)
+        self.drag_reduction = float(drag_reduction)
+        self.method = method
+        self.pipes, self.nodes = pipes, nodes
+
+        self.fixed = ~np.isnan(self.fixed_pressure_psi)
+        if not self.fixed.any():
+            raise ValueError('At least one node needs a fixed pressure')
+        # Every connected part of the network needs a fixed pressure, or its heads are undetermined
+        graph = sp.coo_matrix((np.ones(pipes), (self.from_node, self.to_node)), shape=(nodes, nodes))
+        _, component = connected_components(graph, directed=False)
+        if not np.isin(component, component[self.fixed]).all():
+            raise ValueError('Every part of the network must connect to a node with a fixed pressure')
+
+        # Incidence of each pipe on the free nodes: -1 at its from end, +1 at its to end
+        free_index = np.full(nodes, -1, dtype=np.intp)
+        free_index[~self.fixed] = np.arange(np.count_nonzero(~self.fixed))
+        ends = np.concatenate([self.from_node, self.to_node])
+        rows = np.tile(np.arange(pipes), 2)
+        signs = np.concatenate([-np.ones(pipes), np.ones(pipes)])
+        free = free_index[ends] >= 0
+        self._incidence = sp.csr_matrix((signs[free], (rows[free], free_index[ends][free])),
+                                        shape=(pipes, np.count_nonzero(~self.fixed)))
+        self._incidence_t = self._incidence.T.tocsr()
+        self._free_index = free_index
+        self._psi_per_ft = self.specific_gravity / hydraulics.FT_HEAD_PER_PSI
+        self._last = None
+
+    # Friction loss (psi, signed like the flow) and its derivative with respect to flow for every pipe
+    def _losses(self, flow_bpd):
+        magnitude = np.maximum(np.abs(flow_bpd), MIN_FLOW_BPD)
+        velocity_fps = hydraulics.flow_velocity_fps(self.inner_diameter_in, magnitude)
+        reynolds = hydraulics.reynolds_number(self.inner_diameter_in, magnitude, self.viscosity_cst)
+        # The correlations can fail (NaN) deep in laminar flow, where they are replaced below
+        with np.errstate(invalid='ignore', divide='ignore'):
+            factors, _ = hydraulics.friction_factors(reynolds, self.roughness_ft, self.inner_diameter_in / 12,
+                                                     methods=(self.method,))
+        # Laminar friction where it exceeds the correlation (or the correlation has no solution), which keeps the
+        # friction factor continuous
+        laminar = (reynolds < LAMINAR_REYNOLDS) & ~(factors[self.method] >= 64 / reynolds)
+        friction_factor = np.where(laminar, 64 / reynolds, factors[self.method])
+        loss_psi = hydraulics.pressure_loss_psi_per_mile(friction_factor, self.inner_diameter_in, velocity_fps,
+                                                         self.specific_gravity, self.drag_reduction) * self.length_mi
+        # Loss goes as flow^n: n = 1 when laminar; when turbulent, differentiating Colebrook-White
+        # x + 2 log10(e/3.7D + 2.51 x/Re) = 0 (x = 1/sqrt(f)) gives n = 2 / (1 + c) with
+        # c = 2 (2.51/Re) / (ln 10 (e/3.7D + 2.51 x/Re)): 2 in fully rough flow, less in smoother pipe
+        smooth_term = 2.51 / reynolds
+        c = 2 * smooth_term / (np.log(10) * (self.roughness_ft / self.inner_diameter_in * 12 / 3.7
+                                              + smooth_term / np.sqrt(friction_factor)))
+        derivative = np.where(laminar, 1.0, 2.0 / (1.0 + c)) * loss_psi / magnitude
+        # Below MIN_FLOW_BPD the loss is carried linearly down to zero
+        loss_psi = np.sign(flow_bpd) * loss_psi * np.abs(flow_bpd) / magnitude
+        return loss_psi, derivative
+
+    # Solve for the given node demands (bpd; ignored at fixed-pressure nodes).
+    # Starts from initial (a previous result) if given, otherwise from this network's last solution when
+    # warm_start is set, otherwise from 1 ft/s in every pipe. Stops when the flows change by less than tol
+    # relative to the total flow.
+    def solve(self, demand_bpd=0.0, initial=None, warm_start=True, tol=1e-8, max_iterations=50):
+        demand = np.broadcast_to(np.asarray(demand_bpd, dtype=float), (self.nodes,))
+        free_demand = demand[~self.fixed]
+        fixed_head = np.where(self.fixed, self.fixed_pressure_psi + self.node_elevation_ft * self._psi_per_ft, 0.0)
+        # A0 H0: the fixed heads at each pipe's ends, to-end minus from-end
+        fixed_term = (np.where(self.fixed[self.to_node], fixed_head[self.to_node], 0.0)
+                      - np.where(self.fixed[self.from_node], fixed_head[self.from_node], 0.0))
+
+        if initial is None and warm_start:
+            initial = self._last
+        if initial is not None:
+            flow = np.array(initial['flow_bpd'], dtype=float)
+        else:
+            area_sqft = np.pi * (self.inner_diameter_in / 24) ** 2
+            flow = units.convert(area_sqft, 'cfs', 'bpd')
+
+        converged = False
+        for iteration in range(1, max_iterations + 1):
+            loss, derivative = self._losses(flow)
+            inverse = 1.0 / derivative
+            laplacian = (self._incidence_t @ sp.diags(inverse) @ self._incidence).tocsc()
+            rhs = self._incidence_t @ (flow - inverse * (loss + fixed_term)) - free_demand
+            head = splu(laplacian, permc_spec='MMD_AT_PLUS_A').solve(rhs)
+            new_flow = flow - inverse * (loss + self._incidence @ head + fixed_term)
+            change = np.abs(new_flow - flow).sum() / max(np.abs(new_flow).sum(), MIN_FLOW_BPD)
+            flow = new_flow
+            if change < tol:
+                converged = True
+                break
+
+        loss, _ = self._losses(flow)
+        node_head = fixed_head.copy()
+        node_head[~self.fixed] = head
+        # Net flow out of the network at each node; at fixed-pressure nodes this is minus their supply
+        outflow = (np.bincount(self.to_node, flow, self.nodes) - np.bincount(self.from_node, flow, self.nodes))
+        result = {
+            'flow_bpd': flow,
+            'velocity_fps': hydraulics.flow_velocity_fps(self.inner_diameter_in, flow),
+            'friction_loss_psi': loss,
+            'pressure_psi': node_head - self.node_elevation_ft * self._psi_per_ft,
+            'hydraulic_grade_ft': node_head / self._psi_per_ft,
+            'supply_bpd': np.where(self.fixed, -outflow, 0.0),
+            'iterations': iteration,
+            'converged': converged,
+            # Largest mass imbalance at a free node, bpd
+            'imbalance_bpd': float(np.abs(outflow - demand)[~self.fixed].max(initial=0.0)),
+        }
+        if converged:
+            self._last = result
+        return result
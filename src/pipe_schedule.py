@@ -0,0 +1,125 @@
+# Pipe schedule data: outside diameter and wall thickness by nominal pipe size (NPS) and schedule.
+# Stored as dense NumPy arrays (rows = NPS, columns = schedule) with index maps, so a single lookup is two
+# dict hits and a lookup for an array of pipes is one fancy-indexing gather.
+# Outside diameters are the standard ones: NPS 14 and up have an OD equal to the NPS.
+
+import numpy as np
+
+SCHEDULES = ('STD', '40', 'XS', 'XXS')
+
+# NPS (in), outside diameter (in), and wall thickness (in) per schedule; None where a size isn't made
+_DATA = [
+    (1, 1.315, (0.133, 0.133, 0.179, 0.358)),
+    (2, 2.375, (0.154, 0.154, 0.218, 0.436)),
+    (3, 3.500, (0.216, 0.216, 0.300, 0.600)),
+    (4, 4.500, (0.237, 0.237, 0.337, 0.674)),
+    (6, 6.625, (0.280, 0.280, 0.432, 0.864)),
+    (8, 8.625, (0.322, 0.322, 0.500, 0.875)),
+    (10, 10.750, (0.365, 0.365, 0.500, 1.000)),
+    (12, 12.750, (0.375, 0.406, 0.500, 1.000)),
+    (14, 14.000, (0.375, 0.438, 0.500, None)),
+    (16, 16.000, (0.375, 0.500, 0.500, None)),
+    (18, 18.000, (0.375, 0.562, 0.500, None)),
+    (20, 20.000, (0.375, 0.594, 0.500, None)),
+    (22, 22.000, (0.375, None, 0.500, None)),
+    (24, 24.000, (0.375, 0.688, 0.500, None)),
+    (30, 30.000, (0.375, None, 0.500, None)),
+    (32, 32.000, (0.375, 0.688, None, None)),
+    (34, 34.000, (0.375, 0.688, None, None)),
+    (36, 36.000, (0.375, 0.750, None, None)),
+    (42, 42.000, (0.375, 0.750, None, None)),
+]
+
+NPS = np.array([row[0] for row in _DATA], dtype=float)
+OUTSIDE_DIAMETER_IN = np.array([row[1] for row in _DATA])
+WALL_THICKNESS_IN = np.array([[np.nan if wall is None else wall for wall in row[2]] for row in _DATA])
+INSIDE_DIAMETER_IN = OUTSIDE_DIAMETER_IN[:, None] - 2 * WALL_THICKNESS_IN
+
+NPS_INDEX = {nps: i for i, nps in enumerate(NPS.tolist())}
+SCHEDULE_INDEX = {schedule: j for j, schedule in enumerate(SCHEDULES)}
+_ROW_BY_NPS = np.full(int(NPS.max()) + 1, -1, dtype=np.intp)
+_ROW_BY_NPS[NPS.astype(np.intp)] = np.arange(len(NPS))
+
+
+# Accepts 12, 12.0, "12" or '12"'
+def normalize_nps(nps):
+    return float(str(nps).strip().rstrip('"').strip())
+
+
+# Accepts "std", "40", 40, "Sch 40"
+def normalize_schedule(schedule):
+    schedule = str(schedule).strip().upper()
+    if schedule.startswith('SCH'):
+        schedule = schedule[3:].strip()
+    return schedule
+
+
+def _index(nps, schedule):
+    try:
+        i = NPS_INDEX[normalize_nps(nps)]
+        j = SCHEDULE_INDEX[normalize_schedule(schedule)]
+    except (KeyError, ValueError):
+        raise ValueError(f'No pipe data for NPS {nps} schedule {schedule}')
+    if np.isnan(WALL_THICKNESS_IN[i, j]):
+        raise ValueError(f'NPS {nps} is not made in schedule {schedule}')
+    return i, j
+
+
+# Outside diameter, wall thickness and inside diameter (in) for one pipe
+def lookup(nps, schedule):
+    i, j = _index(nps, schedule)
+    return {
+        'outside_diameter_in': float(OUTSIDE_DIAMETER_IN[i]),
+        'wall_thickness_in': float(WALL_THICKNESS_IN[i, j]),
+        'inside_diameter_in': float(INSIDE_DIAMETER_IN[i, j]),
+    }
+
+
+# Vectorized lookup for arrays of pipes: returns (outside diameter, wall thickness, inside diameter) arrays.
+# Numeric NPS values map to rows through a dense index array; each distinct schedule is resolved once.
+def gather(nps, schedule):
+    nps, schedule = np.broadcast_arrays(np.asarray(nps), np.asarray(schedule))
+    rows = _nps_rows(nps)
+    if (rows < 0).any():
+        raise ValueError(f'Unknown NPS: {nps.ravel()[np.flatnonzero(rows < 0)[0]]}')
+    schedule_values, schedule_inverse = np.unique(schedule.astype(str), return_inverse=True)
+    try:
+        cols = np.array([SCHEDULE_INDEX[normalize_schedule(value)] for value in schedule_values],
+                        dtype=np.intp)[schedule_inverse].reshape(rows.shape)
+    except KeyError:
+        raise ValueError(f'Unknown schedule in: {", ".join(schedule_values)}')
+    wall = WALL_THICKNESS_IN[rows, cols]
+    if np.isnan(wall).any():
+        bad = np.flatnonzero(np.isnan(wall))[0]
+        raise ValueError(f'NPS {nps.ravel()[bad]} is not made in schedule {schedule.ravel()[bad]}')
+    return OUTSIDE_DIAMETER_IN[rows], wall, INSIDE_DIAMETER_IN[rows, cols]
+
+
+# Row index for every NPS value, -1 where there's no such size
+def _nps_rows(nps):
+    if nps.dtype.kind not in 'iuf':
+        values, inverse = np.unique(nps.astype(str), return_inverse=True)
+        numeric = np.array([_try_nps(value) for value in values])
+        return _nps_rows(numeric)[inverse].reshape(nps.shape)
+    whole = np.round(nps)
+    with np.errstate(invalid='ignore'):
+        valid = (whole == nps) & (whole >= 0) & (whole < len(_ROW_BY_NPS))
+    return np.where(valid, _ROW_BY_NPS[np.where(valid, whole, 0).astype(np.intp)], -1)
+
+
+def _try_nps(value):
+    try:
+        return normalize_nps(value)
+    except ValueError:
+        return np.nan
+
+
+# Schedules available for one NPS, in display order
+def schedules_for(nps):
+    i = NPS_INDEX[normalize_nps(nps)]
+    return [schedule for j, schedule in enumerate(SCHEDULES) if not np.isnan(WALL_THICKNESS_IN[i, j])]
+
+
+# NPS labels as shown in the UI, e.g. '12"'
+def nps_label(nps):
+    return f'{nps:g}"'
@@ -0,0 +1,65 @@
+# Multi-segment pipeline hydraulic profile.
+# A line is a table of segments in flow order, each with its own length, outside diameter, wall thickness
+# and end elevation. All per-segment math is done on whole arrays, and the march along the line is a
+# cumulative sum, so a survey-sized line of 10,000+ segments computes in milliseconds.
+
+import numpy as np
+
+import hydraulics
+
+# Segment table columns, in the order the page and CSV files use them
+SEGMENT_COLUMNS = ('length_mi', 'od_in', 'wall_in', 'elevation_ft')
+
+
+# Steady-state profile for one flow rate through a segmented line.
+# length_mi, od_in, wall_in and elevation_ft are per-segment arrays (elevation at the end of each segment);
+# inlet_elevation_ft and inlet_pressure_psi describe the start of the line.
+# Returns per-segment arrays plus line totals; pressures are in psi, heads in feet.
+def hydraulic_profile(length_mi, od_in, wall_in, elevation_ft, flow_rate_bpd, roughness_ft, viscosity_cst,
+                      specific_gravity, drag_reduction=0.0, inlet_elevation_ft=0.0, inlet_pressure_psi=0.0,
+                      method='Colebrook-White'):
+    length_mi, od_in, wall_in, elevation_ft = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(v, dtype=float)) for v in (length_mi, od_in, wall_in, elevation_ft)))
+    inner_diameter_in = od_in - 2 * wall_in
+    if np.any(inner_diameter_in <= 0):
+        raise ValueError('Wall thickness must be less than half the outside diameter')
+
+    # Friction loss for every segment in one vectorized call
+    flow = hydraulics.friction_pressure_loss(inner_diameter_in, flow_rate_bpd, roughness_ft, viscosity_cst,
+                                             specific_gravity, drag_reduction, methods=(method,))
+    friction_loss_psi = flow['pressure_loss_psi_per_mile'][method] * length_mi
+
+    # Static head from elevation change over each segment
+    start_elevation_ft = np.concatenate([[inlet_elevation_ft], elevation_ft[:-1]])
+    static_head_psi = (elevation_ft - start_elevation_ft) * specific_gravity / hydraulics.FT_HEAD_PER_PSI
+
+    # Line fill per segment
+    _, line_fill_bbl = hydraulics.pipe_volume(inner_diameter_in, length_mi)
+
+    # March along the line
+    milepost_end = np.cumsum(length_mi)
+    cumulative_friction_psi = np.cumsum(friction_loss_psi)
+    cumulative_static_psi = np.cumsum(static_head_psi)
+    pressure_psi = inlet_pressure_psi - cumulative_friction_psi - cumulative_static_psi
+    # Hydraulic grade line: elevation plus pressure head of the fluid
+    hydraulic_grade_ft = elevation_ft + pressure_psi * hydraulics.FT_HEAD_PER_PSI / specific_gravity
+
+    return {
+        'milepost_start': milepost_end - length_mi,
+        'milepost_end': milepost_end,
+        'inner_diameter_in': inner_diameter_in,
+        'velocity_fps': flow['velocity_fps'],
+        'reynolds_number': flow['reynolds_number'],
+        'friction_factor': flow['friction_factors'][method],
+        'friction_loss_psi': friction_loss_psi,
+        'static_head_psi': static_head_psi,
+        'cumulative_friction_psi': cumulative_friction_psi,
+        'pressure_psi': pressure_psi,
+        'hydraulic_grade_ft': hydraulic_grade_ft,
+        'line_fill_bbl': line_fill_bbl,
+        'cumulative_line_fill_bbl': np.cumsum(line_fill_bbl),
+        'total_length_mi': float(milepost_end[-1]) if milepost_end.size else 0.0,
+        'total_friction_psi': float(cumulative_friction_psi[-1]) if milepost_end.size else 0.0,
+        'total_static_psi': float(cumulative_static_psi[-1]) if milepost_end.size else 0.0,
+        'total_line_fill_bbl': float(line_fill_bbl.sum()),
+    }
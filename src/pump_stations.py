@@ -0,0 +1,131 @@
+# Pump station count and placement along a line.
+# Every station discharges at MAOP, and the next one goes where the pressure, falling along the hydraulic
+# gradient (friction plus elevation), reaches the minimum suction pressure. Putting each station as far
+# downstream as the suction limit allows gives the fewest stations for a design.
+# All design alternatives (flow rate x pipe size) are handled at once: the loss model is one vectorized
+# friction_pressure_loss call, and each placement step works on a designs x survey points array, so the loop
+# only runs once per station rather than once per design.
+
+import numpy as np
+
+import hydraulics
+
+MAX_STATIONS = 40
+
+
+# Station mileposts for designs with the given pressure gradients (psi/mile) along one elevation profile.
+# milepost and elevation_ft are survey points in flow order (the line starts at milepost[0]); elevation is
+# linear between them. gradient_psi_per_mile and specific_gravity are per design.
+# Returns per-design arrays; station_milepost is padded with NaN past each design's station count.
+def place_stations(milepost, elevation_ft, gradient_psi_per_mile, maop_psi, min_suction_psi, specific_gravity,
+                   max_stations=MAX_STATIONS):
+    x = np.asarray(milepost, dtype=float)
+    z = np.asarray(elevation_ft, dtype=float)
+    if x.ndim != 1 or x.size < 2 or x.shape != z.shape:
+        raise ValueError('The elevation profile needs at least two points')
+    if np.any(np.diff(x) <= 0):
+        raise ValueError('Profile mileposts must be increasing')
+    gradient, specific_gravity = np.broadcast_arrays(np.atleast_1d(np.asarray(gradient_psi_per_mile, dtype=float)),
+                                                     np.asarray(specific_gravity, dtype=float))
+    psi_per_ft = specific_gravity / hydraulics.FT_HEAD_PER_PSI
+    designs, points = gradient.size, x.size
+
+    position = np.full(designs, x[0])
+    station_elevation = np.full(designs, z[0])
+    station_milepost = np.full((designs, max_stations), np.nan)
+    station_milepost[:, 0] = x[0]
+    station_count = np.ones(designs, dtype=int)
+    max_pressure = np.full(designs, float(maop_psi))
+    delivery_pressure = np.full(designs, np.nan)
+    feasible = np.ones(designs, dtype=bool)
+    active = np.ones(designs, dtype=bool)
+
+    for k in range(1, max_stations):
+        rows = np.flatnonzero(active)
+        if rows.size == 0:
+            break
+        # Pressure everywhere on the line if the last station placed kept pushing
+        pressure = (maop_psi - gradient[rows, None] * (x - position[rows, None])
+                    - (z - station_elevation[rows, None]) * psi_per_ft[rows, None])
+        downstream = x > position[rows, None]
+        low = downstream & (pressure < min_suction_psi)
+        reaches_end = ~low.any(axis=1)
+        first_low = np.where(reaches_end, points, low.argmax(axis=1))
+
+        in_leg = downstream & (np.arange(points) < first_low[:, None])
+        max_pressure[rows] = np.maximum(max_pressure[rows], np.where(in_leg, pressure, -np.inf).max(axis=1))
+
+        done = rows[reaches_end]
+        delivery_pressure[done] = pressure[reaches_end, -1]
+        active[done] = False
+
+        # The next station goes where the pressure crosses the suction limit; pressure is linear between points
+        crossing = np.flatnonzero(~reaches_end)
+        r = rows[crossing]
+        i1 = first_low[crossing]
+        i0 = i1 - 1
+        from_station = x[i0] <= position[r]
+        x0 = np.where(from_station, position[r], x[i0])
+        z0 = np.where(from_station, station_elevation[r], z[i0])
+        p0 = np.where(from_station, maop_psi, pressure[crossing, i0])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (p0 - min_suction_psi) / (p0 - pressure[crossing, i1])
+        new_position = x0 + t * (x[i1] - x0)
+
+        # No progress: the suction limit is above MAOP, or a climb is too steep for one station
+        stuck = ~(new_position > position[r])
+        feasible[r[stuck]] = False
+        active[r[stuck]] = False
+        moved = r[~stuck]
+        position[moved] = new_position[~stuck]
+        station_elevation[moved] = (z0 + t * (z[i1] - z0))[~stuck]
+        station_milepost[moved, k] = position[moved]
+        station_count[moved] += 1
+
+    # Designs still marching have run out of stations
+    feasible[active] = False
+
+    return {
+        'station_count': station_count,
+        'station_milepost': station_milepost,
+        'feasible': feasible,
+        'max_pressure_psi': max_pressure,
+        'exceeds_maop': max_pressure > maop_psi + 1e-9,
+        'delivery_pressure_psi': delivery_pressure,
+    }
+
+
+# Stations needed for every combination of flow rate and pipe size.
+# flow_rates_bpd is a 1-D array of candidates; od_in and wall_in are 1-D arrays describing the candidate pipes.
+# Results are arrays shaped (flow rates, pipe sizes), plus station_milepost with a trailing station axis.
+def optimize_stations(milepost, elevation_ft, flow_rates_bpd, od_in, wall_in, maop_psi, min_suction_psi,
+                      roughness_ft, viscosity_cst, specific_gravity, drag_reduction=0.0, method='Colebrook-White',
+                      max_stations=MAX_STATIONS):
+    flow_rates_bpd = np.atleast_1d(np.asarray(flow_rates_bpd, dtype=float))
+    inner_diameter_in = np.atleast_1d(np.asarray(od_in, dtype=float) - 2 * np.asarray(wall_in, dtype=float))
+    if np.any(inner_diameter_in <= 0):
+        raise ValueError('Wall thickness must be less than half the outside diameter')
+    shape = (flow_rates_bpd.size, inner_diameter_in.size)
+
+    # Loss model for the whole design grid in one call
+    flow = hydraulics.friction_pressure_loss(inner_diameter_in[None, :], flow_rates_bpd[:, None], roughness_ft,
+                                             viscosity_cst, specific_gravity, drag_reduction, methods=(method,))
+    gradient = np.broadcast_to(flow['pressure_loss_psi_per_mile'][method], shape)
+
+    placement = place_stations(milepost, elevation_ft, gradient.ravel(), maop_psi, min_suction_psi,
+                               specific_gravity, max_stations)
+    station_count = placement['station_count'].reshape(shape)
+    station_hhp = flow_rates_bpd[:, None] * (maop_psi - min_suction_psi) * hydraulics.HHP_PER_BPD_PSI
+    return {
+        'flow_rate_bpd': np.broadcast_to(flow_rates_bpd[:, None], shape),
+        'inner_diameter_in': np.broadcast_to(inner_diameter_in[None, :], shape),
+        'velocity_fps': np.broadcast_to(flow['velocity_fps'], shape),
+        'gradient_psi_per_mile': gradient,
+        'station_count': station_count,
+        'station_milepost': placement['station_milepost'].reshape(shape + (max_stations,)),
+        'feasible': placement['feasible'].reshape(shape),
+        'exceeds_maop': placement['exceeds_maop'].reshape(shape),
+        'delivery_pressure_psi': placement['delivery_pressure_psi'].reshape(shape),
+        # Installed hydraulic horsepower with every station boosting from minimum suction to MAOP
+        'total_hhp': np.where(placement['feasible'].reshape(shape), station_count * station_hhp, np.nan),
+    }
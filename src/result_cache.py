@@ -0,0 +1,206 @@
+# Bounded result cache for the calculator callbacks: in memory for a single process (ResultCache) or in a
+# SQLite file shared by several worker processes (DiskResultCache).
+# Entries are evicted least-recently-used first once either the entry count or the total
+# (pickled) size limit is exceeded, and expire after ttl_seconds regardless of use.
+#   HYDRAULIC_RESULT_CACHE_PATH      use a DiskResultCache in this file (see cache_from_environment)
+#   HYDRAULIC_RESULT_CACHE_ENTRIES   entry limit of the shared cache (default 8x the in-memory one)
+#   HYDRAULIC_RESULT_CACHE_BYTES     size limit of the shared cache (default 8x the in-memory one)
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    def __init__(self, max_entries=512, max_bytes=32 * 1024 * 1024, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, size_bytes, value)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return  # Too big to ever fit; don't flush the whole cache for it
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, value)
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    # Return the cached value for key, or compute, store and return it
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+
+# The same cache kept in a SQLite file, for running several worker processes (see gunicorn.conf.py).
+# Every worker opens the same file, so a result computed by one is served to the rest and the cache's memory
+# doesn't multiply with the worker count. Keys are hashed from their pickled form; the recency used for LRU
+# eviction and the expiry times are wall-clock, since monotonic clocks aren't comparable across processes.
+# Connections are opened lazily per process and thread: the module is imported (and this object built) in
+# the gunicorn master before it forks, and a SQLite connection must not be carried across a fork.
+# hits, misses and evictions count this process only; entries and bytes describe the shared file.
+class DiskResultCache:
+    def __init__(self, path, max_entries=4096, max_bytes=256 * 1024 * 1024, ttl_seconds=3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, expires_at REAL, '
+                       'used_at REAL, size INTEGER, value BLOB)')
+            db.execute('CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at)')
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    def _db(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.db = self._connect()
+            local.pid = os.getpid()
+        return local.db
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha1(pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key, default=None):
+        digest = self._digest(key)
+        now = time.time()
+        db = self._db()
+        row = db.execute('SELECT expires_at, value FROM entries WHERE key = ?', (digest,)).fetchone()
+        if row is None or row[0] < now:
+            self._count('misses')
+            return default
+        db.execute('UPDATE entries SET used_at = ? WHERE key = ?', (now, digest))
+        self._count('hits')
+        return pickle.loads(row[1])
+
+    def set(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return  # Too big to ever fit; don't flush the whole cache for it
+        now = time.time()
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                       (self._digest(key), now + self.ttl_seconds, now, len(data), data))
+            db.execute('DELETE FROM entries WHERE expires_at < ?', (now,))
+            count, total = db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            evicted = []
+            if count > self.max_entries or total > self.max_bytes:
+                for oldest, size in db.execute('SELECT key, size FROM entries ORDER BY used_at'):
+                    if count <= self.max_entries and total <= self.max_bytes:
+                        break
+                    evicted.append((oldest,))
+                    count -= 1
+                    total -= size
+                db.executemany('DELETE FROM entries WHERE key = ?', evicted)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self.evictions += len(evicted)
+
+    # Return the cached value for key, or compute, store and return it
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        self._db().execute('DELETE FROM entries')
+
+    def stats(self):
+        entries, total = self._db().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': total,
+            }
+
+
+# ResultCache, or a DiskResultCache when HYDRAULIC_RESULT_CACHE_PATH names a file shared by the workers
+def cache_from_environment(max_entries, max_bytes, ttl_seconds):
+    path = os.environ.get('HYDRAULIC_RESULT_CACHE_PATH')
+    if not path:
+        return ResultCache(max_entries, max_bytes, ttl_seconds)
+    return DiskResultCache(path,
+                           int(os.environ.get('HYDRAULIC_RESULT_CACHE_ENTRIES') or max_entries * 8),
+                           int(os.environ.get('HYDRAULIC_RESULT_CACHE_BYTES') or max_bytes * 8),
+                           ttl_seconds)
@@ -0,0 +1,154 @@
+# Thermal-hydraulic marching along a buried or insulated line.
+# Crude viscosity follows the ASTM D341 (Walther) relation log log Z = A - B log T (T absolute), fitted
+# through two reference points per crude. Fits are cached per crude (its reference points), so a seasonal
+# study over many crudes fits each one once however many cases use it.
+# The line is marched segment by segment: each step cools the fluid towards the ground temperature
+# (exact exponential decay over the segment for a constant heat transfer coefficient, with the friction
+# heat as a source), updates viscosity, Reynolds number and friction factor at the segment's mean
+# temperature, and adds the segment's pressure loss. Every step works on whole arrays of cases, so the
+# loop runs once per segment, not once per segment per case.
+
+from functools import cache
+
+import numpy as np
+
+import hydraulics
+import units
+
+# Heat released by a pressure drop across a volume of flow, and water density consistent with 2.31 ft/psi
+BTU_PER_PSI_FT3 = units.factor('psi*ft3', 'BTU')
+WATER_LB_PER_FT3 = units.factor('ftH2O', 'psf')
+SPECIFIC_HEAT_BTU_LB_F = 0.45  # Typical for crude oil
+LAMINAR_REYNOLDS = 2000
+MAX_SEGMENTS = 10_000
+
+
+# ASTM D341 Z from kinematic viscosity (cSt), with the low-viscosity correction so the fit holds below 2 cSt
+def _walther_z(viscosity_cst):
+    nu = np.asarray(viscosity_cst, dtype=float)
+    return nu + 0.7 + np.exp(-1.47 - 1.84 * nu - 0.51 * nu ** 2)
+
+
+def _walther_viscosity(z):
+    w = z - 0.7
+    return w - np.exp(-0.7487 - 3.295 * w + 0.6119 * w ** 2 - 0.3193 * w ** 3)
+
+
+# Walther constants (A, B) through two (temperature °F, viscosity cSt) points. Broadcasts.
+def fit_walther(temperature_1_f, viscosity_1_cst, temperature_2_f, viscosity_2_cst):
+    t1, nu1, t2, nu2 = (np.asarray(v, dtype=float) for v in (temperature_1_f, viscosity_1_cst, temperature_2_f,
+                                                              viscosity_2_cst))
+    if np.any(t1 == t2) or np.any(nu1 <= 0) or np.any(nu2 <= 0):
+        raise ValueError('Viscosity reference points need two different temperatures and positive viscosities')
+    y1 = np.log10(np.log10(_walther_z(nu1)))
+    y2 = np.log10(np.log10(_walther_z(nu2)))
+    x1, x2 = np.log10(units.convert(t1, 'F', 'R')), np.log10(units.convert(t2, 'F', 'R'))
+    b = (y1 - y2) / (x2 - x1)
+    return y1 + b * x1, b
+
+
+# Cached fit for one crude
+@cache
+def walther_curve(temperature_1_f, viscosity_1_cst, temperature_2_f, viscosity_2_cst):
+    a, b = fit_walther(temperature_1_f, viscosity_1_cst, temperature_2_f, viscosity_2_cst)
+    return float(a), float(b)
+
+
+# Walther constants for arrays of cases, fitting each distinct crude once through the cache
+def walther_curves(temperature_1_f, viscosity_1_cst, temperature_2_f, viscosity_2_cst):
+    references = np.stack(np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (
+        temperature_1_f, viscosity_1_cst, temperature_2_f, viscosity_2_cst))), axis=-1)
+    crudes, inverse = np.unique(references.reshape(-1, 4), axis=0, return_inverse=True)
+    fits = np.array([walther_curve(*crude) for crude in crudes.tolist()]).reshape(-1, 2)
+    a, b = fits[inverse.ravel()].T
+    return a.reshape(references.shape[:-1]), b.reshape(references.shape[:-1])
+
+
+# Kinematic viscosity (cSt) at a temperature (°F) on a Walther curve
+def viscosity_at(temperature_f, a, b):
+    log_t = np.log10(units.convert(np.asarray(temperature_f, dtype=float), 'F', 'R'))
+    return _walther_viscosity(10 ** 10 ** (a - b * log_t))
+
+
+# Friction factor, with laminar 64/Re where it exceeds the correlation (heavy crude can go laminar as it cools)
+def _friction_factor(reynolds, roughness_ft, inner_diameter_in, method):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        factors, _ = hydraulics.friction_factors(reynolds, roughness_ft, inner_diameter_in / 12, methods=(method,))
+    laminar = (reynolds < LAMINAR_REYNOLDS) & ~(factors[method] >= 64 / reynolds)
+    return np.where(laminar, 64 / reynolds, factors[method])
+
+
+# March arrays of cases along lines of length_mi cut into equal segments.
+# Cases broadcast over every argument; walther_a and walther_b come from walther_curves.
+# heat_transfer is the overall coefficient in BTU/(hr ft^2 °F) on the inside pipe surface.
+# Returns profiles shaped (segments + 1, cases) at segment ends and (segments, cases) per segment, plus
+# per-case totals.
+def march(length_mi, inner_diameter_in, flow_rate_bpd, roughness_ft, specific_gravity, inlet_temperature_f,
+          ground_temperature_f, heat_transfer, walther_a, walther_b, specific_heat=SPECIFIC_HEAT_BTU_LB_F,
+          drag_reduction=0.0, segments=100, method='Colebrook-White'):
+    segments = int(segments)
+    if not 1 <= segments <= MAX_SEGMENTS:
+        raise ValueError(f'Segments must be between 1 and {MAX_SEGMENTS:,}')
+    (length_mi, inner_diameter_in, flow_rate_bpd, roughness_ft, specific_gravity, inlet_temperature_f,
+     ground_temperature_f, heat_transfer, walther_a, walther_b, specific_heat, drag_reduction) = (
+        np.atleast_1d(v) for v in np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (
+            length_mi, inner_diameter_in, flow_rate_bpd, roughness_ft, specific_gravity, inlet_temperature_f,
+            ground_temperature_f, heat_transfer, walther_a, walther_b, specific_heat, drag_reduction))))
+    if np.any(length_mi <= 0) or np.any(inner_diameter_in <= 0) or np.any(flow_rate_bpd <= 0):
+        raise ValueError('Length, diameter and flow rate must be positive')
+    if np.any(heat_transfer < 0) or np.any(specific_heat <= 0):
+        raise ValueError('Heat transfer must not be negative and specific heat must be positive')
+
+    segment_mi = length_mi / segments
+    velocity_fps = hydraulics.flow_velocity_fps(inner_diameter_in, flow_rate_bpd)
+    flow_ft3_hr = units.convert(flow_rate_bpd, 'bpd', 'ft3/hr')
+    # Heat capacity rate of the stream (BTU/hr °F) and wall conductance per segment (BTU/hr °F)
+    capacity = flow_ft3_hr * specific_gravity * WATER_LB_PER_FT3 * specific_heat
+    conductance = heat_transfer * np.pi * inner_diameter_in / 12 * segment_mi * hydraulics.FT_PER_MILE
+    decay = np.exp(-conductance / capacity)
+
+    def hydraulics_at(temperature_f):
+        viscosity = viscosity_at(temperature_f, walther_a, walther_b)
+        reynolds = hydraulics.reynolds_number(inner_diameter_in, flow_rate_bpd, viscosity)
+        friction_factor = _friction_factor(reynolds, roughness_ft, inner_diameter_in, method)
+        loss = hydraulics.pressure_loss_psi_per_mile(friction_factor, inner_diameter_in, velocity_fps,
+                                                     specific_gravity, drag_reduction) * segment_mi
+        return viscosity, reynolds, friction_factor, loss
+
+    def outlet_temperature(temperature_f, loss_psi):
+        # Friction heat (the pressure loss dissipated in the stream) raises the temperature the fluid decays to
+        heat = loss_psi * flow_ft3_hr * BTU_PER_PSI_FT3
+        with np.errstate(divide='ignore', invalid='ignore'):
+            settle = ground_temperature_f + heat / conductance
+            cooled = settle + (temperature_f - settle) * decay
+        # With no heat transfer all the friction heat stays in the stream
+        return np.where(conductance > 0, cooled, temperature_f + heat / capacity)
+
+    cases = length_mi.size
+    temperature = np.empty((segments + 1, cases))
+    viscosity = np.empty((segments, cases))
+    reynolds = np.empty((segments, cases))
+    friction_factor = np.empty((segments, cases))
+    loss = np.empty((segments, cases))
+    temperature[0] = inlet_temperature_f
+    for k in range(segments):
+        # Predict the outlet temperature from inlet conditions, then correct with the mean temperature
+        _, _, _, inlet_loss = hydraulics_at(temperature[k])
+        predicted = outlet_temperature(temperature[k], inlet_loss)
+        viscosity[k], reynolds[k], friction_factor[k], loss[k] = hydraulics_at((temperature[k] + predicted) / 2)
+        temperature[k + 1] = outlet_temperature(temperature[k], loss[k])
+
+    cumulative = np.vstack([np.zeros(cases), np.cumsum(loss, axis=0)])
+    return {
+        'milepost': np.linspace(0, 1, segments + 1)[:, None] * length_mi,
+        'temperature_f': temperature,
+        'viscosity_cst': viscosity,
+        'reynolds_number': reynolds,
+        'friction_factor': friction_factor,
+        'pressure_loss_psi': loss,
+        'cumulative_pressure_loss_psi': cumulative,
+        'outlet_temperature_f': temperature[-1],
+        'inlet_viscosity_cst': viscosity_at(inlet_temperature_f, walther_a, walther_b),
+        'outlet_viscosity_cst': viscosity_at(temperature[-1], walther_a, walther_b),
+        'total_pressure_loss_psi': cumulative[-1],
+    }
@@ -0,0 +1,199 @@
+# Surge (water hammer) transients in a single line by the method of characteristics.
+# The line is cut into equal reaches with the time step set so a pressure wave crosses one reach per step
+# (Courant number 1), so the characteristics land exactly on grid nodes and need no interpolation. Every
+# step updates all interior nodes at once from the previous step's heads and flows; only the two boundary
+# nodes are scalar work. Friction is the steady-state Darcy friction factor of the initial flow (the
+# project's correlations), applied to the instantaneous flow. Wave speed comes from the fluid's bulk
+# modulus and the pipe's diameter-to-wall ratio (Korteweg). Only running maxima and minima per node, plus
+# short pressure traces at the two ends, are kept, so memory doesn't grow with the simulated time.
+# Column separation is not modelled: pressures below vapour pressure are reported, not limited.
+#
+# Events:
+#   valve-closure   the line runs from a fixed-pressure source to a valve at the outlet that closes over
+#                   event_time_s (flow through it falls as the closed fraction rises)
+#   pump-trip       the inlet pump runs down to zero flow over event_time_s and a check valve then holds the
+#                   inlet closed; the outlet delivers into a fixed pressure
+
+import numpy as np
+
+import hydraulics
+import units
+
+EVENTS = ('valve-closure', 'pump-trip')
+
+BULK_MODULUS_PSI = 200_000  # Typical for crude and refined products; about 320,000 for water
+STEEL_YOUNGS_MODULUS_PSI = 30e6
+STEEL_POISSON_RATIO = 0.3
+
+MAX_REACHES = 20_000
+MAX_STEPS = 2_000_000
+TRACE_POINTS = 2000
+
+
+# Pressure wave speed (ft/s) in a thin-walled pipe restrained against axial movement (buried line).
+# Broadcasts over its arguments.
+def wave_speed_fps(inner_diameter_in, wall_in, specific_gravity, bulk_modulus_psi=BULK_MODULUS_PSI,
+                   youngs_modulus_psi=STEEL_YOUNGS_MODULUS_PSI, poisson_ratio=STEEL_POISSON_RATIO):
+    inner_diameter_in, wall_in, specific_gravity, bulk_modulus_psi = (
+        np.asarray(v, dtype=float) for v in (inner_diameter_in, wall_in, specific_gravity, bulk_modulus_psi))
+    # Bulk modulus over density, with density in slugs/ft^3 from specific gravity
+    # (1 psi is FT_HEAD_PER_PSI feet of water)
+    fluid_fps2 = bulk_modulus_psi * hydraulics.FT_HEAD_PER_PSI * hydraulics.G_FT_S2 / specific_gravity
+    stiffness = 1 + (1 - poisson_ratio ** 2) * bulk_modulus_psi * inner_diameter_in / (youngs_modulus_psi * wall_in)
+    return np.sqrt(fluid_fps2 / stiffness)
+
+
+# Fraction of the valve still open (or pump flow still running) t seconds into the event: 1 - (t/T)^exponent,
+# clamped to [0, 1]. An exponent above 1 keeps most of the flow until late in the stroke, like a gate valve.
+def open_fraction(t, event_time_s, exponent=1.0):
+    if event_time_s <= 0:
+        return 0.0 if t >= 0 else 1.0
+    return 1.0 - min(max(t / event_time_s, 0.0), 1.0) ** exponent
+
+
+# Simulate an event on a line of one pipe size starting from steady flow.
+# outlet_pressure_psi is the steady pressure at the outlet (upstream of the valve for a valve closure);
+# valve_drop_psi is the steady loss across the fully open valve. Elevation runs linearly between
+# profile points (profile_milepost from 0 to the line length); without them the line is level at 0 ft.
+# reach_ft is the target reach length; the actual one divides the line evenly.
+# Returns envelopes per node plus traces at the inlet and outlet, pressures in psi.
+def simulate(length_mi, od_in, wall_in, flow_rate_bpd, outlet_pressure_psi, roughness_ft, viscosity_cst,
+             specific_gravity, drag_reduction=0.0, event='valve-closure', event_time_s=10.0, closure_exponent=1.0,
+             duration_s=300.0, reach_ft=500.0, valve_drop_psi=5.0, profile_milepost=None, profile_elevation_ft=None,
+             bulk_modulus_psi=BULK_MODULUS_PSI, method='Colebrook-White'):
+    if event not in EVENTS:
+        raise ValueError(f'Event must be one of: {", ".join(EVENTS)}')
+    inner_diameter_in = od_in - 2 * wall_in
+    if inner_diameter_in <= 0:
+        raise ValueError('Wall thickness must be less than half the outside diameter')
+    if length_mi <= 0 or reach_ft <= 0 or duration_s <= 0:
+        raise ValueError('Line length, reach length and duration must be positive')
+    if flow_rate_bpd <= 0:
+        raise ValueError('Flow rate must be positive')
+    if event == 'valve-closure' and valve_drop_psi <= 0:
+        raise ValueError('The open valve needs a pressure drop above zero')
+
+    length_ft = length_mi * hydraulics.FT_PER_MILE
+    reaches = max(int(np.ceil(length_ft / reach_ft)), 2)
+    if reaches > MAX_REACHES:
+        raise ValueError(f'Use a reach length of at least {length_ft / MAX_REACHES:,.0f} ft for this line')
+    dx = length_ft / reaches
+    wave_speed = float(wave_speed_fps(inner_diameter_in, wall_in, specific_gravity, bulk_modulus_psi))
+    dt = dx / wave_speed
+    steps = int(np.ceil(duration_s / dt))
+    if steps > MAX_STEPS:
+        raise ValueError(f'{steps:,} time steps is too many; shorten the duration or lengthen the reaches')
+
+    milepost = np.linspace(0.0, length_mi, reaches + 1)
+    if profile_milepost is None:
+        elevation_ft = np.zeros(reaches + 1)
+    else:
+        elevation_ft = np.interp(milepost, profile_milepost, profile_elevation_ft)
+    psi_per_ft = specific_gravity / hydraulics.FT_HEAD_PER_PSI
+
+    # Steady state. Heads are hydraulic grade in feet of the fluid, flows in ft^3/s.
+    steady = hydraulics.friction_pressure_loss(inner_diameter_in, flow_rate_bpd, roughness_ft, viscosity_cst,
+                                               specific_gravity, drag_reduction, methods=(method,))
+    friction_factor = float(steady['friction_factors'][method]) * (1 - drag_reduction)
+    area_sqft = np.pi * (inner_diameter_in / 24) ** 2
+    flow0 = units.convert(flow_rate_bpd, 'bpd', 'cfs')
+    # Characteristic impedance B and reach friction R: along C+ and C-, H = C -/+ B Q with C carrying
+    # R Q |Q| from the neighbour
+    b = wave_speed / (hydraulics.G_FT_S2 * area_sqft)
+    r = friction_factor * dx / (2 * hydraulics.G_FT_S2 * (inner_diameter_in / 12) * area_sqft ** 2)
+    # The discrete steady state: a head drop of R Q0^2 per reach, so nothing moves until the event
+    outlet_head = outlet_pressure_psi / psi_per_ft + elevation_ft[-1]
+    head = outlet_head + r * flow0 ** 2 * np.arange(reaches, -1, -1)
+    flow = np.full(reaches + 1, flow0)
+    steady_pressure = (head - elevation_ft) * psi_per_ft
+    source_head = head[0]
+    # Valve: Q = tau Cv sqrt(dH), with Cv from the steady flow and drop across the open valve
+    valve_cv2 = flow0 ** 2 / (valve_drop_psi / psi_per_ft)
+    receiving_head = outlet_head - valve_drop_psi / psi_per_ft
+
+    max_head = head.copy()
+    min_head = head.copy()
+    max_time = np.zeros(reaches + 1)
+    trace_every = max(steps // TRACE_POINTS, 1)
+    trace_time, inlet_trace, outlet_trace = [0.0], [steady_pressure[0]], [steady_pressure[-1]]
+
+    new_head = np.empty_like(head)
+    new_flow = np.empty_like(flow)
+    loss = np.empty_like(flow)
+    cp = np.empty_like(head)
+    cm = np.empty_like(head)
+    rising = np.empty(reaches + 1, dtype=bool)
+    for step in range(1, steps + 1):
+        t = step * dt
+        # Characteristic constants at every node: C+ arrives at node i from i-1, C- from i+1
+        np.multiply(flow, np.abs(flow), out=loss)
+        loss *= r
+        np.multiply(flow, b, out=cp)
+        np.subtract(head, cp, out=cm)
+        cm += loss
+        cp += head
+        cp -= loss
+        # Interior nodes
+        np.add(cp[:-2], cm[2:], out=new_head[1:-1])
+        new_head[1:-1] *= 0.5
+        np.subtract(cp[:-2], cm[2:], out=new_flow[1:-1])
+        new_flow[1:-1] *= 0.5 / b
+
+        tau = open_fraction(t, event_time_s, closure_exponent)
+        if event == 'valve-closure':
+            # Inlet: fixed source head
+            new_head[0] = source_head
+            new_flow[0] = (source_head - cm[1]) / b
+            # Outlet: valve, from Q^2 = tau^2 Cv (Cp - B Q - H_receiving) with the sign of the head difference
+            outlet_cp = cp[-2]
+            cv = tau * tau * valve_cv2
+            drive = outlet_cp - receiving_head
+            if cv == 0:
+                q = 0.0
+            elif drive >= 0:
+                q = 0.5 * (-b * cv + np.sqrt((b * cv) ** 2 + 4 * cv * drive))
+            else:
+                q = 0.5 * (b * cv - np.sqrt((b * cv) ** 2 - 4 * cv * drive))
+            new_flow[-1] = q
+            new_head[-1] = outlet_cp - b * q
+        else:
+            # Inlet: pump flow running down, then the check valve holds it at zero
+            new_flow[0] = flow0 * tau
+            new_head[0] = cm[1] + b * new_flow[0]
+            # Outlet: fixed delivery head
+            new_head[-1] = outlet_head
+            new_flow[-1] = (cp[-2] - outlet_head) / b
+
+        head, new_head = new_head, head
+        flow, new_flow = new_flow, flow
+        np.greater(head, max_head, out=rising)
+        np.copyto(max_head, head, where=rising)
+        max_time[rising] = t
+        np.minimum(min_head, head, out=min_head)
+        if step % trace_every == 0:
+            trace_time.append(t)
+            inlet_trace.append((head[0] - elevation_ft[0]) * psi_per_ft)
+            outlet_trace.append((head[-1] - elevation_ft[-1]) * psi_per_ft)
+
+    velocity0 = flow0 / area_sqft
+    return {
+        'milepost': milepost,
+        'elevation_ft': elevation_ft,
+        'steady_pressure_psi': steady_pressure,
+        'max_pressure_psi': (max_head - elevation_ft) * psi_per_ft,
+        'min_pressure_psi': (min_head - elevation_ft) * psi_per_ft,
+        'max_pressure_time_s': max_time,
+        'trace_time_s': np.array(trace_time),
+        'inlet_pressure_psi': np.array(inlet_trace),
+        'outlet_pressure_psi': np.array(outlet_trace),
+        'wave_speed_fps': wave_speed,
+        'reach_ft': dx,
+        'time_step_s': dt,
+        'steps': steps,
+        'friction_factor': friction_factor,
+        'velocity_fps': velocity0,
+        # Time for a wave to reach the far end and come back; closing faster than this is a rapid closure
+        'wave_period_s': 2 * length_ft / wave_speed,
+        # Joukowsky surge for stopping the whole flow at once
+        'joukowsky_psi': wave_speed * velocity0 / hydraulics.G_FT_S2 * psi_per_ft,
+    }
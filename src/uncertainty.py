@@ -0,0 +1,244 @@
+# Monte Carlo uncertainty in friction factor and pressure loss from uncertain roughness, viscosity and
+# specific gravity.
+# Draws are evaluated in fixed-size chunks, each with its own random stream spawned from one seed, so the
+# result doesn't depend on how many processes share the work. Each chunk is reduced on the spot to counts,
+# sums and a fine log-spaced histogram per method; only those reductions travel back and are merged, so
+# memory is bounded by the chunk size whatever the number of draws. Percentiles are read off the merged
+# fine histogram (to within a bin, a few hundredths of a percent). Chunks run on a process pool, which
+# scales with cores because a chunk is pure NumPy work with nothing shared.
+#   HYDRAULIC_MC_PROCESSES   processes used for a run (default: one per CPU; 1 runs in-process)
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import hydraulics
+
+# Distributions by name, given a central value and a spread in the input's units:
+# the standard deviation for normal and lognormal, the half-width for uniform and triangular
+DISTRIBUTIONS = ('fixed', 'normal', 'lognormal', 'uniform', 'triangular')
+UNCERTAIN_INPUTS = ('roughness_ft', 'viscosity_cst', 'specific_gravity')
+QUANTITIES = ('friction_factor', 'pressure_loss_psi_per_mile')
+PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+
+CHUNK_DRAWS = 100_000
+PILOT_DRAWS = 10_000
+HISTOGRAM_BINS = 4096
+DISPLAY_BINS = 60
+
+
+def sample(rng, distribution, center, spread, size):
+    if distribution == 'fixed' or spread == 0:
+        return np.full(size, float(center))
+    if distribution == 'normal':
+        return rng.normal(center, spread, size)
+    if distribution == 'lognormal':
+        # Parameters of the underlying normal for the given mean and standard deviation
+        sigma2 = np.log1p((spread / center) ** 2)
+        return rng.lognormal(np.log(center) - sigma2 / 2, np.sqrt(sigma2), size)
+    if distribution == 'uniform':
+        return rng.uniform(center - spread, center + spread, size)
+    if distribution == 'triangular':
+        return rng.triangular(center - spread, center, center + spread, size)
+    raise ValueError(f'Distribution must be one of: {", ".join(DISTRIBUTIONS)}')
+
+
+def validate(distributions):
+    for name, (distribution, center, spread) in distributions.items():
+        if name not in UNCERTAIN_INPUTS:
+            raise ValueError(f'Uncertain inputs must be among: {", ".join(UNCERTAIN_INPUTS)}')
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f'Distribution must be one of: {", ".join(DISTRIBUTIONS)}')
+        if not center > 0 or spread < 0:
+            raise ValueError(f'{name} needs a positive value and a spread of zero or more')
+
+
+# Streaming summary of one output: count, mean and sum of squared deviations (M2), extremes and counts over
+# fixed bin edges. counts[0] and counts[-1] hold values below the first and above the last edge.
+class Summary:
+    def __init__(self, edges):
+        self.edges = edges
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+        self.count = 0
+        self.center = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        if values.size == 0:
+            return
+        self.counts += np.bincount(np.searchsorted(self.edges, values, side='right'), minlength=len(self.counts))
+        chunk = Summary(self.edges)
+        chunk.count = values.size
+        # Mean shifted by the first value, so the rounding is relative to the spread rather than the mean
+        chunk.center = float(values[0] + (values - values[0]).mean())
+        chunk.m2 = float(np.dot(values - chunk.center, values - chunk.center))
+        self._combine(chunk)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        self.counts += other.counts
+        self._combine(other)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    # Pairwise (Chan et al.) update of count, mean and M2, which stays accurate when the spread is small
+    # next to the mean
+    def _combine(self, other):
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.center - self.center
+        self.center += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    @property
+    def mean(self):
+        return self.center if self.count else np.nan
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return np.nan
+        return float(np.sqrt(self.m2 / (self.count - 1)))
+
+    # Percentiles interpolated linearly within a histogram bin; the outer bins run out to the extremes, and
+    # every percentile lies within the values drawn
+    def percentiles(self, q):
+        if not self.count:
+            return np.full(len(q), np.nan)
+        bounds = np.clip(np.concatenate([[self.min], self.edges, [self.max]]), self.min, self.max)
+        cumulative = np.concatenate([[0], np.cumsum(self.counts)])
+        return np.clip(np.interp(np.asarray(q, dtype=float) / 100 * self.count, cumulative, bounds),
+                       self.min, self.max)
+
+    # Counts over bins equal-width in value between two limits, by assigning each fine bin to the display bin
+    # holding its centre
+    def histogram(self, low, high, bins=DISPLAY_BINS):
+        edges = np.linspace(low, high, bins + 1)
+        centers = np.sqrt(self.edges[:-1] * self.edges[1:])
+        which = np.clip(np.searchsorted(edges, centers, side='right') - 1, 0, bins - 1)
+        inside = (centers >= low) & (centers <= high)
+        return edges, np.bincount(which[inside], weights=self.counts[1:-1][inside], minlength=bins)
+
+
+# Draws of the uncertain inputs and the outputs they give; draws with a non-positive input are dropped
+def evaluate(fixed, distributions, rng, draws, methods):
+    inputs = {name: sample(rng, *distributions.get(name, ('fixed', fixed[name], 0)), draws)
+              for name in UNCERTAIN_INPUTS}
+    valid = np.logical_and.reduce([values > 0 for values in inputs.values()])
+    inputs = {name: values[valid] for name, values in inputs.items()}
+    base = {name: value for name, value in fixed.items() if name not in UNCERTAIN_INPUTS}
+    result = hydraulics.friction_pressure_loss(**base, **inputs, methods=methods)
+    shape = (int(valid.sum()),)
+    outputs = {}
+    for method in methods:
+        outputs['friction_factor', method] = np.broadcast_to(result['friction_factors'][method], shape)
+        outputs['pressure_loss_psi_per_mile', method] = np.broadcast_to(
+            result['pressure_loss_psi_per_mile'][method], shape)
+    return shape[0], outputs
+
+
+# One chunk, run in a pool process: returns (valid draws, {(quantity, method): Summary})
+def _run_chunk(task):
+    seed, draws, fixed, distributions, edges, methods = task
+    valid, outputs = evaluate(fixed, distributions, np.random.default_rng(seed), draws, methods)
+    summaries = {}
+    for key, values in outputs.items():
+        summaries[key] = Summary(edges[key])
+        summaries[key].add(values[np.isfinite(values)])
+    return valid, summaries
+
+
+# Bin edges for every output from a small pilot run, log-spaced over four times its range either side
+def _edges(fixed, distributions, seed, methods):
+    _, outputs = evaluate(fixed, distributions, np.random.default_rng([seed, 1]), PILOT_DRAWS, methods)
+    edges = {}
+    for key, values in outputs.items():
+        values = values[np.isfinite(values) & (values > 0)]
+        low, high = (values.min(), values.max()) if values.size else (1e-6, 1e6)
+        edges[key] = np.geomspace(low / 4, high * 4, HISTOGRAM_BINS + 1)
+    return edges
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# Pool per process count, created on first use in this process (spawned, since the caller may be a threaded
+# server or a forked gunicorn worker)
+def _pool(processes):
+    key = (os.getpid(), processes)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+        return _pools[key]
+
+
+def default_processes():
+    return int(os.environ.get('HYDRAULIC_MC_PROCESSES') or os.cpu_count() or 1)
+
+
+# Monte Carlo run. fixed holds every friction_pressure_loss input (the central values of the uncertain ones);
+# distributions maps uncertain inputs to (distribution, center, spread).
+# progress, when given, is called after each chunk with (chunks done, chunks, valid draws so far, summaries
+# so far); it may raise to stop the run.
+def run(fixed, distributions, draws=1_000_000, seed=0, methods=hydraulics.METHODS, chunk_draws=CHUNK_DRAWS,
+        processes=None, progress=None):
+    validate(distributions)
+    draws = int(draws)
+    if draws < 1:
+        raise ValueError('Draws must be at least 1')
+    edges = _edges(fixed, distributions, seed, methods)
+    sizes = [chunk_draws] * (draws // chunk_draws) + ([draws % chunk_draws] if draws % chunk_draws else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, size, fixed, distributions, edges, methods) for s, size in zip(seeds, sizes)]
+
+    processes = min(processes or default_processes(), len(tasks))
+    chunks = map(_run_chunk, tasks) if processes <= 1 else _pool(processes).map(_run_chunk, tasks)
+    valid = 0
+    summaries = {key: Summary(key_edges) for key, key_edges in edges.items()}
+    # Merged in chunk order, so the sums don't depend on which process finished first
+    for done, (chunk_valid, chunk_summaries) in enumerate(chunks, 1):
+        valid += chunk_valid
+        for key, summary in chunk_summaries.items():
+            summaries[key].merge(summary)
+        if progress is not None:
+            progress(done, len(tasks), valid, summaries)
+    return summarize(draws, valid, summaries)
+
+
+def summarize(draws, valid, summaries):
+    result = {'draws': draws, 'valid_draws': valid, 'percentiles': PERCENTILES}
+    for quantity in QUANTITIES:
+        result[quantity] = {}
+        for (key_quantity, method), summary in summaries.items():
+            if key_quantity != quantity:
+                continue
+            result[quantity][method] = {
+                'mean': summary.mean,
+                'std': summary.std,
+                'min': summary.min,
+                'max': summary.max,
+                'percentile_values': summary.percentiles(PERCENTILES),
+            }
+    result['histogram'] = histograms(summaries)
+    return result
+
+
+# Display histograms of pressure loss per method on common bins spanning the 0.5th to 99.5th percentiles
+def histograms(summaries, quantity='pressure_loss_psi_per_mile'):
+    selected = {method: s for (q, method), s in summaries.items() if q == quantity and s.count}
+    if not selected:
+        return {}
+    low = min(s.percentiles([0.5])[0] for s in selected.values())
+    high = max(s.percentiles([99.5])[0] for s in selected.values())
+    if not high > low:
+        high = low * (1 + 1e-9) + 1e-12
+    return {method: summary.histogram(low, high) for method, summary in selected.items()}
@@ -0,0 +1,212 @@
+# Unit registry behind every calculator, the Unit Conversions tabs, the JSON API and the batch CSV columns.
+# Each unit is defined in terms of others ('bbl' is 5.614583 'ft3', 'psi' is 'lbf/in2', ...), down to the SI
+# base units m, kg, s and K. Converting between any two units walks that graph once to get a scale and
+# offset, checks the dimensions match, and caches the pair, so the hot path is a dict hit and one
+# multiply (plus one add for temperatures), on a scalar or a whole NumPy column alike.
+# Unit strings combine symbols with '*' and '/', with an integer power after a symbol ('in2', 'ft3',
+# 'BTU/hr/ft2/F'). Inside compound units temperatures are differences, so only their scale applies.
+
+from functools import cache
+
+import numpy as np
+
+# Base dimensions: length, mass, time, temperature
+_BASE = {'m': (1, 0, 0, 0), 'kg': (0, 1, 0, 0), 's': (0, 0, 1, 0), 'K': (0, 0, 0, 1), '1': (0, 0, 0, 0)}
+
+# symbol -> (definition, scale, offset): 1 symbol = scale * definition + offset
+_DEFINITIONS = {
+    # Length
+    'mm': ('m', 1e-3, 0.0),
+    'cm': ('m', 1e-2, 0.0),
+    'km': ('m', 1e3, 0.0),
+    'ft': ('m', 0.3048, 0.0),
+    'in': ('ft', 1 / 12, 0.0),
+    'mi': ('ft', 5280, 0.0),
+    # Volume
+    'bbl': ('ft3', 5.614583, 0.0),
+    'gal': ('bbl', 1 / 42, 0.0),
+    'L': ('m3', 1e-3, 0.0),
+    # Time
+    'min': ('s', 60, 0.0),
+    'hr': ('min', 60, 0.0),
+    'day': ('hr', 24, 0.0),
+    # Flow rate
+    'bpd': ('bbl/day', 1, 0.0),
+    'bph': ('bbl/hr', 1, 0.0),
+    'gpm': ('gal/min', 1, 0.0),
+    'cfs': ('ft3/s', 1, 0.0),
+    # Mass and force
+    'lb': ('kg', 0.45359237, 0.0),
+    'N': ('kg*m/s2', 1, 0.0),
+    'lbf': ('N', 4.4482216152605, 0.0),
+    # Pressure, including feet of water head at the project's 2.31 ft per psi
+    'Pa': ('N/m2', 1, 0.0),
+    'mPa': ('Pa', 1e-3, 0.0),
+    'kPa': ('Pa', 1e3, 0.0),
+    'MPa': ('Pa', 1e6, 0.0),
+    'bar': ('Pa', 1e5, 0.0),
+    'psi': ('lbf/in2', 1, 0.0),
+    'psf': ('lbf/ft2', 1, 0.0),
+    'ftH2O': ('psi', 1 / 2.31, 0.0),
+    'mH2O': ('ftH2O', 1 / 0.3048, 0.0),
+    # Energy and power
+    'J': ('N*m', 1, 0.0),
+    'BTU': ('ft*lbf', 778.169, 0.0),
+    'W': ('J/s', 1, 0.0),
+    'kW': ('W', 1e3, 0.0),
+    'kWh': ('kW*hr', 1, 0.0),
+    'hp': ('ft*lbf/s', 550, 0.0),
+    # Viscosity
+    'cSt': ('mm2/s', 1, 0.0),
+    'St': ('cm2/s', 1, 0.0),
+    'cP': ('mPa*s', 1, 0.0),
+    'P': ('Pa*s', 0.1, 0.0),
+    # Temperature
+    'C': ('K', 1, 273.15),
+    'R': ('K', 5 / 9, 0.0),
+    'F': ('R', 1, 459.67),
+}
+
+# Dimension names for messages and the converter tab
+DIMENSIONS = {
+    (0, 0, 0, 0): 'dimensionless',
+    (1, 0, 0, 0): 'length',
+    (2, 0, 0, 0): 'area',
+    (3, 0, 0, 0): 'volume',
+    (0, 0, 1, 0): 'time',
+    (3, 0, -1, 0): 'flow rate',
+    (1, 0, -1, 0): 'velocity',
+    (0, 1, 0, 0): 'mass',
+    (1, 1, -2, 0): 'force',
+    (-1, 1, -2, 0): 'pressure',
+    (2, 1, -2, 0): 'energy',
+    (2, 1, -3, 0): 'power',
+    (2, 0, -1, 0): 'kinematic viscosity',
+    (-1, 1, -1, 0): 'dynamic viscosity',
+    (-3, 1, 0, 0): 'density',
+    (0, 0, 0, 1): 'temperature',
+}
+
+# Units offered on the converter tab, by dimension
+COMMON_UNITS = {
+    'length': ('in', 'ft', 'mi', 'mm', 'm', 'km'),
+    'volume': ('bbl', 'gal', 'ft3', 'm3', 'L'),
+    'flow rate': ('bpd', 'bph', 'gpm', 'cfs', 'm3/hr', 'm3/day'),
+    'velocity': ('ft/s', 'm/s', 'mi/hr', 'km/hr'),
+    'pressure': ('psi', 'kPa', 'MPa', 'bar', 'ftH2O', 'mH2O'),
+    'power': ('hp', 'kW', 'W', 'BTU/hr'),
+    'kinematic viscosity': ('cSt', 'St', 'm2/s', 'ft2/s'),
+    'dynamic viscosity': ('cP', 'P', 'Pa*s'),
+    'density': ('kg/m3', 'lb/ft3', 'lb/gal'),
+    'temperature': ('F', 'C', 'K', 'R'),
+}
+
+
+def _split(unit):
+    # (symbol, power) terms of a unit string; '/' applies to the term right after it
+    terms, sign, symbol = [], 1, ''
+    for char in unit.replace(' ', '') + '*':
+        if char in '*/':
+            if not symbol:
+                raise ValueError(f"Can't read unit '{unit}'")
+            name = symbol.rstrip('0123456789')
+            power = int(symbol[len(name):] or 1)
+            if not name:
+                if symbol != '1':
+                    raise ValueError(f"Can't read unit '{unit}'")
+                name, power = '1', 1
+            terms.append((name, sign * power))
+            sign, symbol = (-1 if char == '/' else 1), ''
+        else:
+            symbol += char
+    return terms
+
+
+# (scale, offset, dimensions) of a unit relative to SI base units: value in base = value * scale + offset
+@cache
+def resolve(unit):
+    unit = unit.strip()
+    if unit in _BASE:
+        return 1.0, 0.0, _BASE[unit]
+    if unit in _DEFINITIONS:
+        definition, scale, offset = _DEFINITIONS[unit]
+        base_scale, base_offset, dimensions = resolve(definition)
+        return scale * base_scale, offset * base_scale + base_offset, dimensions
+    terms = _split(unit)
+    if terms == [(unit, 1)]:
+        raise ValueError(f"Unknown unit '{unit}'")
+    scale, dimensions = 1.0, np.zeros(4, dtype=int)
+    for symbol, power in terms:
+        symbol_scale, _, symbol_dimensions = resolve(symbol)
+        scale *= symbol_scale ** power
+        dimensions += power * np.array(symbol_dimensions)
+    return scale, 0.0, tuple(int(d) for d in dimensions)
+
+
+def dimension(unit):
+    dimensions = resolve(unit)[2]
+    return DIMENSIONS.get(dimensions, str(dimensions))
+
+
+# (scale, offset) taking values in from_unit to to_unit: to = from * scale + offset
+@cache
+def converter(from_unit, to_unit):
+    from_scale, from_offset, from_dimensions = resolve(from_unit)
+    to_scale, to_offset, to_dimensions = resolve(to_unit)
+    if from_dimensions != to_dimensions:
+        raise ValueError(f"Can't convert {from_unit} ({dimension(from_unit)}) to {to_unit} ({dimension(to_unit)})")
+    return from_scale / to_scale, (from_offset - to_offset) / to_scale
+
+
+# Multiplier from one unit to another; only for units without an offset (not bare temperatures)
+def factor(from_unit, to_unit):
+    scale, offset = converter(from_unit, to_unit)
+    if offset:
+        raise ValueError(f'{from_unit} to {to_unit} has an offset; use convert()')
+    return scale
+
+
+# Convert a scalar or a whole array at once
+def convert(value, from_unit, to_unit):
+    scale, offset = converter(from_unit, to_unit)
+    if isinstance(value, (list, tuple)):
+        value = np.asarray(value, dtype=float)
+    return value * scale + offset if offset else value * scale
+
+
+# Case-insensitive symbol lookup, for unit names that arrive lowercased (CSV headers); None if unknown or
+# ambiguous
+@cache
+def lookup(unit):
+    try:
+        resolve(unit)
+        return unit
+    except ValueError:
+        pass
+    symbols = list(_BASE) + list(_DEFINITIONS)
+    matches = [symbol for symbol in symbols if symbol.lower() == unit.lower()]
+    if len(matches) == 1:
+        return matches[0]
+    # Compound units: match each term on its own
+    try:
+        terms = _split(unit)
+    except ValueError:
+        return None
+    if len(terms) < 2:
+        return None
+    parts = []
+    for i, (symbol, power) in enumerate(terms):
+        match = lookup(symbol)
+        if match is None:
+            return None
+        parts.append(('/' if power < 0 else '*' if i else '') + match + (str(abs(power)) if abs(power) != 1 else ''))
+    return ''.join(parts)
+
+
+# Scale and offset of every converter-tab unit relative to the first unit of its dimension, for the browser
+@cache
+def table():
+    result = {}
+    for name, symbols in COMMON_UNITS.items():
+        result[name] = {symbol: list(converter(symbol, symbols[0])) for symbol in symbols}
+    return result